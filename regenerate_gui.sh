@@ -27,3 +27,4 @@ pyside6-uic ./qt_designer/settings/denoising_settings.ui -o ./src/mouseapp/view/
 pyside6-uic ./qt_designer/settings/preview_settings.ui -o ./src/mouseapp/view/generated/settings/ui_preview_settings.py
 pyside6-uic ./qt_designer/settings/classification_settings.ui -o ./src/mouseapp/view/generated/settings/ui_classification_settings.py
 pyside6-uic ./qt_designer/settings/filtering_settings.ui -o ./src/mouseapp/view/generated/settings/ui_filtering_settings.py
+pyside6-uic ./qt_designer/settings/spectrogram_settings.ui -o ./src/mouseapp/view/generated/settings/ui_spectrogram_settings.py
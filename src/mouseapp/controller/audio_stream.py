@@ -0,0 +1,311 @@
+"""Block-wise STFT and resampling of audio files.
+
+Audio files are treated as one concatenated recording.
+
+This module doesn't depend on Qt nor on Qt models, so its functions can be
+executed in worker processes.
+"""
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import torch
+import torchaudio
+from mouseapp.model.audio_metadata import AudioMetadata
+from mouseapp.model.timeline import Timeline
+
+# Number of input samples resampled at once.
+RESAMPLE_BLOCK_SAMPLES = 2**20
+# Parameters of the windowed sinc filter, same as defaults of
+# `torchaudio.functional.resample`.
+RESAMPLE_LOWPASS_FILTER_WIDTH = 6
+RESAMPLE_ROLLOFF = 0.99
+
+
+class AudioSegment(NamedTuple):
+    """Single audio file placed in the virtual, concatenated recording."""
+
+    path: Path
+    num_frames: int
+    sample_rate: int
+
+
+class STFTParameters(NamedTuple):
+    n_fft: int
+    win_length: int
+    hop_length: int
+    center: bool
+    pad_mode: str
+    power: float
+
+    @property
+    def padding(self) -> int:
+        return self.n_fft // 2 if self.center else 0
+
+
+def read_audio_metadata(path: Path) -> AudioMetadata:
+    """Read metadata of the audio file at `path` from its header."""
+    stat = path.stat()
+    info = torchaudio.info(path)
+    num_frames = info.num_frames
+    if num_frames <= 0:
+        # Some compressed formats don't store their length in the header.
+        num_frames = torchaudio.load(path)[0].shape[-1]
+    return AudioMetadata(num_frames=num_frames,
+                         sample_rate=info.sample_rate,
+                         num_channels=info.num_channels,
+                         size=stat.st_size,
+                         mtime_ns=stat.st_mtime_ns)
+
+
+def update_metadata_index(audio_files: List[Path],
+                          index: Optional[Dict[Path, AudioMetadata]] = None,
+                          skip_unreadable: bool = False) -> Dict[Path, AudioMetadata]:
+    """Get metadata of `audio_files`, reusing entries of unmodified files.
+
+    Only files missing from `index` or modified since they were indexed are
+    read. Files not in `audio_files` aren't included in the returned index and
+    neither are files which can't be read, if `skip_unreadable` is set.
+    """
+    index = index if index is not None else {}
+    updated_index = {}
+    for file in audio_files:
+        file = Path(file)
+        metadata = index.get(file)
+        if metadata is None or not metadata.is_current(file):
+            try:
+                metadata = read_audio_metadata(file)
+            except (OSError, RuntimeError):
+                if not skip_unreadable:
+                    raise
+                logging.warning(f"Couldn't read metadata of `{file}`.")
+                continue
+        updated_index[file] = metadata
+    return updated_index
+
+
+def read_audio_segments(
+        audio_files: List[Path],
+        index: Optional[Dict[Path, AudioMetadata]] = None) -> List[AudioSegment]:
+    """Read lengths and sample rates of `audio_files` without decoding them.
+
+    Metadata of files which weren't modified is taken from `index`, see
+    `update_metadata_index`.
+    """
+    index = update_metadata_index(audio_files, index)
+    return [
+        AudioSegment(path=Path(file),
+                     num_frames=index[Path(file)].num_frames,
+                     sample_rate=index[Path(file)].sample_rate) for file in audio_files
+    ]
+
+
+def get_timeline(segments: List[AudioSegment]) -> Timeline:
+    return Timeline(
+        audio_files=[segment.path for segment in segments],
+        sample_counts=[segment.num_frames for segment in segments],
+        sample_rate=segments[0].sample_rate,
+    )
+
+
+def _read_samples(segments: List[AudioSegment], start: int,
+                  stop: int) -> torch.Tensor:
+    """Read samples [`start`, `stop`) of the concatenated recording."""
+    chunks = []
+    for file_index, local_start, local_stop in get_timeline(segments).sample_ranges(
+            start, stop):
+        segment = segments[file_index]
+        if segment.path.suffix == ".npy":
+            # Resampled audio, already mixed down to mono.
+            samples = np.load(segment.path, mmap_mode="r")
+            chunks.append(torch.from_numpy(np.array(samples[local_start:local_stop])))
+        else:
+            waveform, _ = torchaudio.load(segment.path,
+                                          frame_offset=local_start,
+                                          num_frames=local_stop - local_start)
+            # Multichannel audio is mixed down to mono.
+            chunks.append(waveform.mean(dim=0))
+    return torch.cat(chunks)
+
+
+def _padded_indices(start: int, stop: int, length: int, pad_mode: str) -> np.ndarray:
+    """Map indices of a padded signal to indices of the original signal.
+
+    Indices falling outside of the signal are reflected (`pad_mode` equal to
+    "reflect") or set to -1, which marks zero padding.
+    """
+    indices = np.arange(start, stop)
+    if pad_mode == "reflect":
+        indices = np.abs(indices)
+        indices = np.where(indices >= length, 2 * (length - 1) - indices, indices)
+    elif pad_mode == "constant":
+        indices[(indices < 0) | (indices >= length)] = -1
+    else:
+        raise NotImplementedError(f"Padding mode `{pad_mode}` is not supported!")
+    return indices
+
+
+def get_frame_count(parameters: STFTParameters, num_samples: int) -> int:
+    return 1 + (num_samples + 2 * parameters.padding -
+                parameters.n_fft) // parameters.hop_length
+
+
+def get_spectrogram_shape(segments: List[AudioSegment],
+                          parameters: STFTParameters) -> Tuple[int, int]:
+    num_samples = sum(segment.num_frames for segment in segments)
+    return parameters.n_fft // 2 + 1, get_frame_count(parameters, num_samples)
+
+
+def get_block_calculator(parameters: STFTParameters):
+    # Padding is applied manually, so that blocks can be computed independently.
+    return torchaudio.transforms.Spectrogram(
+        n_fft=parameters.n_fft,
+        win_length=parameters.win_length,
+        hop_length=parameters.hop_length,
+        center=False,
+        power=parameters.power,
+    )
+
+
+def compute_frames(segments: List[AudioSegment],
+                   parameters: STFTParameters,
+                   block_calculator: torchaudio.transforms.Spectrogram,
+                   frame_start: int,
+                   frame_stop: int) -> torch.Tensor:
+    """Compute spectrogram frames [`frame_start`, `frame_stop`).
+
+    Frames are computed exactly as if the STFT was run on the whole
+    concatenated recording, including padding at the edges of the recording.
+    """
+    num_samples = sum(segment.num_frames for segment in segments)
+    sample_start = frame_start * parameters.hop_length - parameters.padding
+    sample_stop = ((frame_stop - 1) * parameters.hop_length - parameters.padding +
+                   parameters.n_fft)
+
+    indices = _padded_indices(sample_start,
+                              sample_stop,
+                              num_samples,
+                              parameters.pad_mode)
+    valid = indices >= 0
+    read_start = int(indices[valid].min())
+    read_stop = int(indices[valid].max()) + 1
+    samples = _read_samples(segments, read_start, read_stop)
+
+    signal = torch.zeros(len(indices), dtype=samples.dtype)
+    signal[torch.from_numpy(valid)] = samples[torch.from_numpy(indices[valid] -
+                                                                read_start)]
+    return block_calculator(signal)
+
+
+def compute_frames_in_blocks(segments: List[AudioSegment],
+                             parameters: STFTParameters,
+                             frame_start: int,
+                             frame_stop: int,
+                             block_frames: int) -> np.ndarray:
+    """Compute spectrogram frames [`frame_start`, `frame_stop`) block by block.
+
+    This function is executed by worker processes.
+    """
+    block_calculator = get_block_calculator(parameters)
+    spec = np.empty((parameters.n_fft // 2 + 1, frame_stop - frame_start),
+                    dtype=np.float32)
+    for block_start in range(frame_start, frame_stop, block_frames):
+        block_stop = min(block_start + block_frames, frame_stop)
+        spec[:, block_start - frame_start:block_stop - frame_start] = compute_frames(
+            segments, parameters, block_calculator, block_start, block_stop).numpy()
+    return spec
+
+
+def split_frames_by_segments(segments: List[AudioSegment],
+                             parameters: STFTParameters,
+                             max_frames: int) -> List[Tuple[int, int]]:
+    """Split all spectrogram frames into ranges that can be computed in parallel.
+
+    Each frame is assigned to the file containing the center of its window, so
+    every range needs to decode (apart from the window overlap) a single file.
+    Ranges longer than `max_frames` are split further.
+    """
+    frame_count = get_frame_count(parameters,
+                                  sum(segment.num_frames for segment in segments))
+    boundaries = []
+    segment_start = 0
+    for segment in segments:
+        first_frame = math.ceil((segment_start + parameters.padding -
+                                 parameters.n_fft // 2) / parameters.hop_length)
+        boundaries.append(min(max(first_frame, 0), frame_count))
+        segment_start += segment.num_frames
+    boundaries.append(frame_count)
+
+    ranges = []
+    for range_start, range_stop in zip(boundaries[:-1], boundaries[1:]):
+        for start in range(range_start, range_stop, max_frames):
+            ranges.append((start, min(start + max_frames, range_stop)))
+    return ranges
+
+
+def get_resampled_length(num_frames: int, orig_freq: int, new_freq: int) -> int:
+    return -(-num_frames * new_freq // orig_freq)
+
+
+def resample_segment(segment: AudioSegment,
+                     target_path: Path,
+                     sample_rate: int,
+                     block_samples: int = RESAMPLE_BLOCK_SAMPLES):
+    """Resample `segment` to `sample_rate` and save it as a `.npy` file.
+
+    The audio is resampled with a polyphase windowed sinc filter in blocks
+    long enough to be vectorized, but never decoded at once. Blocks are
+    extended with the filter's context, so the result is the same as if the
+    whole file was resampled with `torchaudio.functional.resample`.
+
+    This function is executed by worker processes.
+    """
+    gcd = math.gcd(segment.sample_rate, sample_rate)
+    orig_freq, new_freq = segment.sample_rate // gcd, sample_rate // gcd
+    filter_width = math.ceil(RESAMPLE_LOWPASS_FILTER_WIDTH * orig_freq /
+                             (min(orig_freq, new_freq) * RESAMPLE_ROLLOFF))
+    # Block boundaries must be multiples of `orig_freq` to be aligned with
+    # output samples.
+    context = orig_freq * (math.ceil(filter_width / orig_freq) + 1)
+    block_samples = orig_freq * max(block_samples // orig_freq, 1)
+
+    output_length = get_resampled_length(segment.num_frames, orig_freq, new_freq)
+    partial_path = target_path.with_suffix(".partial.npy")
+    resampled = np.lib.format.open_memmap(partial_path,
+                                          mode="w+",
+                                          dtype=np.float32,
+                                          shape=(output_length,))
+    for start in range(0, segment.num_frames, block_samples):
+        stop = min(start + block_samples, segment.num_frames)
+        read_start = max(start - context, 0)
+        read_stop = min(stop + context, segment.num_frames)
+        signal = torch.nn.functional.pad(
+            _read_samples([segment], read_start, read_stop),
+            (context - (start - read_start), context - (read_stop - stop)),
+        )
+        block = torchaudio.functional.resample(
+            signal,
+            orig_freq,
+            new_freq,
+            lowpass_filter_width=RESAMPLE_LOWPASS_FILTER_WIDTH,
+            rolloff=RESAMPLE_ROLLOFF,
+        )
+        output_start = start * new_freq // orig_freq
+        output_stop = min(output_start + get_resampled_length(
+            stop - start, orig_freq, new_freq), output_length)
+        block_offset = context * new_freq // orig_freq
+        resampled[output_start:output_stop] = block[block_offset:block_offset +
+                                                    output_stop -
+                                                    output_start].numpy()
+    resampled.flush()
+    del resampled
+    # Renamed once complete, so that partially resampled files are never used.
+    os.replace(partial_path, target_path)
+
+
+def initialize_worker():
+    # Workers are already running in parallel, so each of them uses one thread.
+    torch.set_num_threads(1)
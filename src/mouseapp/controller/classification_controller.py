@@ -4,9 +4,11 @@ from typing import Callable
 
 from mouse.rule_based_classifier.simple_classifier import classify_USVs
 
+from mouseapp.controller import spectrogram_storage
 from mouseapp.controller.utils import run_background_task, process_qt_events
 from mouseapp.model.main_models import MainModel
 from mouseapp.model import constants
+from mouseapp.model.utils import get_annotation_labels, to_squeak_boxes
 
 
 def run_selected_classification(model: MainModel):
@@ -58,7 +60,8 @@ def make_frequency_classification(model: MainModel, callback: Callable):
     threshold = model.settings_model.threshold_model.threshold
     low_label = model.settings_model.threshold_model.label_low
     high_label = model.settings_model.threshold_model.label_high
-    spec_data = model.spectrogram_model.spectrogram_data
+    spec_data = spectrogram_storage.decode_spectrogram(
+        model.spectrogram_model, model.spectrogram_model.spectrogram_data)
 
     # We purposefully make shallow copy here. This way we can iterate over the same
     # annotation list as we have at the beginning of classification even if the original
@@ -66,17 +69,20 @@ def make_frequency_classification(model: MainModel, callback: Callable):
     annotations = copy.copy(model.spectrogram_model.annotation_table_model.annotations)
     classified_squeaks = classify_USVs(
         spec=spec_data,
-        squeak_boxes=[
-            annotation.to_squeak_box(spec_data) for annotation in annotations
-        ],
+        squeak_boxes=to_squeak_boxes(annotations, spec_data),
         threshold=float(threshold),
         low_label=low_label,
         high_label=high_label,
         callback=callback,
     )
 
-    for annotation, squeak_box in zip(annotations, classified_squeaks):
-        annotation.label = squeak_box.label
+    changed_annotations = []
+    for annotation, label, squeak_box in zip(annotations, get_annotation_labels(annotations),
+                                             classified_squeaks):
+        if label != squeak_box.label:
+            annotation.label = squeak_box.label
+            changed_annotations.append(annotation)
 
-    model.spectrogram_model.annotation_table_model.update_selected_column(
-        constants.COL_USV_LABEL_ID)
+    annotation_table_model = model.spectrogram_model.annotation_table_model
+    annotation_table_model.update_cells(annotation_table_model.get_rows(changed_annotations),
+                                        [constants.COL_USV_LABEL_ID])
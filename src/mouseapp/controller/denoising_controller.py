@@ -2,6 +2,7 @@ import copy
 
 from mouse.denoising import denoising
 from mouse.utils.sound_util import SpectrogramData, clip_spectrogram
+from mouseapp.controller import spectrogram_storage
 from mouseapp.model.main_models import MainModel
 from mouseapp.model.settings.utils import Denoising
 
@@ -39,8 +40,8 @@ def apply_noise_gate_filter(model: MainModel, spectrogram: SpectrogramData):
         raise ValueError()
 
     if use_main_spectrogram:
-        noise_spectrogram = clip_spectrogram(
-            spec=model.spectrogram_model.spectrogram_data,
+        noise_spectrogram = spectrogram_storage.clip_decoded_spectrogram(
+            model.spectrogram_model,
             t_start=kwargs["noise_start"],
             t_end=kwargs["noise_end"],
         )
@@ -61,9 +62,9 @@ def apply_noise_gate_filter(model: MainModel, spectrogram: SpectrogramData):
     )
 
 
-def apply_denoising(model: MainModel, spectrogram):
+def apply_denoising(model: MainModel, spectrogram, inplace: bool = False):
     denoising_method: Denoising = model.settings_model.chosen_denoising_method
-    denoised_spectrogram = copy.deepcopy(spectrogram)
+    denoised_spectrogram = spectrogram if inplace else copy.deepcopy(spectrogram)
 
     if denoising_method == Denoising.BILATERAL:
         apply_bilateral_filter(model, denoised_spectrogram)
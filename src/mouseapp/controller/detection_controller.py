@@ -5,6 +5,7 @@ import numpy as np
 from mouse import segmentation
 from mouse.nn_detection import neural_network
 from mouse.utils.sound_util import SpectrogramData
+from mouseapp.controller import spectrogram_storage
 from mouseapp.controller.denoising_controller import apply_denoising
 from mouseapp.controller.main_controller import set_visible_annotations
 from mouseapp.controller.utils import process_qt_events, run_background_task, warn_user
@@ -59,15 +60,11 @@ def _run_GAC(model: MainModel, callback: Callable, spectrogram: SpectrogramData)
         detection_str = str(model.settings_model.gac_model)
 
         method_str = denoising_str + detection_str
-        annotations = list(
-            map(
-                lambda box: Annotation.from_squeak_box(
-                    box,
-                    spec_data=spectrogram,
-                    table_data={constants.COL_DETECTION_METHOD: method_str},
-                ),
-                detections,
-            ))
+        annotations = Annotation.from_squeak_boxes(
+            detections,
+            spec_data=spectrogram,
+            table_data={constants.COL_DETECTION_METHOD: method_str},
+        )
         model.spectrogram_model.annotation_table_model.append_annotations(annotations)
     finally:
         model.spectrogram_model.progressbar_exists = None
@@ -111,15 +108,11 @@ def _run_NN(model: MainModel, callback: Callable, spectrogram: SpectrogramData):
         detection_str = str(model.settings_model.nn_model)
 
         method_str = denoising_str + detection_str
-        annotations = list(
-            map(
-                lambda box: Annotation.from_squeak_box(
-                    box,
-                    spec_data=spectrogram,
-                    table_data={constants.COL_DETECTION_METHOD: method_str},
-                ),
-                detections,
-            ))
+        annotations = Annotation.from_squeak_boxes(
+            detections,
+            spec_data=spectrogram,
+            table_data={constants.COL_DETECTION_METHOD: method_str},
+        )
         model.spectrogram_model.annotation_table_model.append_annotations(annotations)
     finally:
         model.spectrogram_model.progressbar_exists = None
@@ -156,11 +149,17 @@ def process_spectrogram(model: MainModel):
                     warn_user(model, "There is no audio to run detection on!")
                     return
 
+                decoded_spectrogram = spectrogram_storage.decode_spectrogram(
+                    model.spectrogram_model, spectrogram)
                 chosen_denoising = model.settings_model.chosen_denoising_method
                 if chosen_denoising != Denoising.NO_FILTER:
-                    denoised_spectrogram = apply_denoising(model, spectrogram)
+                    # Decoded copy of a compact spectrogram can be denoised in place.
+                    denoised_spectrogram = apply_denoising(
+                        model,
+                        decoded_spectrogram,
+                        inplace=decoded_spectrogram is not spectrogram)
                 else:
-                    denoised_spectrogram = spectrogram
+                    denoised_spectrogram = decoded_spectrogram
 
                 run_detection(model, denoised_spectrogram)
             finally:
@@ -1,11 +1,14 @@
 import logging
 from typing import List, Callable
 
+import numpy as np
 from mouse.classifier import cnn_classifier
 from mouse.utils.sound_util import SpectrogramData
+from mouseapp.controller import spectrogram_storage
 from mouseapp.controller.denoising_controller import apply_denoising
+from mouseapp.model import constants
 from mouseapp.model.main_models import MainModel
-from mouseapp.model.utils import Annotation
+from mouseapp.model.utils import Annotation, to_squeak_boxes
 from mouseapp.controller.utils import process_qt_events, run_background_task, warn_user
 from mouseapp.model.settings.utils import Denoising
 
@@ -15,11 +18,17 @@ def _run_NN_filtering(model: MainModel):
     if spectrogram is None:
         warn_user(model, "There is no audio to run annotation filtering on!")
         return
+    decoded_spectrogram = spectrogram_storage.decode_spectrogram(
+        model.spectrogram_model, spectrogram)
     chosen_denoising = model.settings_model.chosen_denoising_method
     if chosen_denoising != Denoising.NO_FILTER:
-        denoised_spectrogram = apply_denoising(model, spectrogram)
+        # Decoded copy of a compact spectrogram can be denoised in place.
+        denoised_spectrogram = apply_denoising(
+            model,
+            decoded_spectrogram,
+            inplace=decoded_spectrogram is not spectrogram)
     else:
-        denoised_spectrogram = spectrogram
+        denoised_spectrogram = decoded_spectrogram
 
     annotations = model.spectrogram_model.annotation_table_model.annotations
 
@@ -41,7 +50,7 @@ def _run_NN_filtering(model: MainModel):
                 model.spectrogram_model.progressbar_secondary_text = "Checking annotations..."
             _callback(None)
 
-        squeak_boxes = [a.to_squeak_box(spectrogram) for a in annotations]
+        squeak_boxes = to_squeak_boxes(annotations, spectrogram)
         squeak_boxes = cnn_classifier.classify_USVs(
             denoised_spectrogram,
             squeak_boxes,
@@ -54,11 +63,8 @@ def _run_NN_filtering(model: MainModel):
             silent=True)
 
         # Assuming that the model returns squeak boxes in the same order.
-        for i, (annotation, squeak_box) in enumerate(zip(annotations, squeak_boxes)):
-            if squeak_box.label == 'noise':
-                model.spectrogram_model.annotation_table_model.check_annotation(i, True)
-                model.spectrogram_model.annotation_table_model.update_selected_field(
-                    i, 0)
+        model.spectrogram_model.annotation_table_model.check_annotations(
+            [i for i, squeak_box in enumerate(squeak_boxes) if squeak_box.label == 'noise'])
     finally:
         model.spectrogram_model.progressbar_exists = None
         model.spectrogram_model.progressbar_primary_text = None
@@ -68,12 +74,12 @@ def _run_NN_filtering(model: MainModel):
 
 
 def _run_frequency_filtering(model: MainModel):
-    annotations = model.spectrogram_model.annotation_table_model.annotations
+    store = model.spectrogram_model.annotation_table_model.store
     threshold = model.settings_model.filtering_model.frequency_threshold
-    for i, annotation in enumerate(annotations):
-        if 0.5 * (annotation.freq_start + annotation.freq_end) <= threshold:
-            model.spectrogram_model.annotation_table_model.check_annotation(i, True)
-            model.spectrogram_model.annotation_table_model.update_selected_field(i, 0)
+    mean_freqs = 0.5 * (store.get_column(constants.COL_LOW_FREQ) +
+                        store.get_column(constants.COL_HIGH_FREQ))
+    model.spectrogram_model.annotation_table_model.check_annotations(
+        np.flatnonzero(mean_freqs <= threshold))
 
 
 def filter_annotations(model: MainModel):
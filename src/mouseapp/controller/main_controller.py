@@ -2,23 +2,32 @@
 
 Only functions related to `MainWindow`, `SpectrogramTab` and `ProjectTab`
 should be kept here, unless a specialized file is already exists. Those files
-include: `detection_controller.py`.
+include: `detection_controller.py` and `spectrogram_controller.py`.
 """
+import logging
 import os
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union, Optional, List
+from typing import Union, List
 
 import numpy as np
 import pandas as pd
 import torch
-import torchaudio
 from PySide6 import QtCore
 from mouse.utils import sound_util
-from mouseapp.controller.utils import warn_user, float_convert
+from mouseapp.controller import audio_stream, spectrogram_controller, spectrogram_storage
+from mouseapp.controller.utils import float_convert, run_background_task, warn_user
 from mouseapp.model import constants
+from mouseapp.model.latency import latency_recorder
 from mouseapp.model.main_models import MainModel
-from mouseapp.model.utils import Annotation
+from mouseapp.model.settings.utils import SpectrogramRendering
+from mouseapp.model.tile_cache import DISPLAY_VMAX, DisplayTile, TileCache, get_color_indices
+from mouseapp.model.utils import Annotation, annotations_to_pixels, get_annotation_bounds, pixels_to_bounds
+
+# Prefetching runs in a plain Python thread, which is joined at exit, unlike
+# a `QThread` that mustn't be destroyed while it's running.
+_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
 
 
 def set_project_name(model: MainModel, name: str):
@@ -127,120 +136,234 @@ def load_audio_files(model: MainModel, files: Union[str, list], folder=False):
     else:
         audio_files = [Path(file) for file in files]
     audio_files.sort()
+    model.project_model.audio_metadata = audio_stream.update_metadata_index(
+        audio_files, model.project_model.audio_metadata, skip_unreadable=True)
     model.project_model.audio_files = audio_files
 
-
-def _generate_spectrogram(model: MainModel, signal_data: Optional[torch.Tensor]):
-    spectrogram_model = model.spectrogram_model
-    if spectrogram_model.spectrogram_calculator is None:
-        spectrogram_calculator = torchaudio.transforms.Spectrogram(
-            n_fft=spectrogram_model.n_fft,
-            win_length=spectrogram_model.win_length,
-            hop_length=spectrogram_model.hop_length,
-            center=spectrogram_model.center,
-            pad_mode=spectrogram_model.pad_mode,
-            power=spectrogram_model.power,
-        )
-        spectrogram_model.spectrogram_calculator = spectrogram_calculator
-
-    if signal_data is not None:
-        spectrogram_data = sound_util.spectrogram(
-            signal_data,
-            sample_rate=spectrogram_model.sample_rate,
-            spec_calculator=spectrogram_model.spectrogram_calculator,
-            n_fft=spectrogram_model.n_fft,
-            win_length=spectrogram_model.win_length,
-            hop_length=spectrogram_model.hop_length,
-            power=spectrogram_model.power,
-        )
-    else:
-        spectrogram_data = None
-    spectrogram_model.spectrogram_data = spectrogram_data
+    sample_rates = sorted({
+        metadata.sample_rate
+        for metadata in model.project_model.audio_metadata.values()
+    })
+    if len(sample_rates) > 1:
+        warn_user(
+            model,
+            f"Audio files have different sample rates "
+            f"({', '.join(str(rate) for rate in sample_rates)} Hz). They will be "
+            f"resampled to {sample_rates[0]} Hz.")
 
 
 def update_signal_data(model: MainModel, audio_files: List[Path]):
-    signal_data = []
-    cur_sample_rate = None
-    spectrogram_model = model.spectrogram_model
-    for file in audio_files:
-        waveform, sample_rate = torchaudio.load(file)
-        if cur_sample_rate is not None:
-            if cur_sample_rate != sample_rate:
-                # TODO(#71): resample audio files to lowest sample rate
-                warn_user(
-                    model,
-                    "Files have different sample rate which may"
-                    " lead to unexpected behavior! 😠",
-                )
-        else:
-            cur_sample_rate = sample_rate
-        signal_data.append(waveform.squeeze())
-    if len(signal_data) > 0:
-        signal_data = torch.cat(signal_data)
-    else:
-        signal_data = None
-    spectrogram_model.sample_rate = cur_sample_rate
-    _generate_spectrogram(model, signal_data)
+    """Compute spectrogram of `audio_files` in the background.
 
+    The spectrogram is displayed while it's computed and progress is shown in
+    the progressbar. Detection, classification and filtering are disabled
+    until the spectrogram is ready.
+    """
+    spectrogram_model = model.spectrogram_model
 
-def _align_time_mask(prev_time_mask: np.ndarray, time_mask: np.ndarray):
-    if prev_time_mask is None:
-        return time_mask
+    def _callback(computed_frames: int, frame_count: int):
+        spectrogram_model.progressbar_progress = int(computed_frames / frame_count *
+                                                     100)
+
+    def _generate_spectrogram():
+        # Waits for a task using the previous spectrogram to finish.
+        spectrogram_model.main_spectrogram_mutex.lock()
+        try:
+            spectrogram_model.detection_allowed = False
+            spectrogram_model.classification_allowed = False
+            spectrogram_model.filtering_allowed = False
+            spectrogram_model.progressbar_exists = True
+            spectrogram_model.progressbar_primary_text = "Loading audio:"
+            spectrogram_model.progressbar_count = 0
+            spectrogram_model.progressbar_secondary_text = None
+            spectrogram_controller.generate_spectrogram(model,
+                                                        audio_files,
+                                                        callback=_callback,
+                                                        progressive=True)
+        finally:
+            spectrogram_model.progressbar_exists = None
+            spectrogram_model.progressbar_primary_text = None
+            spectrogram_model.progressbar_count = None
+            spectrogram_model.progressbar_progress = None
+            spectrogram_model.background_task = None
+            spectrogram_model.detection_allowed = True
+            spectrogram_model.classification_allowed = True
+            spectrogram_model.filtering_allowed = True
+            spectrogram_model.main_spectrogram_mutex.unlock()
+
+    task = run_background_task(main_model=model,
+                               task=_generate_spectrogram,
+                               can_be_stopped=False)
+    spectrogram_model.background_task = task
+    return task
+
+
+def _select_pyramid_level(model: MainModel) -> int:
+    """Select the coarsest pyramid level with at least one frame per pixel."""
+    spectrogram_model = model.spectrogram_model
+    if spectrogram_model.viewport_width is None:
+        return 0
+
+    display_size = spectrogram_model.spectrogram_display_size / 1000
+    level = 0
+    for coarser_level in spectrogram_model.spectrogram_pyramid:
+        times = coarser_level.times
+        if len(times) < 2:
+            break
+        if display_size / (times[1] - times[0]) < spectrogram_model.viewport_width:
+            break
+        level += 1
+    return level
+
+
+def set_viewport_width(model: MainModel, width: int):
+    spectrogram_model = model.spectrogram_model
+    spectrogram_model.viewport_width = width
+    chunk_data = spectrogram_model.current_spectrogram_chunk_data
+    if (chunk_data is not None and
+            _select_pyramid_level(model) != spectrogram_model.displayed_level):
+        update_from_slider_position(model, chunk_data.times[0] * 1000)
 
-    time_mask_size = np.sum(prev_time_mask)
-    size = np.sum(time_mask)
-    if size > time_mask_size:
-        idx = time_mask.nonzero()[0][0]
-        time_mask[idx:idx + (size - time_mask_size) + 1] = 0
-    elif size < time_mask_size:
-        idx = time_mask.nonzero()[0][-1]
-        time_mask[idx:idx + (time_mask_size - size) + 1] = 1
-    return time_mask
 
+def _get_time_slice(model: MainModel, start_time: float, end_time: float) -> slice:
+    """Find frames with times in [`start_time`, `end_time`] with binary search.
 
-def _get_time_mask(model: MainModel, start_time: float, end_time: float):
+    The slice keeps the width of the previous one, so that chunks of the same
+    size are displayed while scrolling.
+    """
     spectrogram_model = model.spectrogram_model
-    spec_time = spectrogram_model.spectrogram_data.times
-    time_mask = np.logical_and(spec_time >= start_time, spec_time <= end_time)
-    time_mask = _align_time_mask(spectrogram_model.time_mask, time_mask)
-    return time_mask
+    spec_time = spectrogram_model.displayed_spectrogram_data.times
+    start = int(np.searchsorted(spec_time, start_time, side="left"))
+    stop = int(np.searchsorted(spec_time, end_time, side="right"))
+    prev_time_slice = spectrogram_model.time_slice
+    if prev_time_slice is not None:
+        stop = min(start + prev_time_slice.stop - prev_time_slice.start, len(spec_time))
+    return slice(start, stop)
+
+
+def _prepare_tile(model: MainModel, spectrogram_data: sound_util.SpectrogramData,
+                  time_slice: slice) -> DisplayTile:
+    """Get chunk of `spectrogram_data` ready to be displayed.
+
+    The chunk is copied to contiguous 32-bit floats, which reads it from disk
+    if the spectrogram is memory-mapped, and it's normalized if it's drawn as
+    an image. Drawing the tile doesn't have to do any of that again.
+    """
+    chunk = sound_util.SpectrogramData(
+        spec=spectrogram_data.spec[:, time_slice],
+        times=np.array(spectrogram_data.times[time_slice]),
+        freqs=spectrogram_data.freqs,
+    )
+    if chunk.spec.dtype == torch.float32:
+        spec = chunk.spec.clone(memory_format=torch.contiguous_format)
+    else:
+        # Compact chunks are copied while they are decoded.
+        spec = spectrogram_storage.decode_spectrogram(model.spectrogram_model, chunk).spec.contiguous()
+    chunk = sound_util.SpectrogramData(spec=spec, times=chunk.times, freqs=chunk.freqs)
+
+    color_indices = None
+    if model.settings_model.spectrogram_settings_model.rendering == SpectrogramRendering.IMAGE:
+        color_indices = get_color_indices(chunk.spec.numpy(), vmax=DISPLAY_VMAX)
+    return DisplayTile(chunk, color_indices)
 
 
+def _get_tile_cache(model: MainModel) -> TileCache:
+    tile_cache = model.spectrogram_model.tile_cache
+    cache_size = model.settings_model.spectrogram_settings_model.display_cache_size
+    if tile_cache.max_bytes != cache_size * 2**20:
+        tile_cache.max_bytes = cache_size * 2**20
+    return tile_cache
+
+
+@latency_recorder.timed("_set_current_spectrogram_chunk")
 def _set_current_spectrogram_chunk(model: MainModel, start_time: float):
     spectrogram_model = model.spectrogram_model
-    time_mask = _get_time_mask(
+    level = _select_pyramid_level(model)
+    if level != spectrogram_model.displayed_level:
+        spectrogram_model.displayed_level = level
+        spectrogram_model.time_slice = None  # width differs between levels
+    spectrogram_data = spectrogram_model.displayed_spectrogram_data
+    time_slice = _get_time_slice(
         model,
         start_time,
         start_time + spectrogram_model.spectrogram_display_size / 1000,
     )
-    spectrogram_model.time_mask = time_mask
-    current_spectrogram_chunk_data = sound_util.SpectrogramData(
-        spec=spectrogram_model.spectrogram_data.spec[:, time_mask],
-        times=spectrogram_model.spectrogram_data.times[time_mask],
-        freqs=spectrogram_model.spectrogram_data.freqs,
-    )
-    spectrogram_model.current_spectrogram_chunk_data = current_spectrogram_chunk_data
+    spectrogram_model.time_slice = time_slice
 
+    tile_cache = _get_tile_cache(model)
+    key = (level, time_slice.start, time_slice.stop)
+    display_tile = tile_cache.get(key)
+    if display_tile is None:
+        display_tile = _prepare_tile(model, spectrogram_data, time_slice)
+        tile_cache.put(key, display_tile, tile_cache.generation)
+    spectrogram_model.current_display_tile = display_tile
 
+
+def prefetch_spectrogram_chunks(model: MainModel, positions: List[float]):
+    """Prepare chunks displayed at slider `positions` in the background.
+
+    Chunks are taken from the currently displayed pyramid level and have the
+    width of the current chunk.
+    """
+    spectrogram_model = model.spectrogram_model
+    current_time_slice = spectrogram_model.time_slice
+    if spectrogram_model.spectrogram_data is None or current_time_slice is None:
+        return
+
+    level = spectrogram_model.displayed_level
+    spectrogram_data = spectrogram_model.displayed_spectrogram_data
+    width = current_time_slice.stop - current_time_slice.start
+    frame_count = len(spectrogram_data.times)
+    starts = np.searchsorted(spectrogram_data.times,
+                             np.asarray(positions, dtype=np.float64) / 1000,
+                             side="left")
+    time_slices = {
+        (level, int(start), min(int(start) + width, frame_count)):
+            slice(int(start), min(int(start) + width, frame_count))
+        for start in starts
+        if start < frame_count
+    }
+
+    tile_cache = _get_tile_cache(model)
+    generation = tile_cache.generation
+    missing_keys = tile_cache.reserve(time_slices.keys())
+    if not missing_keys:
+        return
+
+    def _prefetch():
+        try:
+            for key in missing_keys:
+                tile_cache.put(key,
+                               _prepare_tile(model, spectrogram_data, time_slices[key]),
+                               generation)
+        except Exception:  # noqa
+            logging.exception("Failed to prefetch spectrogram chunks")
+        finally:
+            tile_cache.release(missing_keys)
+
+    _prefetch_executor.submit(_prefetch)
+
+
+@latency_recorder.timed("set_visible_annotations")
 def set_visible_annotations(model: MainModel):
     spectrogram_model = model.spectrogram_model
-    visible_annotations = []
     (
         display_start_time,
         display_end_time,
     ) = spectrogram_model.current_spectrogram_chunk_data.times[[0, -1]]
-    for annotation in spectrogram_model.annotation_table_model.annotations:
-        if ((display_start_time <= annotation.time_start < display_end_time) or
-            (display_start_time <= annotation.time_end < display_end_time) or
-            (annotation.time_start <= display_start_time and
-             display_end_time <= annotation.time_end)):
-            visible_annotations.append(annotation)
-    spectrogram_model.visible_annotations = visible_annotations
+    spectrogram_model.visible_annotations = (
+        spectrogram_model.annotation_table_model.get_annotations_between(
+            display_start_time, display_end_time))
 
 
+@latency_recorder.timed("update_from_slider_position")
 def update_from_slider_position(model: MainModel, position: int):
     _set_current_spectrogram_chunk(model, position / 1000)
     set_visible_annotations(model)
+    # Previous and next pages are likely to be displayed soon.
+    page_size = model.spectrogram_model.spectrogram_display_size
+    prefetch_spectrogram_chunks(model,
+                                [max(0, position - page_size), position + page_size])
 
 
 def remove_audio_file(model: MainModel, file_name: str):
@@ -314,6 +437,20 @@ def _handle_change_in_check_state(model: MainModel, new_check_state: bool, row_i
             row_id].checked = False
 
 
+def _get_pixel_scales(spectrogram_model) -> np.ndarray:
+    """Get numbers of frames and frequency rows in a pixel of the displayed level."""
+    scale = spectrogram_controller.PYRAMID_FACTOR**spectrogram_model.displayed_level
+    return np.array([scale, scale, 1, 1])
+
+
+def _frames_to_bounds(frames: np.ndarray, spectrogram_data: sound_util.SpectrogramData) -> np.ndarray:
+    """Get bounds of `[t_start, t_end, freq_start, freq_end]` frames, clipped to the spectrogram."""
+    frames = np.array(frames, dtype=np.int64)
+    frames[:2] = np.clip(frames[:2], 0, len(spectrogram_data.times) - 1)
+    frames[2:] = np.clip(frames[2:], 0, len(spectrogram_data.freqs) - 1)
+    return pixels_to_bounds(frames, spectrogram_data)[0]
+
+
 def update_annotation(
     model: MainModel,
     annotation,
@@ -322,20 +459,29 @@ def update_annotation(
     time_pixel_end,
     freq_pixel_end,
 ):
-    offset = model.spectrogram_model.time_mask.nonzero()[0][0]
-    time_pixel_start += offset
-    time_pixel_end += offset
-
-    spectrogram_data = model.spectrogram_model.spectrogram_data
-    time_start, time_end = spectrogram_data.times[[time_pixel_start, time_pixel_end]]
-    freq_start, freq_end = spectrogram_data.freqs[[freq_pixel_start, freq_pixel_end]]
-
-    annotation.time_start = time_start
-    annotation.time_end = time_end
-    annotation.freq_start = freq_start
-    annotation.freq_end = freq_end
-    # Next line is a potential place for efficiency improvement.
-    model.spectrogram_model.annotation_table_model.update_all_displayed_data()
+    spectrogram_model = model.spectrogram_model
+    offset = spectrogram_model.time_slice.start
+    pixels = np.array([time_pixel_start + offset, time_pixel_end + offset, freq_pixel_start, freq_pixel_end])
+
+    # Pixels of a coarse pyramid level span several frames, so moved sides are
+    # shifted by frames of the full resolution spectrogram and the other sides
+    # keep their bounds.
+    displayed_data = spectrogram_model.displayed_spectrogram_data
+    shifts = pixels - annotations_to_pixels([annotation], displayed_data.times, displayed_data.freqs)[0]
+    spectrogram_data = spectrogram_model.spectrogram_data
+    frames = annotations_to_pixels([annotation], spectrogram_data.times, spectrogram_data.freqs)[0]
+    bounds = np.where(shifts == 0,
+                      get_annotation_bounds([annotation])[0],
+                      _frames_to_bounds(frames + shifts * _get_pixel_scales(spectrogram_model), spectrogram_data))
+    time_start, time_end, freq_start, freq_end = bounds.tolist()
+
+    spectrogram_model.annotation_table_model.update_annotation_values(
+        annotation, {
+            constants.COL_BEGIN_TIME: time_start,
+            constants.COL_END_TIME: time_end,
+            constants.COL_LOW_FREQ: freq_start,
+            constants.COL_HIGH_FREQ: freq_end,
+        })
 
 
 def add_new_annotation(model: MainModel,
@@ -343,13 +489,12 @@ def add_new_annotation(model: MainModel,
                        freq_pixel_start,
                        time_pixel_end,
                        freq_pixel_end):
-    offset = model.spectrogram_model.time_mask.nonzero()[0][0]
-    time_pixel_start += offset
-    time_pixel_end += offset
+    spectrogram_model = model.spectrogram_model
+    offset = spectrogram_model.time_slice.start
+    pixels = np.array([time_pixel_start + offset, time_pixel_end + offset, freq_pixel_start, freq_pixel_end])
 
-    spectrogram_data = model.spectrogram_model.spectrogram_data
-    time_start, time_end = spectrogram_data.times[[time_pixel_start, time_pixel_end]]
-    freq_start, freq_end = spectrogram_data.freqs[[freq_pixel_start, freq_pixel_end]]
+    time_start, time_end, freq_start, freq_end = _frames_to_bounds(
+        pixels * _get_pixel_scales(spectrogram_model), spectrogram_model.spectrogram_data).tolist()
     table_data = {
         constants.COL_BEGIN_TIME: time_start,
         constants.COL_END_TIME: time_end,
@@ -373,28 +518,32 @@ def add_new_annotation(model: MainModel,
 
 
 def highlight_annotation(model: MainModel, annotation: Annotation):
-    annotations = model.spectrogram_model.annotation_table_model.annotations
-    for row_id, a in enumerate(annotations):
-        if a == annotation:
-            model.spectrogram_model.annotation_table_model.highlight_row.emit(row_id)
+    table_model = model.spectrogram_model.annotation_table_model
+    row = table_model.get_row(annotation)
+    if row is not None:
+        table_model.highlight_row.emit(row)
 
 
-def export_annotations(model: MainModel, filename: Path):
-    annotations = model.spectrogram_model.annotation_table_model.annotations
-    project_model = model.project_model
+def _add_file_time_columns(model: MainModel, annotations_df: pd.DataFrame):
+    """Add columns locating annotations in the audio files of the project."""
+    timeline = model.spectrogram_model.timeline
+    if timeline is None or len(annotations_df) == 0:
+        return
 
-    # Get keys
-    default_dict_key_set = set()
-    for annotation in annotations:
-        default_dict_key_set.update(annotation.table_data.keys())
+    begin_times = annotations_df[constants.COL_BEGIN_TIME].to_numpy(dtype=np.float64)
+    end_times = annotations_df[constants.COL_END_TIME].to_numpy(dtype=np.float64)
+    file_indices, file_begin_times = timeline.locate_times(begin_times)
+    file_names = np.array([str(file) for file in timeline.audio_files])
 
-    annotations_dict = {k: [] for k in default_dict_key_set}
+    annotations_df[constants.COL_FILE] = file_names[file_indices]
+    annotations_df[constants.COL_FILE_BEGIN_TIME] = file_begin_times
+    annotations_df[constants.COL_FILE_END_TIME] = (
+        end_times - timeline.file_start_times()[file_indices])
 
-    for annotation in annotations:
-        for k in default_dict_key_set:
-            annotations_dict[k].append(annotation.table_data[k])
 
-    annotations_df = pd.DataFrame.from_dict(annotations_dict)
+def export_annotations(model: MainModel, filename: Path):
+    project_model = model.project_model
+    annotations_df = model.spectrogram_model.annotation_table_model.store.to_dataframe()
 
     columns_order = [
         constants.COL_BEGIN_TIME,
@@ -405,8 +554,9 @@ def export_annotations(model: MainModel, filename: Path):
     ]
 
     # Set proper columns order
-    columns_order += list(default_dict_key_set - set(columns_order))
+    columns_order += [column for column in annotations_df.columns if column not in columns_order]
     annotations_df = annotations_df.reindex(columns=columns_order)
+    _add_file_time_columns(model, annotations_df)
 
     type_map = {
         "Integer":
@@ -433,19 +583,15 @@ def export_annotations(model: MainModel, filename: Path):
 
 
 def delete_selected_annotations(model: MainModel):
-    n = len(model.spectrogram_model.annotation_table_model.annotations)
-    removed_annotations = set()
-    for i, annotation in enumerate(
-        model.spectrogram_model.annotation_table_model.annotations[::-1]
-    ):
-        id = n - i - 1
-        if annotation.checked:
-            model.spectrogram_model.annotation_table_model.removeRows(id)
-            removed_annotations.add(annotation)
+    annotation_table_model = model.spectrogram_model.annotation_table_model
+    removed_annotations = set(
+        annotation_table_model.remove_annotations(np.flatnonzero(annotation_table_model.store.checked)))
 
     # This will signal the spectrogram as well.
-    model.spectrogram_model.visible_annotations = list(
-        set(model.spectrogram_model.visible_annotations) - removed_annotations)
+    model.spectrogram_model.visible_annotations = [
+        annotation for annotation in model.spectrogram_model.visible_annotations
+        if annotation not in removed_annotations
+    ]
 
     if len(model.spectrogram_model.annotation_table_model.annotations) == 0:
         model.spectrogram_model.annotation_table_model.annotations_column_names = [
@@ -481,3 +627,13 @@ def update_annotation_table_model(model: MainModel, view):
     model.spectrogram_model.annotation_table_model = saved_model.copy_with_view(view)
     saved_model.deleteLater()
     return model.spectrogram_model.annotation_table_model
+
+
+def set_latency_recording(enabled: bool):
+    latency_recorder.enabled = enabled
+    if not enabled:
+        latency_recorder.clear()
+
+
+def export_latencies(filename: Path):
+    latency_recorder.to_csv(filename)
@@ -1,11 +1,18 @@
+import atexit
 import configparser
 import logging
+import shutil
+import tempfile
+import threading
 import warnings
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Set, Tuple
 import pickle
 
+import numpy as np
+import torch
+from mouse.utils.sound_util import SpectrogramData
 from mouseapp.controller.utils import warn_user
 from mouseapp.model.main_models import (
     ApplicationModel,
@@ -16,6 +23,16 @@ from mouseapp.model.main_models import (
 from mouseapp.model.settings.settings_model import SettingsModel
 from mouseapp.model.utils import MouseProject
 
+# Suffix of folders in which spectrogram caches are written before they are complete.
+PARTIAL_CACHE_SUFFIX = ".partial"
+
+# Folders of spectrogram caches which are being written by this process.
+_written_partial_paths: Set[Path] = set()
+_written_partial_paths_lock = threading.Lock()
+
+# Folder of this process caching resampled audio of projects which can't store it.
+_temporary_resample_cache_dir: Optional[Path] = None
+
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 warnings.resetwarnings()
@@ -31,12 +48,43 @@ def _add_mouse_identifier_filename(project_path: Path):
     return project_path.joinpath(".mouse_project.txt")
 
 
+def _add_spectrogram_cache_dirname(project_path: Path):
+    """Add a folder name under which computed spectrograms are cached."""
+    return project_path.joinpath("spectrogram_cache")
+
+
+def _add_resample_cache_dirname(project_path: Path):
+    """Add a folder name under which resampled audio files are cached."""
+    return project_path.joinpath("resample_cache")
+
+
+def _add_cache_complete_filename(cache_path: Path):
+    """Add a filename marking that cache in `cache_path` is complete."""
+    return cache_path.joinpath(".complete")
+
+
 def _is_mouse_project(project_path: Path):
     """Check for existence of a special mouse project file."""
     mouse_unique_file = _add_mouse_identifier_filename(project_path)
     return mouse_unique_file.exists()
 
 
+def _initialize_project_folder(project_path: Path):
+    """Create project folder together with the special mouse project file."""
+    project_path.mkdir(parents=True)
+    _add_mouse_identifier_filename(project_path).touch()
+
+
+def _get_usable_project_path(project_path: Optional[Path]) -> Optional[Path]:
+    """Return `project_path` if it's a saved project caches can be stored in.
+
+    Project folders are created only when projects are saved, never by caches.
+    """
+    if project_path is None or not _is_mouse_project(project_path):
+        return None
+    return project_path
+
+
 def save_project(model: MainModel):
     """Save `model` to a file.
 
@@ -52,9 +100,7 @@ def save_project(model: MainModel):
     project_save_path = _add_project_data_filename(project_path)
 
     if not project_path.exists():
-        # initialize project folder
-        project_path.mkdir(parents=True)
-        _add_mouse_identifier_filename(project_path).touch()
+        _initialize_project_folder(project_path)
 
     # save project's data
     model_dict = model.to_dict()
@@ -94,6 +140,190 @@ def load_project(app_model: ApplicationModel,
         return None
 
 
+def _add_spectrogram_level_filename(cache_path: Path, name: str, level: int):
+    """Add a filename under which `name` array of pyramid `level` is cached."""
+    if level == 0:
+        return cache_path.joinpath(f"{name}.npy")
+    return cache_path.joinpath(f"{name}_{level}.npy")
+
+
+def load_spectrogram_cache(project_path: Optional[Path],
+                           key: str) -> Optional[List[SpectrogramData]]:
+    """Map spectrogram pyramid cached under `key` if it exists.
+
+    Arrays are memory-mapped in copy-on-write mode, so they are read from disk
+    on demand and modifying them never changes the cache.
+    """
+    project_path = _get_usable_project_path(project_path)
+    if project_path is None:
+        return None
+
+    cache_path = _add_spectrogram_cache_dirname(project_path).joinpath(key)
+    if not _add_cache_complete_filename(cache_path).exists():
+        return None
+    levels = []
+    try:
+        freqs = np.load(cache_path.joinpath("freqs.npy"), mmap_mode="c")
+        level = 0
+        while _add_spectrogram_level_filename(cache_path, "spec", level).exists():
+            spec = np.load(_add_spectrogram_level_filename(cache_path, "spec", level),
+                           mmap_mode="c")
+            times = np.load(_add_spectrogram_level_filename(cache_path, "times", level),
+                            mmap_mode="c")
+            levels.append(
+                SpectrogramData(spec=torch.from_numpy(spec), times=times, freqs=freqs))
+            level += 1
+    except Exception as e:
+        logging.warning(f"Spectrogram couldn't be loaded from {cache_path}. "
+                        f"Exception raised: {e}")
+        return None
+    return levels
+
+
+def _remove_cached_spectrogram(cache_path: Path):
+    """Remove cache in `cache_path`, leaving files which are still in use.
+
+    The cache is marked as incomplete first, so its remaining files are never
+    loaded and are removed by a later eviction.
+    """
+    _add_cache_complete_filename(cache_path).unlink(missing_ok=True)
+    shutil.rmtree(cache_path, ignore_errors=True)
+
+
+def _is_partial_cache(cache_path: Path) -> bool:
+    return cache_path.name.endswith(PARTIAL_CACHE_SUFFIX)
+
+
+def create_spectrogram_cache(project_path: Optional[Path],
+                             key: str,
+                             shapes: List[Tuple[int, int]],
+                             dtype: np.dtype = np.float32) -> Optional[List[np.memmap]]:
+    """Create memory-mapped arrays which pyramid levels of `shapes` can be written to.
+
+    Arrays are created in a new temporary folder, which becomes the cache of
+    `key` in `save_spectrogram_cache`. Temporary folders left by interrupted
+    writes are removed first, unless another cache is being written. Returns
+    `None` if the cache can't be created.
+    """
+    project_path = _get_usable_project_path(project_path)
+    if project_path is None:
+        return None
+
+    cache_dir = _add_spectrogram_cache_dirname(project_path)
+    try:
+        cache_dir.mkdir(exist_ok=True)
+        with _written_partial_paths_lock:
+            if not _written_partial_paths:
+                for cached_path in cache_dir.iterdir():
+                    if _is_partial_cache(cached_path):
+                        shutil.rmtree(cached_path, ignore_errors=True)
+            partial_path = Path(
+                tempfile.mkdtemp(prefix=f"{key}.", suffix=PARTIAL_CACHE_SUFFIX, dir=cache_dir))
+            _written_partial_paths.add(partial_path)
+        return [
+            np.lib.format.open_memmap(
+                _add_spectrogram_level_filename(partial_path, "spec", level),
+                mode="w+",
+                dtype=dtype,
+                shape=shape,
+            ) for level, shape in enumerate(shapes)
+        ]
+    except OSError as e:
+        logging.warning(f"Spectrogram cache couldn't be created in {cache_dir}. "
+                        f"Exception raised: {e}")
+        return None
+
+
+def _finish_partial_cache(partial_path: Path):
+    with _written_partial_paths_lock:
+        _written_partial_paths.discard(partial_path)
+
+
+def discard_spectrogram_cache(specs: List[np.memmap]):
+    """Remove spectrogram pyramid created with `create_spectrogram_cache`, which won't be saved."""
+    partial_path = Path(specs[0].filename).parent
+    _finish_partial_cache(partial_path)
+    shutil.rmtree(partial_path, ignore_errors=True)
+
+
+def save_spectrogram_cache(project_path: Path,
+                           key: str,
+                           specs: List[np.memmap],
+                           times: List[np.ndarray],
+                           freqs: np.ndarray,
+                           keep: Set[str] = frozenset()):
+    """Finish writing spectrogram pyramid created with `create_spectrogram_cache`.
+
+    `specs` and `times` contain arrays of consecutive pyramid levels. The
+    written folder is renamed to the cache of `key`, then complete caches of
+    other keys than `keep` are evicted. Folders which are still being written
+    are left alone.
+    """
+    cache_dir = _add_spectrogram_cache_dirname(project_path)
+    partial_path = Path(specs[0].filename).parent
+    cache_path = cache_dir.joinpath(key)
+    try:
+        for level, (spec, level_times) in enumerate(zip(specs, times)):
+            spec.flush()
+            np.save(_add_spectrogram_level_filename(partial_path, "times", level),
+                    level_times)
+        np.save(partial_path.joinpath("freqs.npy"), freqs)
+        # Written last, so that only complete spectrograms are ever loaded.
+        _add_cache_complete_filename(partial_path).touch()
+        if cache_path.exists():
+            _remove_cached_spectrogram(cache_path)
+        partial_path.rename(cache_path)
+    except OSError as e:
+        logging.warning(f"Spectrogram cache couldn't be saved in {cache_path}. "
+                        f"Exception raised: {e}")
+        return
+    finally:
+        _finish_partial_cache(partial_path)
+
+    for cached_path in cache_dir.iterdir():
+        if (cached_path.name != key and cached_path.name not in keep and
+                not _is_partial_cache(cached_path)):
+            _remove_cached_spectrogram(cached_path)
+
+
+def _get_temporary_resample_cache_dir() -> Path:
+    """Return temporary folder of resampled audio, removed when the app exits."""
+    global _temporary_resample_cache_dir
+    if _temporary_resample_cache_dir is None:
+        _temporary_resample_cache_dir = Path(tempfile.mkdtemp(prefix="mouse_resample_cache."))
+        atexit.register(shutil.rmtree, _temporary_resample_cache_dir, ignore_errors=True)
+    return _temporary_resample_cache_dir
+
+
+def _evict_resampled_audio(cache_dir: Path, keys: Set[str]):
+    for cached_file in cache_dir.iterdir():
+        if cached_file.name.split(".")[0] not in keys:
+            cached_file.unlink()
+
+
+def get_resample_cache(project_path: Optional[Path],
+                       keys: Set[str]) -> Path:
+    """Return folder in which audio files resampled under `keys` are cached.
+
+    If the project can't store them, a temporary folder of this process is
+    used. Files cached under other keys are removed.
+    """
+    project_path = _get_usable_project_path(project_path)
+    if project_path is not None:
+        cache_dir = _add_resample_cache_dirname(project_path)
+        try:
+            cache_dir.mkdir(exist_ok=True)
+            _evict_resampled_audio(cache_dir, keys)
+            return cache_dir
+        except OSError as e:
+            logging.warning(f"Resampled audio cache couldn't be created in {cache_dir}. "
+                            f"Exception raised: {e}")
+
+    cache_dir = _get_temporary_resample_cache_dir()
+    _evict_resampled_audio(cache_dir, keys)
+    return cache_dir
+
+
 def save_config(app_model: ApplicationModel):
     """Save app configuration into a file."""
     app_config_path = app_model.app_config_file
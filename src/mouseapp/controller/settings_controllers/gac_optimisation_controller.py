@@ -8,6 +8,7 @@ from ray import tune
 import mouse.segmentation.optimisation
 from mouse.utils import data_util
 from mouse.utils.metrics import Metric
+from mouseapp.controller import spectrogram_storage
 from mouseapp.controller.denoising_controller import apply_denoising
 from mouseapp.controller.utils import (
     run_background_task,
@@ -16,6 +17,7 @@ from mouseapp.controller.utils import (
 )
 from mouseapp.model.main_models import MainModel
 from mouseapp.model.settings.utils import OptimisationResult, Denoising
+from mouseapp.model.utils import to_squeak_boxes
 
 
 class _OptimisationCallback(tune.Callback):
@@ -78,12 +80,10 @@ def run_optimisation(model: MainModel):
         return
     gac_model.optimisation_allowed = False
 
-    spectrogram_data = model.spectrogram_model.spectrogram_data
-    spectrogram_boxes = list(
-        map(
-            lambda x: x.to_squeak_box(spectrogram_data),
-            model.spectrogram_model.annotation_table_model.annotations,
-        ))
+    spectrogram_data = spectrogram_storage.decode_spectrogram(
+        model.spectrogram_model, model.spectrogram_model.spectrogram_data)
+    spectrogram_boxes = to_squeak_boxes(model.spectrogram_model.annotation_table_model.annotations,
+                                        spectrogram_data)
 
     spec, ground_truth = data_util.clip_spec_and_boxes(
         spec=spectrogram_data,
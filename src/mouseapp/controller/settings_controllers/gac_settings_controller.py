@@ -7,6 +7,7 @@ import torch
 from PySide6.QtCore import QMutex
 from mouse import segmentation
 from mouse.utils.sound_util import clip_spectrogram, SpectrogramData
+from mouseapp.controller import spectrogram_storage
 from mouseapp.controller.settings_controllers.utils import set_denoising_for_detection
 from mouseapp.controller.utils import warn_user, run_background_task, float_convert
 from mouseapp.model.main_models import MainModel
@@ -73,9 +74,11 @@ def set_gac_preview(model: MainModel):
         model.settings_model.gac_model.preview_model.is_gac_allowed = False
         inital_mutex.unlock()
 
-        spec = model.spectrogram_model.spectrogram_data
         t_start = model.settings_model.preview_start
         t_end = model.settings_model.preview_end
+        spec = spectrogram_storage.clip_decoded_spectrogram(model.spectrogram_model,
+                                                            t_start,
+                                                            t_end)
         clipped_spec = clip_spectrogram(spec=spec, t_start=t_start, t_end=t_end)
         original_spec = clip_spectrogram(spec=spec, t_start=t_start, t_end=t_end)
         set_denoising_for_detection(model, [clipped_spec, original_spec])
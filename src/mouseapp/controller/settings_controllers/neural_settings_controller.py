@@ -6,6 +6,7 @@ import mouseapp.controller.utils
 from PySide6.QtCore import QMutex
 from mouse.nn_detection.neural_network import find_USVs
 from mouse.utils.sound_util import clip_spectrogram
+from mouseapp.controller import spectrogram_storage
 from mouseapp.controller.settings_controllers.utils import set_denoising_for_detection
 from mouseapp.controller.utils import run_background_task
 from mouseapp.model.main_models import MainModel
@@ -46,9 +47,11 @@ def set_NN_preview(model: MainModel):
         calculation_mutex.lock()
         inital_mutex.unlock()
 
-        spec = model.spectrogram_model.spectrogram_data
         t_start = model.settings_model.preview_start
         t_end = model.settings_model.preview_end
+        spec = spectrogram_storage.clip_decoded_spectrogram(model.spectrogram_model,
+                                                            t_start,
+                                                            t_end)
 
         original_spec = clip_spectrogram(spec=spec, t_start=t_start, t_end=t_end)
         set_denoising_for_detection(model, [original_spec])
@@ -3,7 +3,11 @@ from pathlib import Path
 
 import torchaudio
 from mouse.utils.sound_util import clip_spectrogram, spectrogram
-from mouseapp.controller import denoising_controller
+from mouseapp.controller import (
+    denoising_controller,
+    spectrogram_controller,
+    spectrogram_storage,
+)
 from mouseapp.controller.utils import warn_user, run_background_task, float_convert
 from mouseapp.model.main_models import MainModel
 
@@ -70,7 +74,7 @@ def load_noise_audio(model: MainModel, file: Path):
 
     spectrogram_model = model.spectrogram_model
     waveform, sample_rate = torchaudio.load(file)
-    model.settings_model.noise_gate_model.noise_spectrogram_data = spectrogram(
+    noise_spectrogram = spectrogram(
         waveform.squeeze(),
         sample_rate=sample_rate,
         spec_calculator=spectrogram_model.spectrogram_calculator,
@@ -79,6 +83,10 @@ def load_noise_audio(model: MainModel, file: Path):
         hop_length=spectrogram_model.hop_length,
         power=spectrogram_model.power,
     )
+    # Noise statistics are computed per frequency, so the noise spectrogram is
+    # cropped the same way as the main one.
+    model.settings_model.noise_gate_model.noise_spectrogram_data = (
+        spectrogram_controller.crop_frequencies(model, noise_spectrogram))
     model.settings_model.noise_gate_model.set_noise_audio_file_passive_signal(file)
 
 
@@ -121,9 +129,11 @@ def set_noise_gate_preview(model: MainModel):
 
         calculation_mutex.lock()
         inital_mutex.unlock()
-        spec = model.spectrogram_model.spectrogram_data
         t_start = model.settings_model.preview_start
         t_end = model.settings_model.preview_end
+        spec = spectrogram_storage.clip_decoded_spectrogram(model.spectrogram_model,
+                                                            t_start,
+                                                            t_end)
         orginal_spec = clip_spectrogram(spec=spec, t_start=t_start, t_end=t_end)
         model.settings_model.denoising_spectrogram_data = orginal_spec
 
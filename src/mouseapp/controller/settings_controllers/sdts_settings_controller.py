@@ -1,7 +1,7 @@
 import time
 
 from mouse.utils.sound_util import clip_spectrogram
-from mouseapp.controller import denoising_controller
+from mouseapp.controller import denoising_controller, spectrogram_storage
 from mouseapp.controller.utils import run_background_task
 from mouseapp.model.main_models import MainModel
 
@@ -35,9 +35,11 @@ def set_sdts_preview(model: MainModel):
         calculation_mutex.lock()
         inital_mutex.unlock()
 
-        spec = model.spectrogram_model.spectrogram_data
         t_start = model.settings_model.preview_start
         t_end = model.settings_model.preview_end
+        spec = spectrogram_storage.clip_decoded_spectrogram(model.spectrogram_model,
+                                                            t_start,
+                                                            t_end)
         orginal_spec = clip_spectrogram(spec=spec, t_start=t_start, t_end=t_end)
         model.settings_model.denoising_spectrogram_data = orginal_spec
 
@@ -0,0 +1,111 @@
+import logging
+from typing import Callable
+
+from mouseapp.controller import main_controller
+from mouseapp.controller.settings_controllers import noise_gate_settings_controller
+from mouseapp.controller.utils import float_convert, warn_user
+from mouseapp.model.main_models import MainModel
+from mouseapp.model.settings.utils import SpectrogramRendering, SpectrogramStorage
+
+
+def _change_spectrogram_setting(model: MainModel,
+                                change_setting: Callable[[], None],
+                                restore_view: Callable[[], None]):
+    """Change a setting the spectrogram is built with and rebuild it."""
+    if model.spectrogram_model.spectrogram_data is None:
+        change_setting()
+        return
+
+    # The spectrogram is rebuilt, which can't be done while detection,
+    # classification or filtering is using it.
+    spectrogram_mutex = model.spectrogram_model.main_spectrogram_mutex
+    if not spectrogram_mutex.tryLock():
+        warn_user(model, "Spectrogram settings can't be changed while the "
+                  "spectrogram is in use!")
+        restore_view()
+        return
+    try:
+        change_setting()
+    finally:
+        spectrogram_mutex.unlock()
+    logging.debug("Regenerating spectrogram with changed settings")
+    main_controller.update_signal_data(model, model.project_model.audio_files)
+
+
+def set_storage_mode(model: MainModel, value: str):
+    spectrogram_settings_model = model.settings_model.spectrogram_settings_model
+    storage_mode = SpectrogramStorage(value)
+    if storage_mode == spectrogram_settings_model.storage_mode:
+        return
+
+    def change_setting():
+        spectrogram_settings_model.storage_mode = storage_mode
+
+    _change_spectrogram_setting(model,
+                                change_setting,
+                                spectrogram_settings_model.emit_all_setting_signals)
+
+
+def set_frequency_range(model: MainModel, frequency_min_txt: str,
+                        frequency_max_txt: str):
+    """Set frequency range kept in the spectrogram.
+
+    Empty `frequency_max_txt` means that the range isn't limited from above.
+    """
+    spectrogram_settings_model = model.settings_model.spectrogram_settings_model
+    try:
+        frequency_min = float_convert(frequency_min_txt) if frequency_min_txt else 0.0
+        frequency_max = float_convert(frequency_max_txt) if frequency_max_txt else None
+    except ValueError:
+        logging.debug(f"Failed to set frequency range. Provided values "
+                      f"`{frequency_min_txt}`, `{frequency_max_txt}` couldn't be "
+                      f"converted to float.")
+        spectrogram_settings_model.emit_all_setting_signals()
+        return
+    if frequency_min < 0 or (frequency_max is not None and
+                             frequency_max <= frequency_min):
+        warn_user(model, "Lowest frequency must be non-negative and lower than "
+                  "the highest frequency")
+        spectrogram_settings_model.emit_all_setting_signals()
+        return
+    if (frequency_min == spectrogram_settings_model.frequency_min and
+            frequency_max == spectrogram_settings_model.frequency_max):
+        return
+
+    def change_setting():
+        spectrogram_settings_model.frequency_min = frequency_min
+        spectrogram_settings_model.frequency_max = frequency_max
+        # Noise spectrogram must have the same frequencies as the main one.
+        noise_gate_model = model.settings_model.noise_gate_model
+        if noise_gate_model.noise_spectrogram_data is not None:
+            noise_gate_model.noise_spectrogram_data = None
+            noise_gate_settings_controller.load_noise_audio(
+                model, noise_gate_model.noise_audio_file)
+
+    _change_spectrogram_setting(model,
+                                change_setting,
+                                spectrogram_settings_model.emit_all_setting_signals)
+
+
+def set_display_cache_size(model: MainModel, value_txt: str):
+    """Set memory [MB] for spectrogram chunks prepared for display."""
+    spectrogram_settings_model = model.settings_model.spectrogram_settings_model
+    try:
+        value = int(value_txt)
+    except ValueError:
+        logging.debug(f"Failed to set display cache size. Provided value "
+                      f"`{value_txt}` couldn't be converted to int.")
+        spectrogram_settings_model.emit_all_setting_signals()
+        return
+    if value < 0:
+        warn_user(model, "Display cache size can't be negative")
+        spectrogram_settings_model.emit_all_setting_signals()
+        return
+    spectrogram_settings_model.display_cache_size = value
+    model.spectrogram_model.tile_cache.max_bytes = value * 2**20
+
+
+def set_rendering(model: MainModel, value: str):
+    # Cached tiles are prepared for the previous rendering.
+    model.spectrogram_model.tile_cache.clear()
+    model.settings_model.spectrogram_settings_model.rendering = SpectrogramRendering(value)
@@ -3,6 +3,7 @@ from typing import List
 
 from mouse.denoising import denoising
 from mouse.utils.sound_util import clip_spectrogram, SpectrogramData
+from mouseapp.controller import spectrogram_storage
 from mouseapp.model.main_models import MainModel
 from mouseapp.model.settings.utils import Denoising
 
@@ -28,8 +29,8 @@ def set_denoising_for_detection(model: MainModel, spec_list: List[SpectrogramDat
         kwargs = model.settings_model.noise_gate_model.get_kwargs()
         if kwargs["use_main_spectrogram"]:
             print("Using main spectrogram as noise source")
-            noise_spectrogram = clip_spectrogram(
-                spec=model.spectrogram_model.spectrogram_data,
+            noise_spectrogram = spectrogram_storage.clip_decoded_spectrogram(
+                model.spectrogram_model,
                 t_start=kwargs["noise_start"],
                 t_end=kwargs["noise_end"],
             )
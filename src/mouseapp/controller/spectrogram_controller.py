@@ -0,0 +1,588 @@
+"""Spectrogram Controller of the application.
+
+Functions in this file compute the project spectrogram from audio files. Audio
+files are treated as one virtual, concatenated recording which is never
+materialised in memory. Instead, it is read in fixed-size blocks (with the
+window/hop overlap needed by the STFT) and the output spectrogram is filled
+block by block. Files with different sample rates are first resampled to the
+lowest one. Blocks belonging to different files are computed concurrently in
+worker processes, see `audio_stream.py`.
+
+Apart from the full resolution spectrogram, a pyramid of max-pooled levels with
+fewer frames is built, so that zoomed-out views don't have to draw every frame.
+Computed spectrograms are cached in the project folder, see
+`persistency_controller.load_spectrogram_cache`.
+"""
+import hashlib
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torchaudio
+from mouse.utils import sound_util
+from mouseapp.controller import audio_stream, persistency_controller, spectrogram_storage
+from mouseapp.controller.audio_stream import (
+    AudioSegment,
+    STFTParameters,
+    read_audio_segments,
+)
+from mouseapp.model.main_models import MainModel, SpectrogramModel
+from mouseapp.model.settings.utils import SpectrogramStorage
+from mouseapp.model.timeline import Timeline
+
+# Number of spectrogram frames (columns) computed at once. Peak memory used
+# while building the spectrogram is proportional to this value.
+SPECTROGRAM_BLOCK_FRAMES = 4096
+# Number of blocks computed by a worker process in a single task.
+PARALLEL_TASK_BLOCKS = 16
+# Number of worker processes computing the spectrogram, `None` means all cores.
+SPECTROGRAM_WORKERS = None
+# Each level of the spectrogram pyramid has `PYRAMID_FACTOR` times fewer frames
+# than the previous one. Levels narrower than `PYRAMID_MIN_FRAMES` aren't built.
+PYRAMID_FACTOR = 4
+PYRAMID_MIN_FRAMES = 2048
+# Number of bytes from the beginning of each audio file used in cache keys.
+CACHE_KEY_HEADER_SIZE = 64 * 1024
+# Minimal time [s] between redraws of a progressively computed spectrogram.
+PROGRESSIVE_UPDATE_INTERVAL = 0.5
+
+
+def stft_parameters(spectrogram_model: SpectrogramModel) -> STFTParameters:
+    return STFTParameters(
+        n_fft=spectrogram_model.n_fft,
+        win_length=spectrogram_model.win_length,
+        hop_length=spectrogram_model.hop_length,
+        center=spectrogram_model.center,
+        pad_mode=spectrogram_model.pad_mode,
+        power=spectrogram_model.power,
+    )
+
+
+def _hash_audio_file(hasher, path: Path):
+    """Identify audio file by its path, size, modification time and first bytes.
+
+    Hashing the whole content would require reading hours of audio.
+    """
+    stat = path.stat()
+    hasher.update(f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    with path.open("rb") as file:
+        hasher.update(file.read(CACHE_KEY_HEADER_SIZE))
+
+
+def spectrogram_cache_key(
+        segments: List[AudioSegment],
+        spectrogram_model: SpectrogramModel,
+        storage: SpectrogramStorage = SpectrogramStorage.FLOAT32,
+        rows: slice = slice(None)) -> str:
+    """Compute key identifying spectrogram of `segments`."""
+    hasher = hashlib.sha1()
+    for segment in segments:
+        _hash_audio_file(hasher, segment.path)
+    hasher.update((f"n_fft={spectrogram_model.n_fft},"
+                   f"win_length={spectrogram_model.win_length},"
+                   f"hop_length={spectrogram_model.hop_length},"
+                   f"power={spectrogram_model.power},"
+                   f"center={spectrogram_model.center},"
+                   f"pad_mode={spectrogram_model.pad_mode},"
+                   f"sample_rate={spectrogram_model.sample_rate},"
+                   f"storage={storage.name},"
+                   f"rows={rows.start}:{rows.stop}").encode())
+    return hasher.hexdigest()
+
+
+def resample_cache_key(segment: AudioSegment, sample_rate: int) -> str:
+    hasher = hashlib.sha1()
+    _hash_audio_file(hasher, segment.path)
+    hasher.update(f"sample_rate={sample_rate}".encode())
+    return hasher.hexdigest()
+
+
+def get_frequency_rows(freqs: np.ndarray,
+                       freq_min: float = 0.0,
+                       freq_max: Optional[float] = None) -> slice:
+    """Get rows of a spectrogram with frequencies in [`freq_min`, `freq_max`].
+
+    At least one row is always selected.
+    """
+    start = min(int(np.searchsorted(freqs, freq_min, side="left")), len(freqs) - 1)
+    stop = len(freqs)
+    if freq_max is not None:
+        stop = int(np.searchsorted(freqs, freq_max, side="right"))
+    return slice(start, max(stop, start + 1))
+
+
+def get_settings_frequency_rows(model: MainModel) -> slice:
+    """Get rows of the project spectrogram in the frequency range of interest."""
+    spectrogram_model = model.spectrogram_model
+    spectrogram_settings_model = model.settings_model.spectrogram_settings_model
+    return get_frequency_rows(
+        np.fft.rfftfreq(spectrogram_model.n_fft, d=1 / spectrogram_model.sample_rate),
+        spectrogram_settings_model.frequency_min,
+        spectrogram_settings_model.frequency_max,
+    )
+
+
+def crop_frequencies(model: MainModel,
+                     spectrogram_data: sound_util.SpectrogramData
+                     ) -> sound_util.SpectrogramData:
+    """Crop `spectrogram_data` to the frequency range of interest."""
+    spectrogram_settings_model = model.settings_model.spectrogram_settings_model
+    rows = get_frequency_rows(spectrogram_data.freqs,
+                              spectrogram_settings_model.frequency_min,
+                              spectrogram_settings_model.frequency_max)
+    return sound_util.SpectrogramData(spec=spectrogram_data.spec[rows],
+                                      times=spectrogram_data.times,
+                                      freqs=spectrogram_data.freqs[rows])
+
+
+def get_spectrogram_shape(segments: List[AudioSegment],
+                          spectrogram_model: SpectrogramModel,
+                          rows: slice = slice(None)) -> Tuple[int, int]:
+    n_freqs, frame_count = audio_stream.get_spectrogram_shape(
+        segments, stft_parameters(spectrogram_model))
+    return len(range(n_freqs)[rows]), frame_count
+
+
+def _get_worker_count(workers: Optional[int], task_count: int) -> int:
+    workers = workers if workers is not None else os.cpu_count() or 1
+    return min(workers, task_count)
+
+
+def _create_process_pool(workers: int) -> ProcessPoolExecutor:
+    # Processes are spawned rather than forked, as forking a process running Qt
+    # isn't safe.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=audio_stream.initialize_worker,
+    )
+
+
+def _stream_serially(segments: List[AudioSegment],
+                     parameters: STFTParameters,
+                     spec: torch.Tensor,
+                     encode: Callable[[torch.Tensor], torch.Tensor],
+                     block_frames: int,
+                     callback: Optional[Callable[[int, int], None]]):
+    frame_count = spec.shape[1]
+    block_calculator = audio_stream.get_block_calculator(parameters)
+    for frame_start in range(0, frame_count, block_frames):
+        frame_stop = min(frame_start + block_frames, frame_count)
+        spec[:, frame_start:frame_stop] = encode(
+            audio_stream.compute_frames(segments,
+                                        parameters,
+                                        block_calculator,
+                                        frame_start,
+                                        frame_stop))
+        if callback is not None:
+            callback(frame_stop, frame_count)
+
+
+def _stream_in_parallel(segments: List[AudioSegment],
+                        parameters: STFTParameters,
+                        spec: torch.Tensor,
+                        encode: Callable[[torch.Tensor], torch.Tensor],
+                        block_frames: int,
+                        callback: Optional[Callable[[int, int], None]],
+                        frame_ranges: List[Tuple[int, int]],
+                        workers: int):
+    """Compute `frame_ranges` of the spectrogram in worker processes.
+
+    Ranges are submitted lazily, so that at most a few computed ranges wait in
+    memory before being written to `spec`.
+    """
+    frame_count = spec.shape[1]
+    computed_frames = 0
+    remaining_ranges = iter(frame_ranges)
+    with _create_process_pool(workers) as executor:
+        pending = {}
+
+        def submit(frame_range: Tuple[int, int]) -> Future:
+            future = executor.submit(audio_stream.compute_frames_in_blocks,
+                                     segments,
+                                     parameters,
+                                     *frame_range,
+                                     block_frames)
+            pending[future] = frame_range
+            return future
+
+        for frame_range in itertools.islice(remaining_ranges, 2 * workers):
+            submit(frame_range)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                frame_start, frame_stop = pending.pop(future)
+                spec[:, frame_start:frame_stop] = encode(
+                    torch.from_numpy(future.result()))
+                computed_frames += frame_stop - frame_start
+                if callback is not None:
+                    callback(computed_frames, frame_count)
+                next_range = next(remaining_ranges, None)
+                if next_range is not None:
+                    submit(next_range)
+
+
+def stream_spectrogram(
+    segments: List[AudioSegment],
+    spectrogram_model: SpectrogramModel,
+    block_frames: int = SPECTROGRAM_BLOCK_FRAMES,
+    callback: Optional[Callable[[int, int], None]] = None,
+    out: Optional[torch.Tensor] = None,
+    workers: Optional[int] = SPECTROGRAM_WORKERS,
+    storage: SpectrogramStorage = SpectrogramStorage.FLOAT32,
+    rows: slice = slice(None),
+    on_start: Optional[Callable[[sound_util.SpectrogramData], None]] = None,
+) -> sound_util.SpectrogramData:
+    """Compute spectrogram of concatenated `segments` block by block.
+
+    Blocks are computed in `workers` processes (all CPU cores by default) and
+    each process decodes a different audio file. `callback` is called after
+    each computed part with the number of computed frames and the total
+    number of frames. If `out` is given, the spectrogram is written to it,
+    e.g. to a memory-mapped array. Blocks are stored in `storage`
+    representation, see `spectrogram_storage.py`. Only frequency `rows` are
+    kept, see `get_frequency_rows`. `on_start` is called with the not yet
+    computed (zero-filled) spectrogram, which is then filled in place.
+    """
+    sample_rate = spectrogram_model.sample_rate
+    parameters = stft_parameters(spectrogram_model)
+    n_freqs, frame_count = get_spectrogram_shape(segments, spectrogram_model, rows)
+
+    spec = out
+    if spec is None:
+        spec = torch.zeros((n_freqs, frame_count),
+                           dtype=spectrogram_storage.get_torch_dtype(storage))
+    times = np.arange(frame_count) * spectrogram_model.hop_length / sample_rate
+    freqs = np.fft.rfftfreq(spectrogram_model.n_fft, d=1 / sample_rate)[rows]
+    spectrogram_data = sound_util.SpectrogramData(spec=spec, times=times, freqs=freqs)
+    if on_start is not None:
+        on_start(spectrogram_data)
+
+    def encode(block: torch.Tensor) -> torch.Tensor:
+        return spectrogram_storage.encode_spectrogram(block[rows],
+                                                      storage,
+                                                      spectrogram_model)
+
+    frame_ranges = audio_stream.split_frames_by_segments(
+        segments, parameters, block_frames * PARALLEL_TASK_BLOCKS)
+    workers = _get_worker_count(workers, len(frame_ranges))
+    if workers > 1:
+        try:
+            _stream_in_parallel(segments,
+                                parameters,
+                                spec,
+                                encode,
+                                block_frames,
+                                callback,
+                                frame_ranges,
+                                workers)
+        except (BrokenProcessPool, OSError) as error:
+            logging.warning(f"Parallel spectrogram computation failed ({error}), "
+                            "falling back to a single process.")
+            _stream_serially(segments,
+                             parameters,
+                             spec,
+                             encode,
+                             block_frames,
+                             callback)
+    else:
+        _stream_serially(segments, parameters, spec, encode, block_frames, callback)
+
+    return spectrogram_data
+
+
+def set_spectrogram_calculator(model: MainModel):
+    spectrogram_model = model.spectrogram_model
+    if spectrogram_model.spectrogram_calculator is None:
+        spectrogram_calculator = torchaudio.transforms.Spectrogram(
+            n_fft=spectrogram_model.n_fft,
+            win_length=spectrogram_model.win_length,
+            hop_length=spectrogram_model.hop_length,
+            center=spectrogram_model.center,
+            pad_mode=spectrogram_model.pad_mode,
+            power=spectrogram_model.power,
+        )
+        spectrogram_model.spectrogram_calculator = spectrogram_calculator
+
+
+def _resample_in_processes(resampling_tasks: List[Tuple[AudioSegment, Path]],
+                           sample_rate: int,
+                           workers: Optional[int]):
+    workers = _get_worker_count(workers, len(resampling_tasks))
+    if workers > 1:
+        try:
+            with _create_process_pool(workers) as executor:
+                futures = []
+                for segment, target_path in resampling_tasks:
+                    futures.append(
+                        executor.submit(audio_stream.resample_segment,
+                                        segment,
+                                        target_path,
+                                        sample_rate))
+                for future in futures:
+                    future.result()
+            return
+        except (BrokenProcessPool, OSError) as error:
+            logging.warning(f"Parallel resampling failed ({error}), "
+                            "falling back to a single process.")
+    for segment, target_path in resampling_tasks:
+        if not target_path.exists():
+            audio_stream.resample_segment(segment, target_path, sample_rate)
+
+
+def resample_audio_segments(
+        model: MainModel,
+        segments: List[AudioSegment],
+        workers: Optional[int] = SPECTROGRAM_WORKERS) -> List[AudioSegment]:
+    """Resample `segments` to the sample rate of the spectrogram.
+
+    Resampled files are computed in parallel and cached in the project folder
+    (or in the temporary folder if the project can't store them). Segments
+    returned for them point to `.npy` files with the resampled audio.
+    """
+    sample_rate = model.spectrogram_model.sample_rate
+    keys = {
+        segment.path: resample_cache_key(segment, sample_rate)
+        for segment in segments
+        if segment.sample_rate != sample_rate
+    }
+    if len(keys) == 0:
+        return segments
+
+    cache_dir = persistency_controller.get_resample_cache(
+        model.project_model.project_path, set(keys.values()))
+
+    resampled_segments = []
+    resampling_tasks = []
+    for segment in segments:
+        if segment.path not in keys:
+            resampled_segments.append(segment)
+            continue
+        target_path = cache_dir.joinpath(f"{keys[segment.path]}.npy")
+        if not target_path.exists():
+            resampling_tasks.append((segment, target_path))
+        resampled_segments.append(
+            AudioSegment(
+                path=target_path,
+                num_frames=audio_stream.get_resampled_length(
+                    segment.num_frames, segment.sample_rate, sample_rate),
+                sample_rate=sample_rate,
+            ))
+    _resample_in_processes(resampling_tasks, sample_rate, workers)
+    return resampled_segments
+
+
+def get_pyramid_shapes(shape: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Compute shapes of downsampled pyramid levels of spectrogram of `shape`."""
+    n_freqs, frame_count = shape
+    shapes = []
+    while frame_count > PYRAMID_MIN_FRAMES:
+        frame_count = math.ceil(frame_count / PYRAMID_FACTOR)
+        shapes.append((n_freqs, frame_count))
+    return shapes
+
+
+def downsample_spectrogram(
+    spectrogram_data: sound_util.SpectrogramData,
+    out: Optional[torch.Tensor] = None,
+    block_frames: int = SPECTROGRAM_BLOCK_FRAMES,
+) -> sound_util.SpectrogramData:
+    """Max-pool `PYRAMID_FACTOR` consecutive frames of the spectrogram.
+
+    Max-pooling (rather than averaging) keeps short, loud vocalizations visible
+    in zoomed-out views. Frames are pooled block by block, so the spectrogram
+    may be memory-mapped. Encoded spectrograms are pooled without decoding, as
+    their encoding preserves order of values.
+    """
+    spec = spectrogram_data.spec
+    frame_count = spec.shape[1]
+    if out is None:
+        out = torch.empty((spec.shape[0], math.ceil(frame_count / PYRAMID_FACTOR)),
+                          dtype=spec.dtype)
+    step = block_frames * PYRAMID_FACTOR
+    for frame_start in range(0, frame_count, step):
+        frame_stop = min(frame_start + step, frame_count)
+        out[:, frame_start // PYRAMID_FACTOR:math.ceil(
+            frame_stop / PYRAMID_FACTOR)] = torch.nn.functional.max_pool1d(
+                spec[:, frame_start:frame_stop].unsqueeze(0).to(torch.float32),
+                kernel_size=PYRAMID_FACTOR,
+                ceil_mode=True,
+            ).squeeze(0)
+    return sound_util.SpectrogramData(spec=out,
+                                      times=spectrogram_data.times[::PYRAMID_FACTOR],
+                                      freqs=spectrogram_data.freqs)
+
+
+def _load_or_stream_spectrogram(
+    model: MainModel,
+    segments: List[AudioSegment],
+    callback: Optional[Callable[[int, int], None]] = None,
+    on_start: Optional[Callable[[sound_util.SpectrogramData], None]] = None,
+) -> List[sound_util.SpectrogramData]:
+    """Get all levels of the spectrogram pyramid, starting from full resolution.
+
+    `callback` and `on_start` are passed to `stream_spectrogram` and aren't
+    called if the spectrogram is loaded from the cache.
+    """
+    spectrogram_model = model.spectrogram_model
+    project_path = model.project_model.project_path
+    storage = model.settings_model.spectrogram_settings_model.storage_mode
+    rows = get_settings_frequency_rows(model)
+    key = spectrogram_cache_key(segments, spectrogram_model, storage, rows)
+
+    levels = persistency_controller.load_spectrogram_cache(project_path, key)
+    if levels is not None:
+        spectrogram_model.spectrogram_cache_key = key
+        return levels
+
+    segments = resample_audio_segments(model, segments)
+    shape = get_spectrogram_shape(segments, spectrogram_model, rows)
+    cached_specs = persistency_controller.create_spectrogram_cache(
+        project_path,
+        key,
+        [shape] + get_pyramid_shapes(shape),
+        dtype=spectrogram_storage.get_numpy_dtype(storage))
+    if cached_specs is None:
+        spectrogram_model.spectrogram_cache_key = None
+        return _stream_spectrogram_pyramid(segments,
+                                           spectrogram_model,
+                                           storage,
+                                           rows,
+                                           callback=callback,
+                                           on_start=on_start)
+
+    try:
+        levels = _stream_spectrogram_pyramid(
+            segments,
+            spectrogram_model,
+            storage,
+            rows,
+            outs=[torch.from_numpy(cached_spec) for cached_spec in cached_specs],
+            callback=callback,
+            on_start=on_start)
+    except BaseException:
+        persistency_controller.discard_spectrogram_cache(cached_specs)
+        raise
+    # The spectrogram shown until now may still be mapped from its cache.
+    persistency_controller.save_spectrogram_cache(
+        project_path,
+        key,
+        cached_specs,
+        times=[level.times for level in levels],
+        freqs=levels[0].freqs,
+        keep={spectrogram_model.spectrogram_cache_key},
+    )
+    # Map saved files again in copy-on-write mode, so that the cache can't be
+    # modified through the model.
+    cached_levels = persistency_controller.load_spectrogram_cache(project_path, key)
+    if cached_levels is not None:
+        spectrogram_model.spectrogram_cache_key = key
+        return cached_levels
+    spectrogram_model.spectrogram_cache_key = None
+    return levels
+
+
+def _stream_spectrogram_pyramid(
+    segments: List[AudioSegment],
+    spectrogram_model: SpectrogramModel,
+    storage: SpectrogramStorage,
+    rows: slice,
+    outs: Optional[List[torch.Tensor]] = None,
+    callback: Optional[Callable[[int, int], None]] = None,
+    on_start: Optional[Callable[[sound_util.SpectrogramData], None]] = None,
+) -> List[sound_util.SpectrogramData]:
+    if outs is None:
+        shape = get_spectrogram_shape(segments, spectrogram_model, rows)
+        outs = [None] * (len(get_pyramid_shapes(shape)) + 1)
+    levels = [
+        stream_spectrogram(segments,
+                           spectrogram_model,
+                           callback=callback,
+                           out=outs[0],
+                           storage=storage,
+                           rows=rows,
+                           on_start=on_start)
+    ]
+    for out in outs[1:]:
+        levels.append(downsample_spectrogram(levels[-1], out=out))
+    return levels
+
+
+def generate_spectrogram(model: MainModel,
+                         audio_files: List[Path],
+                         callback: Optional[Callable[[int, int], None]] = None,
+                         progressive: bool = False):
+    """Compute spectrogram of `audio_files` and store it in the model.
+
+    `callback` is called with the number of computed frames and the total
+    number of frames. If `progressive` is set, the spectrogram is stored in
+    the model before it's computed and `spectrogram_data_updated` is emitted
+    as its blocks are filled in, at most every `PROGRESSIVE_UPDATE_INTERVAL`
+    seconds.
+    """
+    spectrogram_model = model.spectrogram_model
+    set_spectrogram_calculator(model)
+
+    # Only headers of files modified since the project was saved are read.
+    model.project_model.audio_metadata = audio_stream.update_metadata_index(
+        audio_files, model.project_model.audio_metadata)
+    segments = read_audio_segments(audio_files, model.project_model.audio_metadata)
+    if len(segments) == 0:
+        spectrogram_model.sample_rate = None
+        spectrogram_model.timeline = None
+        spectrogram_model.spectrogram_pyramid = []
+        spectrogram_model.spectrogram_data = None
+        return
+
+    # Files with different sample rates are resampled to the lowest one.
+    spectrogram_model.sample_rate = min(segment.sample_rate for segment in segments)
+    spectrogram_model.timeline = Timeline(
+        audio_files=[segment.path for segment in segments],
+        sample_counts=[
+            audio_stream.get_resampled_length(segment.num_frames,
+                                              segment.sample_rate,
+                                              spectrogram_model.sample_rate)
+            for segment in segments
+        ],
+        sample_rate=spectrogram_model.sample_rate,
+    )
+
+    partial_displayed = False
+    last_update: Optional[float] = None
+
+    def on_start(partial_spectrogram_data: sound_util.SpectrogramData):
+        nonlocal partial_displayed
+        spectrogram_model.spectrogram_pyramid = []
+        spectrogram_model.spectrogram_data = partial_spectrogram_data
+        partial_displayed = True
+
+    def on_computed(computed_frames: int, frame_count: int):
+        nonlocal last_update
+        if callback is not None:
+            callback(computed_frames, frame_count)
+        # The first computed part usually contains the first viewport, so it's
+        # displayed right away.
+        now = time.monotonic()
+        if last_update is None or now - last_update >= PROGRESSIVE_UPDATE_INTERVAL:
+            spectrogram_model.signal_spectrogram_data_updated()
+            last_update = now
+
+    levels = _load_or_stream_spectrogram(
+        model,
+        segments,
+        callback=on_computed if progressive else callback,
+        on_start=on_start if progressive else None)
+    if partial_displayed:
+        spectrogram_model.update_spectrogram_data(levels[0], levels[1:])
+    else:
+        spectrogram_model.spectrogram_pyramid = levels[1:]
+        spectrogram_model.spectrogram_data = levels[0]
@@ -0,0 +1,83 @@
+"""Compact storage of the project spectrogram.
+
+The resident spectrogram can be kept as 32-bit floats, 16-bit floats or
+log-scaled 8-bit integers, see `SpectrogramStorage`. Code running detection,
+denoising or classification should use `decode_spectrogram`, which returns
+32-bit floats.
+"""
+import math
+
+import numpy as np
+import torch
+from mouse.utils.sound_util import SpectrogramData, clip_spectrogram
+from mouseapp.model.main_models import SpectrogramModel
+from mouseapp.model.settings.utils import SpectrogramStorage
+
+# Magnitudes much lower than this value are stored as 0 in 8-bit storage.
+UINT8_REFERENCE_MAGNITUDE = 1e-3
+UINT8_MAX = 255
+
+_NUMPY_DTYPES = {
+    SpectrogramStorage.FLOAT32: np.float32,
+    SpectrogramStorage.FLOAT16: np.float16,
+    SpectrogramStorage.UINT8: np.uint8,
+}
+
+
+def get_numpy_dtype(storage: SpectrogramStorage) -> np.dtype:
+    return np.dtype(_NUMPY_DTYPES[storage])
+
+
+def get_torch_dtype(storage: SpectrogramStorage) -> torch.dtype:
+    return torch.from_numpy(np.empty(0, dtype=get_numpy_dtype(storage))).dtype
+
+
+def get_uint8_scale(spectrogram_model: SpectrogramModel) -> float:
+    """Compute the largest log-scaled value of any spectrogram bin.
+
+    Samples are in [-1, 1], so magnitude of a bin can't exceed the sum of the
+    STFT window raised to `power`.
+    """
+    window_sum = float(torch.hann_window(spectrogram_model.win_length).sum())
+    return math.log1p(window_sum**spectrogram_model.power / UINT8_REFERENCE_MAGNITUDE)
+
+
+def encode_spectrogram(spec: torch.Tensor, storage: SpectrogramStorage,
+                       spectrogram_model: SpectrogramModel) -> torch.Tensor:
+    """Convert 32-bit float `spec` to `storage` representation."""
+    if storage == SpectrogramStorage.UINT8:
+        scaled = torch.log1p(spec / UINT8_REFERENCE_MAGNITUDE) / get_uint8_scale(
+            spectrogram_model)
+        return torch.round(scaled * UINT8_MAX).clamp_(0, UINT8_MAX).to(torch.uint8)
+    return spec.to(get_torch_dtype(storage))
+
+
+def decode_spectrogram(spectrogram_model: SpectrogramModel,
+                       spectrogram_data: SpectrogramData) -> SpectrogramData:
+    """Get 32-bit float version of `spectrogram_data`.
+
+    Spectrograms already stored as 32-bit floats are returned as they are,
+    otherwise a decoded copy is returned.
+    """
+    spec = spectrogram_data.spec
+    if spec.dtype == torch.float32:
+        return spectrogram_data
+    if spec.dtype == torch.uint8:
+        scaled = spec.to(torch.float32) * (get_uint8_scale(spectrogram_model) /
+                                           UINT8_MAX)
+        decoded = torch.expm1(scaled) * UINT8_REFERENCE_MAGNITUDE
+    else:
+        decoded = spec.to(torch.float32)
+    return SpectrogramData(spec=decoded,
+                           times=spectrogram_data.times,
+                           freqs=spectrogram_data.freqs)
+
+
+def clip_decoded_spectrogram(spectrogram_model: SpectrogramModel, t_start: float,
+                             t_end: float) -> SpectrogramData:
+    """Get 32-bit float clip of the project spectrogram between given times."""
+    return decode_spectrogram(
+        spectrogram_model,
+        clip_spectrogram(spec=spectrogram_model.spectrogram_data,
+                         t_start=t_start,
+                         t_end=t_end))
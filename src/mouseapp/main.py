@@ -1,6 +1,10 @@
 """Entry point of the application."""
+import multiprocessing
 
 from mouseapp.context_manager import initialize_application
 
 if __name__ == "__main__":
+    # Spectrogram is computed in worker processes, which need this in frozen
+    # (packaged) application.
+    multiprocessing.freeze_support()
     initialize_application()
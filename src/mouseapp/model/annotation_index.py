@@ -0,0 +1,219 @@
+"""Index of annotations ordered by time, used to find the visible ones."""
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List
+
+from mouseapp.model.utils import Annotation
+
+# Adding or removing more annotations at once than this rebuilds the whole
+# index instead of updating it one by one.
+BULK_UPDATE_THRESHOLD = 64
+# Number of annotations per block of the index. Blocks growing to twice as
+# many are split and ones shrinking to half as many are merged.
+BLOCK_SIZE = 64
+
+
+class AnnotationIntervalIndex:
+    """Blocks of annotations sorted by `time_start`, augmented with their maximum `time_end`.
+
+    A segment tree over blocks keeps the maximum end of each range of blocks,
+    so a query descends only into blocks starting before the queried range
+    ends and containing an annotation which ends after it starts. Adding,
+    removing or updating an annotation changes its block and the maximum ends
+    on the path from the block to the root; the tree is rebuilt only when
+    blocks are split or merged. Annotation times edited in place must be
+    reported with `update`.
+    """
+
+    def __init__(self, annotations: Iterable[Annotation] = ()):
+        self._block_starts: List[List[float]] = []
+        self._block_ends: List[List[float]] = []
+        self._block_annotations: List[List[Annotation]] = []
+        # Smallest start of each block.
+        self._first_starts: List[float] = []
+        # Start time under which each annotation is currently indexed.
+        self._indexed_starts: Dict[Annotation, float] = {}
+        # Maximum ends of nodes of the segment tree, root at 1, children of
+        # node `i` at `2 * i` and `2 * i + 1` and block `b` at `leaf_count + b`.
+        self._leaf_count = 1
+        self._max_ends: List[float] = [-math.inf, -math.inf]
+        self.add(annotations)
+
+    def __len__(self):
+        return len(self._indexed_starts)
+
+    def add(self, annotations: Iterable[Annotation]):
+        annotations = list(annotations)
+        if len(annotations) <= BULK_UPDATE_THRESHOLD:
+            for annotation in annotations:
+                self._insert(annotation)
+            return
+
+        entries = sorted(self._get_entries() + [(a.time_start, a.time_end, a) for a in annotations],
+                         key=lambda entry: entry[0])
+        self._set_entries(entries)
+        for annotation in annotations:
+            self._indexed_starts[annotation] = annotation.time_start
+
+    def remove(self, annotations: Iterable[Annotation]):
+        annotations = list(annotations)
+        if len(annotations) <= BULK_UPDATE_THRESHOLD:
+            for annotation in annotations:
+                self._delete(annotation)
+            return
+
+        removed = set(annotations)
+        self._set_entries([entry for entry in self._get_entries() if entry[2] not in removed])
+        for annotation in annotations:
+            del self._indexed_starts[annotation]
+
+    def update(self, annotation: Annotation):
+        """Reindex `annotation` after its times were changed."""
+        self._delete(annotation)
+        self._insert(annotation)
+
+    def clear(self):
+        self._indexed_starts = {}
+        self._set_entries([])
+
+    def query(self, start: float, end: float) -> List[Annotation]:
+        """Find annotations visible between `start` and `end`.
+
+        An annotation is visible if it starts or ends in [`start`, `end`)
+        or spans the whole range.
+        """
+        return [
+            annotation for annotation in self._get_candidates(start, end)
+            if ((start <= annotation.time_start < end) or
+                (start <= annotation.time_end < end) or
+                (annotation.time_start <= start and end <= annotation.time_end))
+        ]
+
+    def _get_candidates(self, start: float, end: float) -> List[Annotation]:
+        """Find annotations starting at most at `end` and ending at least at `start`."""
+        last_block = bisect_right(self._first_starts, end)
+        max_ends = self._max_ends
+        leaf_count = self._leaf_count
+        candidates = []
+        # Nodes with the first and past-the-last block they cover.
+        stack = [(1, 0, leaf_count)]
+        while stack:
+            node, first, stop = stack.pop()
+            if first >= last_block or max_ends[node] < start:
+                continue
+            if node >= leaf_count:
+                ends = self._block_ends[first]
+                annotations = self._block_annotations[first]
+                candidates.extend(annotations[position]
+                                  for position in range(bisect_right(self._block_starts[first], end))
+                                  if ends[position] >= start)
+                continue
+            middle = (first + stop) // 2
+            stack.append((2 * node + 1, middle, stop))
+            stack.append((2 * node, first, middle))
+        return candidates
+
+    def _get_entries(self) -> List[tuple]:
+        return [
+            entry for starts, ends, annotations in zip(self._block_starts, self._block_ends,
+                                                       self._block_annotations)
+            for entry in zip(starts, ends, annotations)
+        ]
+
+    def _set_entries(self, entries: List[tuple]):
+        blocks = [entries[first:first + BLOCK_SIZE] for first in range(0, len(entries), BLOCK_SIZE)]
+        self._block_starts = [[time_start for time_start, _, _ in block] for block in blocks]
+        self._block_ends = [[time_end for _, time_end, _ in block] for block in blocks]
+        self._block_annotations = [[annotation for _, _, annotation in block] for block in blocks]
+        self._first_starts = [starts[0] for starts in self._block_starts]
+        self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        block_count = len(self._block_ends)
+        leaf_count = 1 << max(block_count - 1, 0).bit_length()
+        max_ends = [-math.inf] * (2 * leaf_count)
+        max_ends[leaf_count:leaf_count + block_count] = [max(ends) for ends in self._block_ends]
+        for node in range(leaf_count - 1, 0, -1):
+            max_ends[node] = max(max_ends[2 * node], max_ends[2 * node + 1])
+        self._leaf_count = leaf_count
+        self._max_ends = max_ends
+
+    def _set_block_max_end(self, block: int, max_end: float):
+        """Update maximum ends from the leaf of `block` up to the root."""
+        max_ends = self._max_ends
+        node = self._leaf_count + block
+        max_ends[node] = max_end
+        node //= 2
+        while node >= 1:
+            max_end = max(max_ends[2 * node], max_ends[2 * node + 1])
+            if max_ends[node] == max_end:
+                break
+            max_ends[node] = max_end
+            node //= 2
+
+    def _split_block(self, block: int):
+        for block_lists in (self._block_starts, self._block_ends, self._block_annotations):
+            entries = block_lists[block]
+            middle = len(entries) // 2
+            block_lists[block:block + 1] = [entries[:middle], entries[middle:]]
+        self._first_starts.insert(block + 1, self._block_starts[block + 1][0])
+        self._rebuild_tree()
+
+    def _merge_block(self, block: int):
+        """Merge `block` with the next block, or the previous one if it's the last."""
+        if block == len(self._block_starts) - 1:
+            block -= 1
+        for block_lists in (self._block_starts, self._block_ends, self._block_annotations):
+            block_lists[block:block + 2] = [block_lists[block] + block_lists[block + 1]]
+        del self._first_starts[block + 1]
+        self._first_starts[block] = self._block_starts[block][0]
+        if len(self._block_starts[block]) >= 2 * BLOCK_SIZE:
+            self._split_block(block)
+        else:
+            self._rebuild_tree()
+
+    def _insert(self, annotation: Annotation):
+        time_start = annotation.time_start
+        time_end = annotation.time_end
+        self._indexed_starts[annotation] = time_start
+        if not self._block_starts:
+            self._set_entries([(time_start, time_end, annotation)])
+            return
+
+        block = max(bisect_right(self._first_starts, time_start) - 1, 0)
+        starts = self._block_starts[block]
+        position = bisect_right(starts, time_start)
+        starts.insert(position, time_start)
+        self._block_ends[block].insert(position, time_end)
+        self._block_annotations[block].insert(position, annotation)
+        self._first_starts[block] = starts[0]
+        if len(starts) >= 2 * BLOCK_SIZE:
+            self._split_block(block)
+        elif time_end > self._max_ends[self._leaf_count + block]:
+            self._set_block_max_end(block, time_end)
+
+    def _delete(self, annotation: Annotation):
+        time_start = self._indexed_starts.pop(annotation)
+        # Annotations starting at the same time may end the previous block.
+        block = max(bisect_left(self._first_starts, time_start) - 1, 0)
+        annotations = self._block_annotations[block]
+        position = bisect_left(self._block_starts[block], time_start)
+        while position == len(annotations) or annotations[position] is not annotation:
+            if position == len(annotations):
+                block += 1
+                annotations = self._block_annotations[block]
+                position = 0
+            else:
+                position += 1
+
+        del annotations[position]
+        del self._block_starts[block][position]
+        time_end = self._block_ends[block].pop(position)
+        if len(annotations) < BLOCK_SIZE // 2 and len(self._block_starts) > 1:
+            self._merge_block(block)
+        elif not annotations:
+            self._set_entries([])
+        else:
+            self._first_starts[block] = self._block_starts[block][0]
+            if time_end == self._max_ends[self._leaf_count + block]:
+                self._set_block_max_end(block, max(self._block_ends[block]))
@@ -0,0 +1,307 @@
+"""Columnar storage of annotation table values."""
+from collections.abc import MutableMapping
+from numbers import Integral, Real
+from typing import Any, Dict, Hashable, Iterator, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from mouseapp.model import constants
+
+GEOMETRY_COLUMNS = (
+    constants.COL_BEGIN_TIME,
+    constants.COL_END_TIME,
+    constants.COL_LOW_FREQ,
+    constants.COL_HIGH_FREQ,
+)
+# Columns with few distinct values, stored as codes of their categories.
+CATEGORICAL_COLUMNS = (
+    constants.COL_USV_LABEL,
+    constants.COL_DETECTION_METHOD,
+)
+# Value of cells without a value, like in a `defaultdict(lambda: "")`.
+MISSING = ""
+
+Rows = Union[slice, np.ndarray]
+
+
+def _is_missing(value: Any) -> bool:
+    return isinstance(value, str) and value == MISSING
+
+
+class _GeometryColumn:
+    """Float values present in every row."""
+
+    def __init__(self, size: int = 0):
+        self.values = np.zeros(size, dtype=np.float64)
+
+    def get(self, row: int) -> Any:
+        return float(self.values[row])
+
+    def set(self, row: int, value: Any):
+        self.values[row] = value
+
+    def has_value(self, row: int) -> bool:
+        return True
+
+    def discard(self, row: int):
+        raise KeyError("Geometry of annotations can't be removed")
+
+    def append(self, values: Sequence) -> "_GeometryColumn":
+        self.values = np.concatenate([self.values, np.asarray(values, dtype=np.float64)])
+        return self
+
+    def take(self, rows: Rows):
+        self.values = self.values[rows]
+
+    def to_array(self) -> np.ndarray:
+        return self.values
+
+
+class _CategoricalColumn:
+    """Values stored as codes of categories, -1 marks missing values."""
+
+    def __init__(self, size: int = 0):
+        self.codes = np.full(size, -1, dtype=np.int32)
+        self.categories: List[Hashable] = []
+        self._category_codes: Dict[Hashable, int] = {}
+
+    def encode(self, value: Any) -> int:
+        if _is_missing(value):
+            return -1
+        code = self._category_codes.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(value)
+            self._category_codes[value] = code
+        return code
+
+    def get(self, row: int) -> Any:
+        code = self.codes[row]
+        return MISSING if code < 0 else self.categories[code]
+
+    def set(self, row: int, value: Any):
+        self.codes[row] = self.encode(value)
+
+    def has_value(self, row: int) -> bool:
+        return self.codes[row] >= 0
+
+    def discard(self, row: int):
+        self.codes[row] = -1
+
+    def append(self, values: Sequence) -> "_CategoricalColumn":
+        codes = np.fromiter((self.encode(value) for value in values),
+                            dtype=np.int32,
+                            count=len(values))
+        self.codes = np.concatenate([self.codes, codes])
+        return self
+
+    def take(self, rows: Rows):
+        self.codes = self.codes[rows]
+
+    def to_array(self) -> np.ndarray:
+        categories = np.empty(len(self.categories) + 1, dtype=object)
+        categories[:-1] = self.categories
+        categories[-1] = MISSING
+        return categories[self.codes]
+
+
+class _NumericColumn:
+    """Integer or float values of an extra column, with a mask of present ones.
+
+    Integer columns become float columns when a float is stored in them.
+    Values of other types can't be stored, the column has to be converted
+    to a `_CategoricalColumn` instead.
+    """
+
+    def __init__(self, size: int = 0, dtype=np.int64):
+        self.values = np.zeros(size, dtype=dtype)
+        self.present = np.zeros(size, dtype=bool)
+
+    @staticmethod
+    def accepts(value: Any) -> bool:
+        return isinstance(value, Real) and not isinstance(value, (bool, np.bool_))
+
+    def get(self, row: int) -> Any:
+        if not self.present[row]:
+            return MISSING
+        return self.values[row].item()
+
+    def set(self, row: int, value: Any):
+        self._promote([value])
+        self.values[row] = value
+        self.present[row] = True
+
+    def has_value(self, row: int) -> bool:
+        return bool(self.present[row])
+
+    def discard(self, row: int):
+        self.present[row] = False
+
+    def append(self, values: Sequence) -> "_NumericColumn":
+        present = np.array([not _is_missing(value) for value in values], dtype=bool)
+        filled = [0 if _is_missing(value) else value for value in values]
+        self._promote(filled)
+        self.values = np.concatenate([self.values, np.asarray(filled, dtype=self.values.dtype)])
+        self.present = np.concatenate([self.present, present])
+        return self
+
+    def take(self, rows: Rows):
+        self.values = self.values[rows]
+        self.present = self.present[rows]
+
+    def to_array(self) -> np.ndarray:
+        values = self.values.astype(object)
+        values[~self.present] = MISSING
+        return values
+
+    def to_categorical(self) -> _CategoricalColumn:
+        column = _CategoricalColumn()
+        return column.append(self.to_array())
+
+    def _promote(self, values: Sequence):
+        if self.values.dtype == np.int64 and not all(isinstance(value, Integral) for value in values):
+            self.values = self.values.astype(np.float64)
+
+
+class AnnotationStore:
+    """Values of annotation table cells kept in a column per table column.
+
+    Geometry columns are float arrays, labels and detection methods are
+    categorical codes and extra columns are numeric arrays, unless they
+    contain other values and become categorical. Rows have ids, which stay
+    the same when rows are removed or reordered. Row of each id is kept in
+    an array indexed by ids, so rows and ids are found from each other in
+    constant time.
+    """
+
+    def __init__(self):
+        self._columns: Dict[str, Any] = {}
+        for column in GEOMETRY_COLUMNS:
+            self._columns[column] = _GeometryColumn()
+        for column in CATEGORICAL_COLUMNS:
+            self._columns[column] = _CategoricalColumn()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.checked = np.empty(0, dtype=bool)
+        # Row of each id given so far, -1 for ids of removed rows.
+        self._rows_by_id = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+
+    def append(self, rows: Sequence[Dict[str, Any]], checked: Sequence[bool] = None) -> np.ndarray:
+        """Append `rows` of values by column names and return their ids."""
+        count = len(rows)
+        for column in dict.fromkeys(name for row in rows for name in row):
+            if column not in self._columns:
+                self._columns[column] = self._create_column([row.get(column, MISSING) for row in rows],
+                                                            size=len(self))
+        for column_name, column in list(self._columns.items()):
+            values = [row.get(column_name, MISSING) for row in rows]
+            if isinstance(column, _NumericColumn) and not all(
+                    _is_missing(value) or column.accepts(value) for value in values):
+                column = self._columns[column_name] = column.to_categorical()
+            column.append(values)
+
+        ids = np.arange(len(self._rows_by_id), len(self._rows_by_id) + count, dtype=np.int64)
+        self._rows_by_id = np.concatenate([self._rows_by_id, np.arange(len(self), len(self) + count)])
+        self.ids = np.concatenate([self.ids, ids])
+        if checked is None:
+            checked = np.zeros(count, dtype=bool)
+        self.checked = np.concatenate([self.checked, np.asarray(checked, dtype=bool)])
+        return ids
+
+    def get_row(self, annotation_id: int) -> int:
+        row = self._rows_by_id[annotation_id] if 0 <= annotation_id < len(self._rows_by_id) else -1
+        if row < 0:
+            raise KeyError(f"No annotation with id {annotation_id}")
+        return int(row)
+
+    def get_rows(self, annotation_ids: Sequence[int]) -> np.ndarray:
+        return self._rows_by_id[np.asarray(annotation_ids, dtype=np.int64)]
+
+    def get(self, row: int, column: str) -> Any:
+        if column not in self._columns:
+            return MISSING
+        return self._columns[column].get(row)
+
+    def set(self, row: int, column: str, value: Any):
+        if column not in self._columns:
+            self._columns[column] = self._create_column([value], size=len(self))
+        elif isinstance(self._columns[column], _NumericColumn) and not _NumericColumn.accepts(value):
+            self._columns[column] = self._columns[column].to_categorical()
+        self._columns[column].set(row, value)
+
+    def has_value(self, row: int, column: str) -> bool:
+        return column in self._columns and self._columns[column].has_value(row)
+
+    def discard(self, row: int, column: str):
+        if column in self._columns:
+            self._columns[column].discard(row)
+
+    def get_row_values(self, row: int) -> Dict[str, Any]:
+        return {name: column.get(row) for name, column in self._columns.items() if column.has_value(row)}
+
+    def get_column(self, column: str) -> np.ndarray:
+        """Get values of `column` in all rows, `MISSING` where there are none."""
+        if column not in self._columns:
+            return np.full(len(self), MISSING, dtype=object)
+        return self._columns[column].to_array()
+
+    def take(self, rows: Rows):
+        """Keep only `rows`, given as a slice, indices or a boolean mask.
+
+        Indices don't have to be sorted, so rows can be reordered as well.
+        """
+        for column in self._columns.values():
+            column.take(rows)
+        self.ids = self.ids[rows]
+        self.checked = self.checked[rows]
+        self._rows_by_id.fill(-1)
+        self._rows_by_id[self.ids] = np.arange(len(self.ids))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        columns = {}
+        for name, column in self._columns.items():
+            if isinstance(column, _GeometryColumn) or (isinstance(column, _NumericColumn) and
+                                                       column.present.all()):
+                columns[name] = column.values
+            else:
+                columns[name] = column.to_array()
+        return pd.DataFrame(columns)
+
+    @staticmethod
+    def _create_column(values: Sequence, size: int = 0):
+        if all(_is_missing(value) or _NumericColumn.accepts(value) for value in values):
+            dtype = np.int64
+            if not all(isinstance(value, Integral) for value in values if not _is_missing(value)):
+                dtype = np.float64
+            return _NumericColumn(size, dtype)
+        return _CategoricalColumn(size)
+
+
+class AnnotationRow(MutableMapping):
+    """Table values of a stored annotation, read from and written to its row."""
+
+    def __init__(self, store: AnnotationStore, annotation_id: int):
+        self._store = store
+        self._id = annotation_id
+
+    def __getitem__(self, column: str) -> Any:
+        return self._store.get(self._store.get_row(self._id), column)
+
+    def __setitem__(self, column: str, value: Any):
+        self._store.set(self._store.get_row(self._id), column, value)
+
+    def __delitem__(self, column: str):
+        self._store.discard(self._store.get_row(self._id), column)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.get_row_values(self._store.get_row(self._id)))
+
+    def __len__(self) -> int:
+        return len(self._store.get_row_values(self._store.get_row(self._id)))
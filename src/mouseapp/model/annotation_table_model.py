@@ -1,12 +1,27 @@
 from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QObject, Signal
-from typing import Optional, Union, List
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 import warnings
 
+import numpy as np
+
 from mouseapp.controller import utils
 from mouseapp.model import constants
+from mouseapp.model.annotation_index import AnnotationIntervalIndex
+from mouseapp.model.annotation_store import AnnotationStore
 from mouseapp.model.utils import Annotation, SerializableModel
 
 
+def _get_ranges(indices) -> List[Tuple[int, int]]:
+    """Group sorted unique `indices` into `(first, last)` of consecutive ones."""
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(indices) > 1) + 1
+    firsts = indices[np.concatenate([[0], breaks])]
+    lasts = indices[np.concatenate([breaks - 1, [len(indices) - 1]])]
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+
 class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
     #issue -> make sure that removing Serializable Model is correct
 
@@ -17,6 +32,9 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
         super(AnnotationTableModel, self).__init__(parent)
         self._spectrogram_model = spectrogram_model
         self._annotations = []
+        # Values of the table, `self._annotations` are views of its rows.
+        self._store = AnnotationStore()
+        self._interval_index = AnnotationIntervalIndex()
         self._annotations_column_names = [
             constants.COL_BEGIN_TIME,
             constants.COL_END_TIME,
@@ -81,10 +99,9 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
         if role == Qt.DisplayRole or role == Qt.EditRole:
             c = index.column()
             if c < len(self.annotations_column_names):
-                return str(self.annotations[index.row()].table_data[
-                    self.annotations_column_names[c]])
+                return str(self._store.get(index.row(), self.annotations_column_names[c]))
         if role == Qt.CheckStateRole and index.column() == 0:
-            if self.annotations[index.row()].checked:
+            if self._store.checked[index.row()]:
                 return Qt.CheckState.Checked
             else:
                 return Qt.CheckState.Unchecked
@@ -115,12 +132,14 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
             if column == constants.COL_BEGIN_TIME:
                 if value < annotation.time_end:
                     annotation.time_start = value
+                    self.reindex_annotation(annotation)
                     self._spectrogram_model.signal_visible_annotations()
                 else:
                     warnings.warn("Begin Time (s) should be smaller than End Time (s)")
             elif column == constants.COL_END_TIME:
                 if value > annotation.time_start:
                     annotation.time_end = value
+                    self.reindex_annotation(annotation)
                     self._spectrogram_model.signal_visible_annotations()
                 else:
                     warnings.warn("Begin Time (s) should be smaller than End Time (s)")
@@ -137,8 +156,11 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
                 else:
                     warnings.warn("Low Freq (Hz) should be smaller than High Freq (Hz)")
             elif column not in [constants.COL_DETECTION_METHOD]:
-                annotation.table_data[column] = value
+                self._store.set(index.row(), column, value)
+            else:
+                return True
 
+            self.dataChanged.emit(index, index)
             return True
         if role == Qt.CheckStateRole:
             if value == Qt.CheckState.Unchecked:
@@ -165,11 +187,38 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
         return None
 
     def removeRows(self, position, rows=1, index=QModelIndex()):
-        self.beginRemoveRows(QModelIndex(), position, position + rows - 1)
-        del self.annotations[position:position + rows]
-        self.endRemoveRows()
+        self.remove_annotations(np.arange(position, position + rows))
         return True
 
+    def remove_annotations(self, rows) -> List[Annotation]:
+        """Remove annotations in `rows` and return them.
+
+        Rows are grouped into ranges of consecutive rows, removal of each range
+        is signalled once. Values of the remaining rows are compacted in a
+        single pass over the table.
+        """
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        if len(rows) == 0:
+            return []
+
+        removed = [self._annotations[row] for row in rows]
+        self._interval_index.remove(removed)
+        self.checked_annotations_counter -= int(self._store.checked[rows].sum())
+        for annotation in removed:
+            annotation.detach()
+
+        keep = np.ones(len(self._annotations), dtype=bool)
+        keep[rows] = False
+        # Later ranges are removed first, so rows of earlier ones don't move.
+        # Rows before each removed range keep their values until the store is
+        # compacted after the last one.
+        for first, last in reversed(_get_ranges(rows)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._annotations[first:last + 1]
+            self.endRemoveRows()
+        self._store.take(keep)
+        return removed
+
     def flags(self, index):
         """Define actions possible on the table.
 
@@ -186,7 +235,11 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
     def annotations(self, annotations):
         if len(self.annotations) > 0:
             self.beginRemoveRows(QModelIndex(), 0, len(self.annotations) - 1)
+            for annotation in self.annotations:
+                annotation.detach()
             del self.annotations[:]
+            self._store = AnnotationStore()
+            self._interval_index.clear()
             self.endRemoveRows()
 
         self.append_annotations(annotations)
@@ -198,16 +251,77 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
             len(self.annotations),
             len(self.annotations) + len(data) - 1,
         )
+        # Times are indexed before rows are stored, while they are plain values.
+        self._interval_index.add(data)
+        ids = self._store.append([dict(annotation.table_data) for annotation in data],
+                                 [annotation.checked for annotation in data])
+        for annotation, annotation_id in zip(data, ids):
+            annotation.attach(self._store, int(annotation_id))
         self._annotations += data
         self.endInsertRows()
         return True
 
+    @property
+    def store(self) -> AnnotationStore:
+        return self._store
+
+    def reindex_annotation(self, annotation: Annotation):
+        """Update time index after times of `annotation` were changed."""
+        self._interval_index.update(annotation)
+
+    def get_annotations_between(self, time_start: float,
+                                time_end: float) -> List[Annotation]:
+        """Get annotations visible between given times.
+
+        An annotation is visible if it starts or ends in [`time_start`,
+        `time_end`) or spans the whole range.
+        """
+        return self._interval_index.query(time_start, time_end)
+
+    def get_rows(self, annotations: Iterable[Annotation]) -> np.ndarray:
+        """Get rows of `annotations`, skipping those which aren't in the table."""
+        ids = [annotation._id for annotation in annotations if annotation._store is self._store]
+        return self._store.get_rows(ids)
+
+    def get_row(self, annotation: Annotation) -> Optional[int]:
+        """Get row of `annotation` or None if it isn't in the table."""
+        if annotation._store is not self._store:
+            return None
+        return self._store.get_row(annotation._id)
+
+    def update_cells(self, rows: Iterable[int], columns: Iterable[Union[int, str]]):
+        """Signal that values in `rows` and `columns` changed.
+
+        Columns are given by indices or names, names of hidden columns are
+        skipped. Cells are signalled in rectangles of consecutive rows and
+        columns.
+        """
+        column_indices = [
+            column if isinstance(column, int) else self.annotations_column_names.index(column)
+            for column in columns
+            if isinstance(column, int) or column in self.annotations_column_names
+        ]
+        row_ranges = _get_ranges(np.unique(np.asarray(list(rows), dtype=np.int64)))
+        for first_column, last_column in _get_ranges(np.unique(column_indices)):
+            for first_row, last_row in row_ranges:
+                self.dataChanged.emit(self.index(first_row, first_column),
+                                      self.index(last_row, last_column))
+
+    def update_annotation_values(self, annotation: Annotation, values: Dict[str, object]):
+        """Set table `values` of `annotation`, signalling only the changed ones."""
+        table_data = annotation.table_data
+        changed_columns = [column for column, value in values.items() if table_data[column] != value]
+        for column in changed_columns:
+            table_data[column] = values[column]
+        if constants.COL_BEGIN_TIME in changed_columns or constants.COL_END_TIME in changed_columns:
+            self.reindex_annotation(annotation)
+        self.update_cells(self.get_rows([annotation]), changed_columns)
+
     def update_selected_field(self, row, column):
-        self.dataChanged.emit(self.index(row, column), self.index(row, column))
+        self.update_cells([row], [column])
 
     def update_selected_column(self, column):
-        self.dataChanged.emit(self.index(0, column),
-                              self.index(self.rowCount(), column))
+        self.update_cells(range(self.rowCount()), [column])
 
     def update_all_displayed_data(self):
         self.dataChanged.emit(self.index(0, 0),
@@ -252,6 +366,17 @@ class AnnotationTableModel(QAbstractTableModel): #, SerializableModel
             self.delete_button_show.emit(False)
         self._checked_annotations_counter = value
 
+    def check_annotations(self, rows: Iterable[int], state: bool = True):
+        """Set check state of annotations in `rows` and signal the changed ones."""
+        rows = np.unique(np.asarray(list(rows), dtype=np.int64))
+        changed_rows = rows[self._store.checked[rows] != state]
+        self._store.checked[changed_rows] = state
+        if state:
+            self.checked_annotations_counter += len(changed_rows)
+        else:
+            self.checked_annotations_counter -= len(changed_rows)
+        self.update_cells(changed_rows, [0])
+
     def check_annotation(self, row, state):
         if not self.annotations[row].checked == state:
             self.annotations[row].checked = state
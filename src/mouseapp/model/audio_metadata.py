@@ -0,0 +1,29 @@
+"""Metadata of the project's audio files read from their headers."""
+from pathlib import Path
+from typing import NamedTuple
+
+
+class AudioMetadata(NamedTuple):
+    """Properties of an audio file, read without decoding the audio.
+
+    `size` and `mtime_ns` identify the version of the file the metadata was
+    read from.
+    """
+
+    num_frames: int
+    sample_rate: int
+    num_channels: int
+    size: int
+    mtime_ns: int
+
+    @property
+    def duration(self) -> float:
+        return self.num_frames / self.sample_rate
+
+    def is_current(self, path: Path) -> bool:
+        """Check whether the file at `path` wasn't modified since it was read."""
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
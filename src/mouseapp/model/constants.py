@@ -4,5 +4,10 @@ COL_LOW_FREQ = "Low Freq (Hz)"
 COL_HIGH_FREQ = "High Freq (Hz)"
 COL_USV_LABEL = "USV TYPE"
 COL_DETECTION_METHOD = "Detection Method"
+# Columns added to exported annotations, relative to the audio file containing
+# the beginning of an annotation.
+COL_FILE = "File"
+COL_FILE_BEGIN_TIME = "File Begin Time (s)"
+COL_FILE_END_TIME = "File End Time (s)"
 
 COL_USV_LABEL_ID = 4
@@ -0,0 +1,107 @@
+"""Latency measurements of spectrogram tab stages."""
+import csv
+import functools
+import time
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+from PySide6.QtCore import QMutex, QMutexLocker
+
+LATENCY_BUFFER_SIZE = 1024
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyRecorder:
+    """Durations of the latest `buffer_size` runs of each stage.
+
+    Durations of a stage are kept in a ring buffer, so recording doesn't
+    allocate and old runs are overwritten. Nothing is recorded until
+    `enabled` is set.
+    """
+
+    def __init__(self, buffer_size: int = LATENCY_BUFFER_SIZE):
+        self.enabled = False
+        self._buffer_size = buffer_size
+        self._buffers: Dict[str, np.ndarray] = {}
+        # Total number of runs of each stage, including the overwritten ones.
+        self._counts: Dict[str, int] = {}
+        self._mutex = QMutex()
+
+    @property
+    def stages(self):
+        return list(self._buffers)
+
+    def record(self, stage: str, seconds: float):
+        with QMutexLocker(self._mutex):
+            if stage not in self._buffers:
+                self._buffers[stage] = np.empty(self._buffer_size)
+                self._counts[stage] = 0
+            self._buffers[stage][self._counts[stage] % self._buffer_size] = seconds
+            self._counts[stage] += 1
+
+    def timed(self, stage: str) -> Callable:
+        """Decorate a function to record its duration as `stage`."""
+
+        def decorator(function: Callable) -> Callable:
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def get_durations(self, stage: str) -> np.ndarray:
+        """Get recorded durations of `stage` in seconds, oldest first."""
+        with QMutexLocker(self._mutex):
+            if stage not in self._buffers:
+                return np.empty(0)
+            count = self._counts[stage]
+            buffer = self._buffers[stage]
+            if count <= self._buffer_size:
+                return buffer[:count].copy()
+            position = count % self._buffer_size
+            return np.concatenate([buffer[position:], buffer[:position]])
+
+    def get_percentiles(self) -> Dict[str, Tuple[float, ...]]:
+        """Get `PERCENTILES` of durations of each stage in milliseconds."""
+        percentiles = {}
+        for stage in self.stages:
+            durations = self.get_durations(stage)
+            if len(durations) > 0:
+                percentiles[stage] = tuple(np.percentile(durations, PERCENTILES) * 1000)
+        return percentiles
+
+    def to_csv(self, filename: Path):
+        """Save percentiles of each stage, then recorded durations.
+
+        The first section has a row of `PERCENTILES` per stage, like the
+        overlay shows. After an empty row, the second one has a row of stage
+        and milliseconds per recorded duration.
+        """
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["stage"] + [f"p{percentile}_ms" for percentile in PERCENTILES])
+            for stage, percentiles in self.get_percentiles().items():
+                writer.writerow([stage, *percentiles])
+            writer.writerow([])
+            writer.writerow(["stage", "duration_ms"])
+            for stage in self.stages:
+                for duration in self.get_durations(stage):
+                    writer.writerow([stage, duration * 1000])
+
+    def clear(self):
+        with QMutexLocker(self._mutex):
+            self._buffers.clear()
+            self._counts.clear()
+
+
+latency_recorder = LatencyRecorder()
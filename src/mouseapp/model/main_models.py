@@ -14,6 +14,9 @@ from mouseapp.model.settings.settings_model import SettingsModel
 from mouseapp.model.utils import BackgroundTask, Annotation, SerializableModel
 from mouseapp.model.utils import MouseProject
 from mouseapp.model.annotation_table_model import AnnotationTableModel
+from mouseapp.model.audio_metadata import AudioMetadata
+from mouseapp.model.tile_cache import DEFAULT_CACHE_SIZE_MB, DisplayTile, TileCache
+from mouseapp.model.timeline import Timeline
 
 
 class ProjectModel(SerializableModel):
@@ -41,6 +44,9 @@ class ProjectModel(SerializableModel):
             audio_files = list()
         self._audio_files: List[Path] = audio_files
         self._audio_files_attr_name = "audio_files"
+        # Header metadata of `audio_files`, see `audio_stream.update_metadata_index`.
+        self._audio_metadata: Dict[Path, AudioMetadata] = dict()
+        self._audio_metadata_attr_name = "audio_metadata"
         self._project_name = ""
         self._experiment_date: Optional[QDate] = None
         self._experiment_date_attr_name = "experiment_date"
@@ -58,6 +64,14 @@ class ProjectModel(SerializableModel):
         self._audio_files = list_of_files
         self.audio_files_changed.emit(len(self.audio_files))
 
+    @property
+    def audio_metadata(self) -> Dict[Path, AudioMetadata]:
+        return self._audio_metadata
+
+    @audio_metadata.setter
+    def audio_metadata(self, audio_metadata: Dict[Path, AudioMetadata]):
+        self._audio_metadata = audio_metadata
+
     @property
     def project_name(self):
         return self._project_name
@@ -135,6 +149,8 @@ class ProjectModel(SerializableModel):
     def _value_to_dict(self, name, value):
         if name == self._audio_files_attr_name:
             return [str(path) for path in value]
+        if name == self._audio_metadata_attr_name:
+            return {str(path): metadata._asdict() for path, metadata in value.items()}
         if isinstance(value, Path):
             return str(value)
         if isinstance(value, QDate):
@@ -144,6 +160,10 @@ class ProjectModel(SerializableModel):
     def _value_from_dict(self, name, value):
         if name == self._audio_files_attr_name:
             return [Path(path) for path in value]
+        if name == self._audio_metadata_attr_name:
+            return {
+                Path(path): AudioMetadata(**metadata) for path, metadata in value.items()
+            }
         if name == self._project_path_attr_name:
             return Path(value)
         if name == self._experiment_date_attr_name and isinstance(value, str):
@@ -157,7 +177,9 @@ class SpectrogramModel(SerializableModel):
     spectrogram_display_size_changed = Signal(int)
     slider_step_size_changed = Signal(int)
     spectrogram_data_changed = Signal(tuple)
-    spectrogram_chunk_data_changed = Signal(SpectrogramData)
+    # Values of the spectrogram changed, but its shape and times didn't.
+    spectrogram_data_updated = Signal()
+    display_tile_changed = Signal(DisplayTile)
     visible_annotations_changed = Signal(tuple)
     progressbar_changed = Signal(tuple)
     detection_info_changed = Signal(tuple)
@@ -178,6 +200,12 @@ class SpectrogramModel(SerializableModel):
         self.sample_rate = None
         self.spectrogram_calculator: Optional[Spectrogram] = None
         self._spectrogram_data: Optional[SpectrogramData] = None
+        # Max-pooled spectrograms with fewer frames, finest first.
+        self.spectrogram_pyramid: List[SpectrogramData] = []
+        # Maps time of the spectrogram to audio files.
+        self.timeline: Optional[Timeline] = None
+        # Key under which `spectrogram_data` is mapped from the project cache.
+        self.spectrogram_cache_key: Optional[str] = None
 
         # Annotations
         # This model is later overwritten in view.
@@ -187,9 +215,16 @@ class SpectrogramModel(SerializableModel):
         self._spectrogram_display_size = 1000  # time in milliseconds
         self._slider_step_size = self._spectrogram_display_size / 20
         self._annotation_margin = self._spectrogram_display_size / 20
-        self._current_spectrogram_chunk_data: Optional[SpectrogramData] = None
+        self._current_display_tile: Optional[DisplayTile] = None
         self._visible_annotations: List[Annotation] = []
-        self.time_mask = None
+        # Frames of `displayed_spectrogram_data` in the current chunk.
+        self.time_slice: Optional[slice] = None
+        # Pyramid level shown in the current chunk, 0 is `spectrogram_data`.
+        self.displayed_level = 0
+        # Width of the spectrogram plot in pixels, set by the view.
+        self.viewport_width: Optional[int] = None
+        # Chunks prepared for display, keyed by pyramid level and time slice.
+        self.tile_cache = TileCache(max_bytes=DEFAULT_CACHE_SIZE_MB * 2**20)
 
         # Parameters related to long spectrogram operations
         self.main_spectrogram_mutex = QMutex()
@@ -207,7 +242,15 @@ class SpectrogramModel(SerializableModel):
         self._dict_denylist.update([
             "spectrogram_data",
             "spectrogram_calculator",
-            "time_mask",
+            "spectrogram_pyramid",
+            "spectrogram_cache_key",
+            "timeline",
+            "displayed_spectrogram_data",
+            "displayed_level",
+            "viewport_width",
+            "time_slice",
+            "tile_cache",
+            "current_display_tile",
             "current_spectrogram_chunk_data",
             "visible_annotations",
             "current_spectrogram_chunk_data",
@@ -313,13 +356,23 @@ class SpectrogramModel(SerializableModel):
         self._progressbar_count = value
 
     @property
-    def current_spectrogram_chunk_data(self):
-        return self._current_spectrogram_chunk_data
+    def current_display_tile(self) -> Optional[DisplayTile]:
+        return self._current_display_tile
+
+    @current_display_tile.setter
+    def current_display_tile(self, display_tile: DisplayTile):
+        self._current_display_tile = display_tile
+        self.display_tile_changed.emit(display_tile)
+
+    @property
+    def current_spectrogram_chunk_data(self) -> Optional[SpectrogramData]:
+        if self._current_display_tile is None:
+            return None
+        return self._current_display_tile.spectrogram_data
 
     @current_spectrogram_chunk_data.setter
-    def current_spectrogram_chunk_data(self, spectrogram_chunk):
-        self._current_spectrogram_chunk_data = spectrogram_chunk
-        self.spectrogram_chunk_data_changed.emit(spectrogram_chunk)
+    def current_spectrogram_chunk_data(self, spectrogram_chunk: SpectrogramData):
+        self.current_display_tile = DisplayTile(spectrogram_chunk)
 
     @property
     def spectrogram_data(self) -> Optional[SpectrogramData]:
@@ -328,10 +381,39 @@ class SpectrogramModel(SerializableModel):
     @spectrogram_data.setter
     def spectrogram_data(self, spectrogram_data):
         self._spectrogram_data = spectrogram_data
-        self.time_mask = None  # invalidate time mask
+        self.tile_cache.clear()
+        self.time_slice = None  # invalidate time slice
+        self.displayed_level = 0
         self.spectrogram_data_changed.emit(
             (self._spectrogram_data, self._spectrogram_display_size))
 
+    def update_spectrogram_data(self, spectrogram_data: SpectrogramData,
+                                spectrogram_pyramid: List[SpectrogramData]):
+        """Replace the spectrogram with one of the same shape.
+
+        Unlike setting `spectrogram_data`, the view isn't reset, so the
+        displayed part of the spectrogram is kept.
+        """
+        self.spectrogram_pyramid = spectrogram_pyramid
+        self._spectrogram_data = spectrogram_data
+        self.signal_spectrogram_data_updated()
+
+    def signal_spectrogram_data_updated(self):
+        """Signal that values of the spectrogram changed in place.
+
+        Tiles prepared from the old values are dropped, including those which
+        are being prefetched.
+        """
+        self.tile_cache.clear()
+        self.spectrogram_data_updated.emit()
+
+    @property
+    def displayed_spectrogram_data(self) -> Optional[SpectrogramData]:
+        """Spectrogram (pyramid level) from which the current chunk is taken."""
+        if self.displayed_level == 0:
+            return self._spectrogram_data
+        return self.spectrogram_pyramid[self.displayed_level - 1]
+
     @property
     def spectrogram_display_size(self):
         return self._spectrogram_display_size
@@ -363,8 +445,8 @@ class SpectrogramModel(SerializableModel):
         self.signal_visible_annotations()
 
     def signal_visible_annotations(self):
-        times = self.spectrogram_data.times
-        freqs = self.spectrogram_data.freqs
+        times = self.displayed_spectrogram_data.times
+        freqs = self.displayed_spectrogram_data.freqs
         display_start = self.current_spectrogram_chunk_data.times[0]
         self.visible_annotations_changed.emit(
             (self._visible_annotations, times, display_start, freqs))
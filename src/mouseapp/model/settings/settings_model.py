@@ -11,6 +11,7 @@ from mouseapp.model.settings.denoising_models import (
 )
 from mouseapp.model.settings.filtering_model import FilteringModel
 from mouseapp.model.settings.detection_models import GACModel, NNModel
+from mouseapp.model.settings.spectrogram_settings_model import SpectrogramSettingsModel
 from mouseapp.model.settings.utils import Denoising, Detection
 from mouseapp.model.utils import SerializableModel
 
@@ -49,6 +50,9 @@ class SettingsModel(SerializableModel):
         # Classification models
         self._threshold_model = ThresholdModel()
 
+        # Spectrogram model
+        self._spectrogram_settings_model = SpectrogramSettingsModel()
+
         self._dict_denylist.update([
             "no_filter_model",
             "denoising_spectrogram_data",
@@ -171,6 +175,14 @@ class SettingsModel(SerializableModel):
     def threshold_model(self, value: ThresholdModel):
         self._threshold_model = value
 
+    @property
+    def spectrogram_settings_model(self) -> SpectrogramSettingsModel:
+        return self._spectrogram_settings_model
+
+    @spectrogram_settings_model.setter
+    def spectrogram_settings_model(self, value: SpectrogramSettingsModel):
+        self._spectrogram_settings_model = value
+
     def _value_to_dict(self, name, value):
         if isinstance(getattr(self, name), SerializableModel):
             return value.to_dict()
@@ -206,6 +218,10 @@ class SettingsModel(SerializableModel):
             filtering_model = FilteringModel()
             filtering_model.from_dict(value)
             return filtering_model
+        elif name == "spectrogram_settings_model":
+            spectrogram_settings_model = SpectrogramSettingsModel()
+            spectrogram_settings_model.from_dict(value)
+            return spectrogram_settings_model
         return value
 
     def emit_all_setting_signals(self):
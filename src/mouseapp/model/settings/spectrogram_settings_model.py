@@ -0,0 +1,100 @@
+from typing import Optional
+
+from PySide6.QtCore import Signal
+
+from mouseapp.model.settings.utils import SpectrogramRendering, SpectrogramStorage
+from mouseapp.model.tile_cache import DEFAULT_CACHE_SIZE_MB
+from mouseapp.model.utils import SerializableModel
+
+
+class SpectrogramSettingsModel(SerializableModel):
+    """Settings of how the project spectrogram is built and kept in memory."""
+
+    storage_mode_changed = Signal(str)
+    frequency_min_changed = Signal(float)
+    # `None` means that the range isn't limited from above.
+    frequency_max_changed = Signal(object)
+    display_cache_size_changed = Signal(int)
+    rendering_changed = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+
+        self._default_values = {
+            "_storage_mode": SpectrogramStorage.FLOAT32,
+            "_frequency_min": 0.0,
+            "_frequency_max": None,
+            "_display_cache_size": DEFAULT_CACHE_SIZE_MB,
+            "_rendering": SpectrogramRendering.MESH,
+        }
+        self._storage_mode: SpectrogramStorage = SpectrogramStorage.FLOAT32
+        # Frequency range [Hz] kept in the spectrogram.
+        self._frequency_min: float = 0.0
+        self._frequency_max: Optional[float] = None
+        # Memory [MB] for spectrogram chunks prepared for display.
+        self._display_cache_size: int = DEFAULT_CACHE_SIZE_MB
+        self._rendering: SpectrogramRendering = SpectrogramRendering.MESH
+
+        self.set_default_values()
+
+    def set_default_values(self):
+        for key, val in self._default_values.items():
+            setattr(self, key, val)
+
+    @property
+    def storage_mode(self) -> SpectrogramStorage:
+        return self._storage_mode
+
+    @storage_mode.setter
+    def storage_mode(self, value: SpectrogramStorage):
+        self._storage_mode = SpectrogramStorage(value)
+        self.storage_mode_changed.emit(self._storage_mode.value)
+
+    @property
+    def frequency_min(self) -> float:
+        return self._frequency_min
+
+    @frequency_min.setter
+    def frequency_min(self, value: float):
+        self._frequency_min = value
+        self.frequency_min_changed.emit(value)
+
+    @property
+    def frequency_max(self) -> Optional[float]:
+        return self._frequency_max
+
+    @frequency_max.setter
+    def frequency_max(self, value: Optional[float]):
+        self._frequency_max = value
+        self.frequency_max_changed.emit(value)
+
+    @property
+    def display_cache_size(self) -> int:
+        return self._display_cache_size
+
+    @display_cache_size.setter
+    def display_cache_size(self, value: int):
+        self._display_cache_size = value
+        self.display_cache_size_changed.emit(value)
+
+    @property
+    def rendering(self) -> SpectrogramRendering:
+        return self._rendering
+
+    @rendering.setter
+    def rendering(self, value: SpectrogramRendering):
+        self._rendering = SpectrogramRendering(value)
+        self.rendering_changed.emit(self._rendering.value)
+
+    def emit_all_setting_signals(self):
+        self.storage_mode_changed.emit(self.storage_mode.value)
+        self.frequency_min_changed.emit(self.frequency_min)
+        self.frequency_max_changed.emit(self.frequency_max)
+        self.display_cache_size_changed.emit(self.display_cache_size)
+        self.rendering_changed.emit(self.rendering.value)
+
+    def _value_to_dict(self, name, value):
+        return value
+
+    def _value_from_dict(self, name, value):
+        return value
@@ -54,6 +54,17 @@ class Detection(str, Enum):
     NN = "Neural network detection"
 
 
+class SpectrogramStorage(str, Enum):
+    FLOAT32 = "32-bit float"
+    FLOAT16 = "16-bit float"
+    UINT8 = "8-bit logarithmic"
+
+
+class SpectrogramRendering(str, Enum):
+    IMAGE = "Image"
+    MESH = "Color mesh"
+
+
 @dataclass(frozen=True)
 class OptimisationResult:
     metric_name: str
@@ -0,0 +1,147 @@
+"""Cache of spectrogram chunks prepared for display."""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Iterable, List, Optional
+
+import numpy as np
+from mouse.utils.sound_util import SpectrogramData
+from PySide6.QtCore import QMutex, QMutexLocker
+
+DEFAULT_CACHE_SIZE_MB = 128
+# Number of colors values of the spectrogram are mapped to.
+COLOR_LEVELS = 256
+# Values at or above this one are displayed with the last color.
+DISPLAY_VMAX = 5
+
+
+def get_color_indices(spec: np.ndarray,
+                      vmin: Optional[float] = None,
+                      vmax: Optional[float] = None) -> np.ndarray:
+    """Normalize values of `spec` to indices of `COLOR_LEVELS` colors.
+
+    Like in `pcolormesh`, missing `vmin` and `vmax` are taken from the data.
+    """
+    vmin = float(spec.min()) if vmin is None else vmin
+    vmax = float(spec.max()) if vmax is None else vmax
+    scale = (COLOR_LEVELS - 1) / (vmax - vmin) if vmax > vmin else 0.0
+    indices = np.empty(spec.shape, dtype=np.float32)
+    np.subtract(spec, vmin, out=indices)
+    np.multiply(indices, scale, out=indices)
+    np.clip(indices, 0, COLOR_LEVELS - 1, out=indices)
+    return indices.astype(np.uint8)
+
+
+@dataclass
+class DisplayTile:
+    """Chunk of the spectrogram prepared for display.
+
+    Arrays of a cached tile are contiguous copies owned by it, so its chunk
+    was read from disk and decoded when it was prepared. `color_indices` are
+    the values normalized for the image renderer, they aren't computed for
+    other renderers.
+    """
+
+    spectrogram_data: SpectrogramData
+    color_indices: Optional[np.ndarray] = None
+
+
+def get_tile_size(tile: DisplayTile) -> int:
+    """Get number of bytes taken by arrays of `tile`.
+
+    Frequencies are shared by all tiles, so they aren't counted.
+    """
+    spec = tile.spectrogram_data.spec
+    size = spec.element_size() * spec.nelement() + tile.spectrogram_data.times.nbytes
+    if tile.color_indices is not None:
+        size += tile.color_indices.nbytes
+    return size
+
+
+class TileCache:
+    """Least recently used display tiles, limited by their total size.
+
+    Tiles are put by the GUI thread and by prefetching threads, so the cache
+    is guarded by a mutex. Every `clear` starts a new generation, tiles
+    prepared from a spectrogram of an older generation aren't stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._tiles: OrderedDict[Hashable, DisplayTile] = OrderedDict()
+        self._size = 0
+        self._max_bytes = max_bytes
+        # Keys of tiles which are being prepared by prefetching.
+        self._pending = set()
+        self.generation = 0
+        self._mutex = QMutex()
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with QMutexLocker(self._mutex):
+            return key in self._tiles
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        with QMutexLocker(self._mutex):
+            self._max_bytes = value
+            self._evict()
+
+    def get(self, key: Hashable) -> Optional[DisplayTile]:
+        with QMutexLocker(self._mutex):
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key: Hashable, tile: DisplayTile, generation: int):
+        with QMutexLocker(self._mutex):
+            self._pending.discard(key)
+            if generation != self.generation:
+                return
+            if key in self._tiles:
+                self._size -= get_tile_size(self._tiles.pop(key))
+            tile_size = get_tile_size(tile)
+            if tile_size > self._max_bytes:
+                return
+            self._tiles[key] = tile
+            self._size += tile_size
+            self._evict()
+
+    def reserve(self, keys: Iterable[Hashable]) -> List[Hashable]:
+        """Mark tiles as being prefetched.
+
+        Returns keys of tiles which aren't cached nor already being prefetched.
+        """
+        with QMutexLocker(self._mutex):
+            missing = [
+                key for key in dict.fromkeys(keys)
+                if key not in self._tiles and key not in self._pending
+            ]
+            self._pending.update(missing)
+            return missing
+
+    def release(self, keys: Iterable[Hashable]):
+        """Stop treating tiles as being prefetched."""
+        with QMutexLocker(self._mutex):
+            self._pending.difference_update(keys)
+
+    def clear(self):
+        with QMutexLocker(self._mutex):
+            self._tiles.clear()
+            self._pending.clear()
+            self._size = 0
+            self.generation += 1
+
+    def _evict(self):
+        while self._size > self._max_bytes:
+            _, tile = self._tiles.popitem(last=False)
+            self._size -= get_tile_size(tile)
@@ -0,0 +1,76 @@
+"""Timeline of the project's audio files treated as one recording."""
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+
+class Timeline:
+    """Map time of the concatenated recording to audio files and back.
+
+    Audio files are never concatenated. Instead, global positions are
+    resolved to (file, local offset) pairs with a binary search over
+    cumulative sample counts.
+    """
+
+    def __init__(self, audio_files: List[Path], sample_counts: List[int],
+                 sample_rate: int):
+        self.audio_files = list(audio_files)
+        self.sample_rate = sample_rate
+        # `sample_offsets[i]` is the first global sample of the i-th file.
+        self.sample_offsets = np.concatenate([[0], np.cumsum(sample_counts,
+                                                             dtype=np.int64)])
+
+    def __len__(self):
+        return len(self.audio_files)
+
+    @property
+    def num_samples(self) -> int:
+        return int(self.sample_offsets[-1])
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / self.sample_rate
+
+    def file_start_times(self) -> np.ndarray:
+        return self.sample_offsets[:-1] / self.sample_rate
+
+    def locate_samples(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Find files containing global `samples` and offsets within them.
+
+        Samples on a boundary belong to the later file. Samples outside of the
+        recording are assigned to the first or the last file.
+        """
+        samples = np.asarray(samples)
+        file_indices = np.searchsorted(self.sample_offsets, samples, side="right") - 1
+        file_indices = np.clip(file_indices, 0, len(self) - 1)
+        return file_indices, samples - self.sample_offsets[file_indices]
+
+    def locate_times(self, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Find files containing global `times` and times within those files."""
+        times = np.asarray(times, dtype=np.float64)
+        file_indices = np.searchsorted(self.file_start_times(), times,
+                                       side="right") - 1
+        file_indices = np.clip(file_indices, 0, len(self) - 1)
+        return file_indices, times - self.file_start_times()[file_indices]
+
+    def to_global_times(self, file_indices: np.ndarray,
+                        local_times: np.ndarray) -> np.ndarray:
+        return self.file_start_times()[np.asarray(file_indices)] + local_times
+
+    def sample_ranges(self, start: int, stop: int) -> List[Tuple[int, int, int]]:
+        """Split global samples [`start`, `stop`) into per-file ranges.
+
+        Returns (file index, local start, local stop) triples.
+        """
+        first_file = int(self.locate_samples(start)[0])
+        last_file = int(self.locate_samples(stop - 1)[0])
+        ranges = []
+        for file_index in range(first_file, last_file + 1):
+            file_start = int(self.sample_offsets[file_index])
+            file_stop = int(self.sample_offsets[file_index + 1])
+            local_start = max(start, file_start) - file_start
+            local_stop = min(stop, file_stop) - file_start
+            if local_stop > local_start:
+                ranges.append((file_index, local_start, local_stop))
+        return ranges
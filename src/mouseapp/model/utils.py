@@ -1,16 +1,17 @@
 from __future__ import annotations
 
 import logging
-from collections import defaultdict
+from collections.abc import MutableMapping
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Sequence
 
 import numpy as np
 from PySide6.QtCore import QThread, QObject, Signal
 from mouse.utils.data_util import SqueakBox
 from mouse.utils.sound_util import SpectrogramData
 from mouseapp.model import constants
+from mouseapp.model.annotation_store import GEOMETRY_COLUMNS, AnnotationRow, AnnotationStore
 
 
 @dataclass
@@ -65,7 +66,157 @@ class BackgroundTask:
             print("Internal C++ object (Worker) already deleted.")
 
 
+def find_nearest_indices(values, array: np.ndarray) -> np.ndarray:
+    """Find indices of elements of sorted `array` nearest to each of `values`.
+
+    Ties are resolved towards the lower index, like `np.argmin` does.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(array) == 1:
+        return np.zeros(values.shape, dtype=np.int64)
+    right = np.clip(np.searchsorted(array, values), 1, len(array) - 1)
+    left = right - 1
+    return np.where(values - array[left] <= array[right] - values, left, right)
+
+
+def _get_table_rows(annotations: Sequence[Annotation]) -> Optional[tuple]:
+    """Get the store of `annotations` and their rows, if they share one."""
+    stores = {annotation._store for annotation in annotations}
+    if len(stores) != 1 or None in stores:
+        return None
+    store = stores.pop()
+    return store, store.get_rows([annotation._id for annotation in annotations])
+
+
+def get_annotation_bounds(annotations: Sequence[Annotation]) -> np.ndarray:
+    """Get rows of `[time_start, time_end, freq_start, freq_end]` of `annotations`.
+
+    Bounds of annotations stored in the same table are taken from its columns.
+    """
+    table_rows = _get_table_rows(annotations)
+    if table_rows is not None:
+        store, rows = table_rows
+        return np.stack([store.get_column(column)[rows] for column in GEOMETRY_COLUMNS], axis=1)
+    return np.array([(a.time_start, a.time_end, a.freq_start, a.freq_end) for a in annotations],
+                    dtype=np.float64).reshape(-1, 4)
+
+
+def get_annotation_labels(annotations: Sequence[Annotation]) -> List:
+    table_rows = _get_table_rows(annotations)
+    if table_rows is not None:
+        store, rows = table_rows
+        return store.get_column(constants.COL_USV_LABEL)[rows].tolist()
+    return [annotation.label for annotation in annotations]
+
+
+def annotations_to_pixels(annotations: Sequence[Annotation], times: np.ndarray,
+                          freqs: np.ndarray) -> np.ndarray:
+    """Get rows of `[t_start, t_end, freq_start, freq_end]` pixels of `annotations`.
+
+    Bounds are mapped to the nearest of `times` and `freqs`.
+    """
+    bounds = get_annotation_bounds(annotations)
+    pixels = np.empty(bounds.shape, dtype=np.int64)
+    pixels[:, :2] = find_nearest_indices(bounds[:, :2], times)
+    pixels[:, 2:] = find_nearest_indices(bounds[:, 2:], freqs)
+    return pixels
+
+
+def pixels_to_bounds(pixels: np.ndarray, spec_data: SpectrogramData) -> np.ndarray:
+    """Get bounds of rows of `[t_start, t_end, freq_start, freq_end]` pixels."""
+    pixels = np.asarray(pixels, dtype=np.int64).reshape(-1, 4)
+    bounds = np.empty(pixels.shape, dtype=np.float64)
+    bounds[:, :2] = np.asarray(spec_data.times)[pixels[:, :2]]
+    bounds[:, 2:] = np.asarray(spec_data.freqs)[pixels[:, 2:]]
+    return bounds
+
+
+def to_squeak_boxes(annotations: Sequence[Annotation], spec_data: SpectrogramData) -> List[SqueakBox]:
+    pixels = annotations_to_pixels(annotations, spec_data.times, spec_data.freqs)
+    return [
+        SqueakBox(
+            freq_start=int(freq_start),
+            freq_end=int(freq_end),
+            t_start=int(t_start),
+            t_end=int(t_end),
+            label=label,
+        ) for label, (t_start, t_end, freq_start, freq_end) in zip(get_annotation_labels(annotations), pixels)
+    ]
+
+
+# Table columns of the values kept in `Annotation` attributes.
+_ANNOTATION_ATTRIBUTES = {
+    constants.COL_BEGIN_TIME: "_time_start",
+    constants.COL_END_TIME: "_time_end",
+    constants.COL_LOW_FREQ: "_freq_start",
+    constants.COL_HIGH_FREQ: "_freq_end",
+    constants.COL_USV_LABEL: "_label",
+}
+
+
+class AnnotationTableData(MutableMapping):
+    """Table values of an annotation which isn't stored in a table.
+
+    Bounds and the label are read from the annotation, other values are kept
+    in a dictionary created when the first of them is set.
+    """
+
+    def __init__(self, annotation: Annotation):
+        self._annotation = annotation
+
+    def __getitem__(self, column: str):
+        attribute = _ANNOTATION_ATTRIBUTES.get(column)
+        if attribute is not None:
+            return getattr(self._annotation, attribute)
+        extra = self._annotation._extra
+        return "" if extra is None else extra.get(column, "")
+
+    def __setitem__(self, column: str, value):
+        attribute = _ANNOTATION_ATTRIBUTES.get(column)
+        if attribute is not None:
+            setattr(self._annotation, attribute, value)
+            return
+        if self._annotation._extra is None:
+            self._annotation._extra = {}
+        self._annotation._extra[column] = value
+
+    def __delitem__(self, column: str):
+        if column in _ANNOTATION_ATTRIBUTES:
+            raise KeyError(f"`{column}` of an annotation can't be removed")
+        if self._annotation._extra is None:
+            raise KeyError(column)
+        del self._annotation._extra[column]
+
+    def __iter__(self):
+        yield from _ANNOTATION_ATTRIBUTES
+        if self._annotation._extra is not None:
+            yield from self._annotation._extra
+
+    def __len__(self):
+        extra = self._annotation._extra
+        return len(_ANNOTATION_ATTRIBUTES) + (0 if extra is None else len(extra))
+
+
 class Annotation:
+    """Time and frequency bounds of a vocalization with its table values.
+
+    Annotations added to an `AnnotationTableModel` are views of a row of its
+    `AnnotationStore`, values are read from and written to the store. Other
+    annotations keep their bounds and label in attributes and remaining table
+    values in a dictionary.
+    """
+
+    __slots__ = (
+        "_time_start",
+        "_time_end",
+        "_freq_start",
+        "_freq_end",
+        "_label",
+        "_extra",
+        "_checked",
+        "_store",
+        "_id",
+    )
 
     def __init__(self,
                  time_start,
@@ -74,74 +225,112 @@ class Annotation:
                  freq_end,
                  label=None,
                  table_data=None):
+        self._store: Optional[AnnotationStore] = None
+        self._id: Optional[int] = None
+        self._checked = False
+        self._extra: Optional[Dict] = None
+        if table_data:
+            self.table_data.update(table_data)
         self._time_start = time_start
         self._time_end = time_end
         self._freq_start = freq_start
         self._freq_end = freq_end
         self._label = label
-        self._checked = False
-        if table_data is None:
-            self.table_data = defaultdict(lambda: "")
-        else:
-            self.table_data = table_data
-        self.table_data[constants.COL_BEGIN_TIME] = time_start
-        self.table_data[constants.COL_END_TIME] = time_end
-        self.table_data[constants.COL_LOW_FREQ] = freq_start
-        self.table_data[constants.COL_HIGH_FREQ] = freq_end
-        self.table_data[constants.COL_USV_LABEL] = label
+
+    @property
+    def table_data(self) -> MutableMapping:
+        if self._store is None:
+            return AnnotationTableData(self)
+        return AnnotationRow(self._store, self._id)
+
+    @table_data.setter
+    def table_data(self, table_data):
+        current_table_data = self.table_data
+        for column in list(current_table_data):
+            if column not in table_data and column not in _ANNOTATION_ATTRIBUTES:
+                del current_table_data[column]
+        current_table_data.update(table_data)
 
     @property
     def time_start(self):
-        return self._time_start
+        return self._get(constants.COL_BEGIN_TIME)
 
     @time_start.setter
     def time_start(self, value):
-        self._time_start = value
-        self.table_data[constants.COL_BEGIN_TIME] = value
+        self._set(constants.COL_BEGIN_TIME, value)
 
     @property
     def time_end(self):
-        return self._time_end
+        return self._get(constants.COL_END_TIME)
 
     @time_end.setter
     def time_end(self, value):
-        self._time_end = value
-        self.table_data[constants.COL_END_TIME] = value
+        self._set(constants.COL_END_TIME, value)
 
     @property
     def freq_start(self):
-        return self._freq_start
+        return self._get(constants.COL_LOW_FREQ)
 
     @freq_start.setter
     def freq_start(self, value):
-        self._freq_start = value
-        self.table_data[constants.COL_LOW_FREQ] = value
+        self._set(constants.COL_LOW_FREQ, value)
 
     @property
     def freq_end(self):
-        return self._freq_end
+        return self._get(constants.COL_HIGH_FREQ)
 
     @freq_end.setter
     def freq_end(self, value):
-        self._freq_end = value
-        self.table_data[constants.COL_HIGH_FREQ] = value
+        self._set(constants.COL_HIGH_FREQ, value)
 
     @property
     def label(self):
-        return self._label
+        return self._get(constants.COL_USV_LABEL)
 
     @label.setter
     def label(self, value):
-        self._label = value
-        self.table_data[constants.COL_USV_LABEL] = value
+        self._set(constants.COL_USV_LABEL, value)
 
     @property
     def checked(self):
-        return self._checked
+        if self._store is None:
+            return self._checked
+        return bool(self._store.checked[self._store.get_row(self._id)])
 
     @checked.setter
     def checked(self, value):
-        self._checked = value
+        if self._store is None:
+            self._checked = value
+        else:
+            self._store.checked[self._store.get_row(self._id)] = value
+
+    def attach(self, store: AnnotationStore, annotation_id: int):
+        """Make the annotation a view of row `annotation_id` of `store`."""
+        self._store = store
+        self._id = annotation_id
+        self._extra = None
+
+    def detach(self):
+        """Copy values of the annotation out of its store."""
+        if self._store is None:
+            return
+        row = self._store.get_row(self._id)
+        values = self._store.get_row_values(row)
+        self._checked = bool(self._store.checked[row])
+        self._store = None
+        self._id = None
+        self.table_data.update(values)
+
+    def _get(self, column: str):
+        if self._store is None:
+            return getattr(self, _ANNOTATION_ATTRIBUTES[column])
+        return self._store.get(self._store.get_row(self._id), column)
+
+    def _set(self, column: str, value):
+        if self._store is None:
+            setattr(self, _ANNOTATION_ATTRIBUTES[column], value)
+        else:
+            self._store.set(self._store.get_row(self._id), column, value)
 
     def to_dict(self):
         return {
@@ -153,45 +342,27 @@ class Annotation:
             "table_data": dict(self.table_data),
         }
 
-    def to_squeak_box(self, spec_data: SpectrogramData):
-        # cast to pixels
-        t_start = np.abs(spec_data.times - self.time_start).argmin()
-        t_end = np.abs(spec_data.times - self.time_end).argmin()
-        freq_start = np.abs(spec_data.freqs - self.freq_start).argmin()
-        freq_end = np.abs(spec_data.freqs - self.freq_end).argmin()
-        return SqueakBox(
-            freq_start=int(freq_start),
-            freq_end=int(freq_end),
-            t_start=int(t_start),
-            t_end=int(t_end),
-            label=self.label,
-        )
-
     @staticmethod
     def from_dict(**values) -> Annotation:
-        annotation = Annotation(**values)
-        annotation.table_data = defaultdict(lambda: "", annotation.table_data)
-        return annotation
+        return Annotation(**values)
 
     @staticmethod
-    def from_squeak_box(squeak_box: SqueakBox,
-                        spec_data: SpectrogramData,
-                        table_data: Dict = None) -> Annotation:
-        t_start, t_end = spec_data.times[[squeak_box.t_start, squeak_box.t_end]]
-        freq_start, freq_end = spec_data.freqs[
-            [squeak_box.freq_start, squeak_box.freq_end]
+    def from_squeak_boxes(squeak_boxes: Sequence[SqueakBox],
+                          spec_data: SpectrogramData,
+                          table_data: Dict = None) -> List[Annotation]:
+        """Create annotations of `squeak_boxes`, each with a copy of `table_data`."""
+        pixels = [(box.t_start, box.t_end, box.freq_start, box.freq_end) for box in squeak_boxes]
+        bounds = pixels_to_bounds(pixels, spec_data).tolist()
+        return [
+            Annotation(
+                time_start=time_start,
+                time_end=time_end,
+                freq_start=freq_start,
+                freq_end=freq_end,
+                label=squeak_box.label if squeak_box.label else "Unknown",
+                table_data=table_data,
+            ) for squeak_box, (time_start, time_end, freq_start, freq_end) in zip(squeak_boxes, bounds)
         ]
-        annotation = Annotation(
-            time_start=float(t_start),
-            time_end=float(t_end),
-            freq_start=float(freq_start),
-            freq_end=float(freq_end),
-            label=squeak_box.label if squeak_box.label else "Unknown",
-        )
-
-        for key, val in table_data.items():
-            annotation.table_data[key] = val
-        return annotation
 
 
 class SerializableModel(QObject):
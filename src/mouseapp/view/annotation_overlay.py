@@ -0,0 +1,210 @@
+"""Annotation boxes drawn over the spectrogram."""
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Rectangle
+
+from mouseapp.model.main_models import MainModel
+from mouseapp.model.utils import Annotation, annotations_to_pixels, find_nearest_indices
+from mouseapp.view.box_index import BoxGridIndex
+from mouseapp.view.widgets import BlitOverlay, MovableAnnotationBox
+
+BOX_COLOR = "r"
+# Boxes under the cursor and the selected one can be edited. Boxes beyond
+# this number are returned to the collection.
+INTERACTIVE_BOX_LIMIT = 2
+
+
+class AnnotationOverlay:
+    """Visible annotation boxes drawn as a single collection.
+
+    Box coordinates of all visible annotations are computed at once. Only the
+    selected box and the box under the cursor get a `MovableAnnotationBox`;
+    they are drawn as separate rectangles and hidden from the collection.
+    """
+
+    def __init__(self,
+                 ax: Axes,
+                 model: MainModel,
+                 overlay: BlitOverlay,
+                 on_transition_finished: Callable,
+                 threshold: float = 1):
+        self.ax = ax
+        self.model = model
+        self.overlay = overlay
+        self.on_transition_finished = on_transition_finished
+        self.threshold = threshold
+        self._annotations: List[Annotation] = []
+        # Index of each visible annotation in `self._annotations`.
+        self._annotation_indices: Dict[Annotation, int] = {}
+        # Rows of [x, y, width, height] in relative spectrogram pixels.
+        self._boxes = np.empty((0, 4))
+        self._box_index = BoxGridIndex(np.empty((0, 4)))
+        self._times: Optional[np.ndarray] = None
+        self._freqs: Optional[np.ndarray] = None
+        self._x_start = 0
+        # Interactive boxes by index of their annotation, oldest first.
+        self._interactive_boxes: Dict[int, MovableAnnotationBox] = {}
+        self._hovered: Optional[int] = None
+        self._collection: Optional[PolyCollection] = None
+
+    @property
+    def interactive_boxes(self) -> List[MovableAnnotationBox]:
+        return list(self._interactive_boxes.values())
+
+    def set_annotations(self, annotations: List[Annotation], times: np.ndarray,
+                        display_start_time: float, freqs: np.ndarray):
+        self.clear()
+        self._annotations = list(annotations)
+        self._annotation_indices = {annotation: index for index, annotation in enumerate(self._annotations)}
+        self._times = times
+        self._freqs = freqs
+        self._x_start = int(find_nearest_indices(display_start_time, times))
+        self._boxes = self._compute_boxes(self._annotations)
+        self._box_index = BoxGridIndex(self._get_extents(self._boxes))
+        self._update_collection()
+
+    def clear(self):
+        for mab in self._interactive_boxes.values():
+            mab.rect.remove()
+        self._interactive_boxes = {}
+        self._hovered = None
+        self._annotations = []
+        self._annotation_indices = {}
+        self._boxes = np.empty((0, 4))
+        self._box_index = BoxGridIndex(np.empty((0, 4)))
+        # allow garbage collection of mabs that may
+        # be referenced by static variables
+        MovableAnnotationBox.lock = None
+        MovableAnnotationBox.selected_annotation = None
+        MovableAnnotationBox.rect_near_cursor = None
+        self._update_collection()
+
+    def select(self, annotation: Annotation):
+        index = self._annotation_indices.get(annotation)
+        if index is not None:
+            MovableAnnotationBox.select(self._get_interactive_box(index))
+
+    def on_motion(self, event):
+        """Make the box under the cursor interactive and update the cursor."""
+        lock = MovableAnnotationBox.lock
+        if lock is not None:
+            lock.on_drag(event)
+            return
+
+        hovered = self._find_box(event.xdata, event.ydata)
+        if hovered != self._hovered:
+            self._hovered = hovered
+            if hovered is not None:
+                self._get_interactive_box(hovered)
+        # The box which was near the cursor restores it when left. The selected
+        # box could have been moved away from its indexed extent.
+        for index, mab in list(self._interactive_boxes.items()):
+            if (index == hovered or mab is MovableAnnotationBox.selected_annotation or
+                    mab.rect is MovableAnnotationBox.rect_near_cursor):
+                mab.on_drag(event)
+
+    def on_press(self, event):
+        for mab in self._interactive_boxes.values():
+            if mab.rect is MovableAnnotationBox.rect_near_cursor:
+                mab.on_press(event)
+                return
+        hovered = self._find_box(event.xdata, event.ydata)
+        if hovered is not None:
+            self._get_interactive_box(hovered).on_press(event)
+
+    def _compute_boxes(self, annotations: List[Annotation]) -> np.ndarray:
+        if len(annotations) == 0:
+            return np.empty((0, 4))
+        time_starts, time_ends, freq_starts, freq_ends = annotations_to_pixels(
+            annotations, self._times, self._freqs).T
+        return np.stack([
+            time_starts - self._x_start,
+            freq_starts,
+            time_ends - time_starts,
+            freq_ends - freq_starts,
+        ],
+                        axis=1).astype(np.float64)
+
+    def _get_extents(self, boxes: np.ndarray) -> np.ndarray:
+        """Get `[x0, x1, y0, y1]` of `boxes` enlarged by the side tolerance."""
+        x0 = np.minimum(boxes[:, 0], boxes[:, 0] + boxes[:, 2])
+        x1 = np.maximum(boxes[:, 0], boxes[:, 0] + boxes[:, 2])
+        y0 = np.minimum(boxes[:, 1], boxes[:, 1] + boxes[:, 3])
+        y1 = np.maximum(boxes[:, 1], boxes[:, 1] + boxes[:, 3])
+        return np.stack([
+            x0 - self.threshold,
+            x1 + self.threshold,
+            y0 - 2 * self.threshold,
+            y1 + 2 * self.threshold,
+        ],
+                        axis=1)
+
+    def _find_box(self, x: Optional[float], y: Optional[float]) -> Optional[int]:
+        """Find the topmost box containing (`x`, `y`) or having it near a side."""
+        if x is None or y is None:
+            return None
+        return self._box_index.query(x, y)
+
+    def _get_interactive_box(self, index: int) -> MovableAnnotationBox:
+        if index in self._interactive_boxes:
+            return self._interactive_boxes[index]
+
+        self._release_interactive_boxes(keep=INTERACTIVE_BOX_LIMIT - 1)
+        x, y, width, height = self._boxes[index]
+        rect = Rectangle((x, y),
+                         width,
+                         height,
+                         linewidth=1,
+                         edgecolor=BOX_COLOR,
+                         facecolor="none")
+        self.ax.add_patch(rect)
+        mab = MovableAnnotationBox(
+            rect,
+            self._annotations[index],
+            self.model,
+            threshold=self.threshold,
+            on_transition_finished=self.on_transition_finished,
+            overlay=self.overlay,
+        )
+        self._interactive_boxes[index] = mab
+        self._update_collection()
+        return mab
+
+    def _release_interactive_boxes(self, keep: int):
+        """Return boxes to the collection, except for the `keep` newest ones."""
+        protected = {MovableAnnotationBox.lock, MovableAnnotationBox.selected_annotation}
+        releasable = [index for index, mab in self._interactive_boxes.items() if mab not in protected]
+        while len(self._interactive_boxes) > keep and releasable:
+            index = releasable.pop(0)
+            mab = self._interactive_boxes.pop(index)
+            if MovableAnnotationBox.rect_near_cursor is mab.rect:
+                MovableAnnotationBox.rect_near_cursor = None
+            mab.rect.remove()
+            # The box could have been moved, so its coordinates are recomputed.
+            self._boxes[index] = self._compute_boxes([mab.annotation])[0]
+            self._box_index.update(index, self._get_extents(self._boxes[index:index + 1])[0])
+
+    def _update_collection(self):
+        visible = np.ones(len(self._boxes), dtype=bool)
+        visible[list(self._interactive_boxes)] = False
+        x, y, width, height = self._boxes[visible].T
+        verts = np.stack([
+            np.stack([x, y], axis=1),
+            np.stack([x + width, y], axis=1),
+            np.stack([x + width, y + height], axis=1),
+            np.stack([x, y + height], axis=1),
+        ],
+                         axis=1)
+        if self._collection is None or self._collection.axes is None:
+            self._collection = PolyCollection(verts,
+                                              closed=True,
+                                              facecolors="none",
+                                              edgecolors=BOX_COLOR,
+                                              linewidths=1,
+                                              zorder=2)
+            self.ax.add_collection(self._collection, autolim=False)
+        else:
+            self._collection.set_verts(verts)
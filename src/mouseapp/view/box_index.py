@@ -0,0 +1,85 @@
+"""Spatial index of boxes drawn over the spectrogram."""
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+Cell = Tuple[int, int]
+# Boxes spanning more cells than this aren't put into cells, they are checked
+# by every query instead.
+MAX_CELLS_PER_BOX = 64
+
+
+class BoxGridIndex:
+    """Uniform grid of cells, each listing boxes overlapping it.
+
+    Boxes are given by their extents `[x0, x1, y0, y1]`, already enlarged by
+    the tolerance within which a point counts as being on the box. Cells have
+    the median size of the boxes, so a typical box spans a few cells and a
+    point is checked against the boxes of a single cell. Boxes much larger
+    than the median are kept aside and checked by every query.
+    """
+
+    def __init__(self, extents: np.ndarray):
+        self._extents = np.array(extents, dtype=np.float64).reshape(-1, 4)
+        self._cells: Dict[Cell, List[int]] = defaultdict(list)
+        self._large_boxes: Set[int] = set()
+        if len(self._extents) > 0:
+            sizes = np.median(self._extents[:, [1, 3]] - self._extents[:, [0, 2]], axis=0)
+            self._cell_width, self._cell_height = np.maximum(sizes, 1.0)
+        else:
+            self._cell_width = self._cell_height = 1.0
+        for index in range(len(self._extents)):
+            self._add(index)
+
+    def __len__(self):
+        return len(self._extents)
+
+    def update(self, index: int, extent: np.ndarray):
+        """Move box `index` to `extent`."""
+        self._remove(index)
+        self._extents[index] = extent
+        self._add(index)
+
+    def query(self, x: float, y: float) -> Optional[int]:
+        """Find the last added box containing (`x`, `y`)."""
+        candidates = self._large_boxes.union(self._cells.get(self._cell_of(x, y), ()))
+        for index in sorted(candidates, reverse=True):
+            x0, x1, y0, y1 = self._extents[index]
+            if x0 < x < x1 and y0 < y < y1:
+                return index
+        return None
+
+    def _cell_of(self, x: float, y: float) -> Cell:
+        return math.floor(x / self._cell_width), math.floor(y / self._cell_height)
+
+    def _get_cell_ranges(self, index: int) -> Tuple[range, range]:
+        x0, x1, y0, y1 = self._extents[index]
+        column_start, row_start = self._cell_of(x0, y0)
+        column_end, row_end = self._cell_of(x1, y1)
+        return range(column_start, column_end + 1), range(row_start, row_end + 1)
+
+    def _covered_cells(self, index: int) -> List[Cell]:
+        columns, rows = self._get_cell_ranges(index)
+        return [(column, row) for column in columns for row in rows]
+
+    def _is_large(self, index: int) -> bool:
+        columns, rows = self._get_cell_ranges(index)
+        return len(columns) * len(rows) > MAX_CELLS_PER_BOX
+
+    def _add(self, index: int):
+        if self._is_large(index):
+            self._large_boxes.add(index)
+            return
+        for cell in self._covered_cells(index):
+            self._cells[cell].append(index)
+
+    def _remove(self, index: int):
+        if index in self._large_boxes:
+            self._large_boxes.remove(index)
+            return
+        for cell in self._covered_cells(index):
+            self._cells[cell].remove(index)
+            if not self._cells[cell]:
+                del self._cells[cell]
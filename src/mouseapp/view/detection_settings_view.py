@@ -19,7 +19,7 @@ from mouseapp.controller.settings_controllers import (
 from mouseapp.controller.utils import warn_user
 from mouseapp.model.main_models import MainModel
 from mouseapp.model.settings.utils import Detection, Denoising, OptimisationResult
-from mouseapp.view import utils
+from mouseapp.view import spectrogram_renderer, utils
 from mouseapp.view.generated.settings.ui_detection_settings import (
     Ui_DetectionSettingsWidget,)
 from mouseapp.view.preview_settings_view import PreviewSettingsWindow
@@ -330,10 +330,12 @@ class DetectionSettingsWindow(QtWidgets.QWidget, Ui_DetectionSettingsWidget):
                                        Optional[np.ndarray]]):
         spec, level_set = value
         self.gac_preview.lower_axis.clear()
-        visualization.draw_spectrogram(spec=spec,
-                                       ax=self.gac_preview.lower_axis,
-                                       vmin=0.0,
-                                       vmax=1.0)
+        spectrogram_renderer.draw_spectrogram(
+            spec,
+            self.gac_preview.lower_axis,
+            self.model.settings_model.spectrogram_settings_model.rendering,
+            vmin=0.0,
+            vmax=1.0)
         if level_set is not None:
             img = np.ma.array(data=level_set, mask=level_set)
             self.gac_preview.lower_axis.pcolormesh(img, cmap="gray")
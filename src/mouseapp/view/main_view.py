@@ -29,15 +29,19 @@ from mouseapp.controller import (  # yapf: disable
     detection_controller,  # yapf: disable
 )
 from mouseapp import context_manager
+from mouseapp.model.latency import latency_recorder
 from mouseapp.model.main_models import MainModel
+from mouseapp.model.tile_cache import DISPLAY_VMAX, DisplayTile
 from mouseapp.view import utils
 from mouseapp.view import widgets
+from mouseapp.view import spectrogram_renderer
+from mouseapp.view.annotation_overlay import AnnotationOverlay
 from mouseapp.view import view_constants
+from mouseapp.view.render_scheduler import RenderScheduler
 from mouseapp.view.generated.ui_mouse_main_window import Ui_MainWindow
 from mouseapp.view.generated.ui_project_tab import Ui_ProjectWindow
 from mouseapp.view.generated.ui_spectrogram_tab import Ui_SpectrogramWindow
 from mouseapp.view.utils import initialize_widget
-from mouse.utils import sound_util, visualization
 
 
 class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
@@ -50,13 +54,19 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
         self.signal_data = None
         self.spec_data = None
         self.spectrogram_displayed = False
-        self.spectrogram_color_mesh = None
+        self.spectrogram_renderer: Optional[spectrogram_renderer.SpectrogramRenderer] = None
+        self.spectrogram_rendering: Optional[str] = None
+        self.spectrogram_shape: Optional[tuple] = None
         self.time_mask_size = 0
         self.is_drawing = False
         self.current_annotation: Optional[Rectangle] = None
         self.time_ticks_mask = None
-        self._annotation_boxes: List[widgets.MovableAnnotationBox] = []
         self.table_index: int = 0
+        # Scrolling requests are coalesced, only the latest one is rendered.
+        self._render_scheduler = RenderScheduler(
+            lambda position: main_controller.update_from_slider_position(
+                self.model, position),
+            parent=self)
 
         # Change squeakTable model to custom one.
         old_model = self.squeakTable.model()
@@ -98,17 +108,19 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
             self._show_annotation_on_spec)
 
         # Connect signals
-        self.spectrogramScrollBar.valueChanged.connect(
-            lambda position: main_controller.update_from_slider_position(
-                self.model, position))
+        self.spectrogramScrollBar.valueChanged.connect(self._render_scheduler.request)
         self.model.project_model.audio_files_signal.connect(
             lambda audio_files: main_controller.update_signal_data(
                 self.model, audio_files))
         self.model.spectrogram_model.slider_step_size_changed.connect(
             self._update_slider_params)
         self.model.spectrogram_model.spectrogram_data_changed.connect(self._reset_view)
-        self.model.spectrogram_model.spectrogram_chunk_data_changed.connect(
+        self.model.spectrogram_model.spectrogram_data_updated.connect(
+            self._on_spectrogram_data_updated)
+        self.model.spectrogram_model.display_tile_changed.connect(
             self._draw_spectrogram)
+        self.model.settings_model.spectrogram_settings_model.rendering_changed.connect(
+            self._on_rendering_changed)
         self.model.spectrogram_model.visible_annotations_changed.connect(
             self._update_visible_annotations)
         self.model.spectrogram_model.select_annotations.connect(
@@ -128,12 +140,22 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
         self.canvas = widgets.Canvas()
         self.spectrogram_axis = self.canvas.figure.gca()
         self.spectrogramWidget.addWidget(self.canvas)
+        # Boxes being drawn, dragged or resized are blitted over the spectrogram.
+        self.overlay = widgets.BlitOverlay(self.canvas)
+        self.latency_overlay = widgets.LatencyOverlay(self.canvas)
+        self.annotation_overlay = AnnotationOverlay(
+            self.spectrogram_axis,
+            self.model,
+            self.overlay,
+            on_transition_finished=lambda *x: main_controller.update_annotation(
+                self.model, *x))
         self.canvas.figure.canvas.mpl_connect("button_press_event",
                                               self._on_button_pressed_event)
         self.canvas.figure.canvas.mpl_connect("button_release_event",
                                               self._on_button_released_event)
         self.canvas.figure.canvas.mpl_connect("motion_notify_event",
                                               self._on_mouse_motion)
+        self.canvas.figure.canvas.mpl_connect("resize_event", self._on_canvas_resize)
 
         # Hide unused widgets
         self.windowSizeLabel.hide()
@@ -148,8 +170,7 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
             return
 
         if widgets.MovableAnnotationBox.rect_near_cursor is not None:
-            for mab in self._annotation_boxes:
-                mab.on_press(event)
+            self.annotation_overlay.on_press(event)
             return
 
         if event.button is not MouseButton.LEFT:
@@ -165,7 +186,7 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
         )
         self.is_drawing = True
         self.spectrogram_axis.add_patch(self.current_annotation)
-        self.canvas.draw_idle()
+        self.overlay.start([self.current_annotation])
 
     def _on_button_released_event(self, event):
         if event.button is not MouseButton.LEFT:
@@ -191,6 +212,7 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
                 freq_pixel_end,
             ) = utils.convert_rect_to_relative_pixels(self.current_annotation)
 
+            self.overlay.finish()
             self.current_annotation.remove()
             self.current_annotation = None
             self.is_drawing = False
@@ -217,10 +239,13 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
                 self.current_annotation.set_width(cursor_x - annotation_x)
             if cursor_y is not None:
                 self.current_annotation.set_height(cursor_y - annotation_y)
-            self.canvas.draw_idle()
+            self.overlay.update()
         else:
-            for mab in self._annotation_boxes:
-                mab.on_drag(event)
+            self.annotation_overlay.on_motion(event)
+
+    def _on_canvas_resize(self, _event):
+        main_controller.set_viewport_width(
+            self.model, int(self.spectrogram_axis.bbox.width))
 
     def _update_slider_params(self, step_size):
         self.spectrogramScrollBar.setSingleStep(step_size)
@@ -234,59 +259,27 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
                                                  display_size)
             self.spectrogramScrollBar.setSliderPosition(0)
             self.spectrogramScrollBar.setValue(0)
-            main_controller.update_from_slider_position(
-                self.model, 0)  # TODO: why this is not called
+            # Position may not change, so the new spectrogram is rendered
+            # explicitly, replacing pending requests for the old one.
+            self._render_scheduler.request(0)
+            self._render_scheduler.flush()
         else:
             self.spectrogramScrollBar.setMaximum(0)
             self.canvas.figure.clf()
             self.canvas.draw_idle()
 
+    def _on_spectrogram_data_updated(self):
+        if self.model.spectrogram_model.spectrogram_data is not None:
+            self._render_scheduler.request(self.spectrogramScrollBar.value())
+
     def remove_annotations(self):
-        annotations = list(self.spectrogram_axis.patches)
-        for annotation in annotations:
-            annotation.remove()
+        self.annotation_overlay.clear()
 
+    @latency_recorder.timed("_update_visible_annotations")
     def _update_visible_annotations(self, annotation_data):
         visible_annotations, times, display_start_time, freqs = annotation_data
-        self.remove_annotations()
-        self._annotation_boxes: List[widgets.MovableAnnotationBox] = []
-        # allow garbage collection of mabs that may
-        # be referenced by static variables
-        widgets.MovableAnnotationBox.lock = None
-        widgets.MovableAnnotationBox.selected_annotation = None
-
-        def find_nearest(t, arr):
-            return np.abs(arr - t).argmin()
-
-        # cast annotation positions to relative spectrogram coordinates
-        x_start = find_nearest(display_start_time, times)
-        for annotation in visible_annotations:
-            annotation_start_time = find_nearest(annotation.time_start, times)
-            annotation_end_time = find_nearest(annotation.time_end, times)
-            annotation_start_freq = find_nearest(annotation.freq_start, freqs)
-            annotation_end_freq = find_nearest(annotation.freq_end, freqs)
-
-            x = annotation_start_time - x_start
-            y = annotation_start_freq
-            width = annotation_end_time - annotation_start_time
-            height = annotation_end_freq - annotation_start_freq
-
-            rect = Rectangle((x, y),
-                             width,
-                             height,
-                             linewidth=1,
-                             edgecolor="r",
-                             facecolor="none")
-            self.spectrogram_axis.add_patch(rect)
-            mab = widgets.MovableAnnotationBox(
-                rect,
-                annotation,
-                self.model,
-                on_transition_finished=lambda *x: main_controller.update_annotation(
-                    self.model, *x),
-            )
-
-            self._annotation_boxes.append(mab)
+        self.annotation_overlay.set_annotations(visible_annotations, times,
+                                                display_start_time, freqs)
         self.canvas.draw_idle()
 
     def _on_highlight_annotation(self, row_id):
@@ -308,22 +301,32 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
         else:
             self.deleteButton.setEnabled(False)
 
-    def _draw_spectrogram(self, spectrogram_data: sound_util.SpectrogramData):
+    @latency_recorder.timed("_draw_spectrogram")
+    def _draw_spectrogram(self, display_tile: DisplayTile):
         if not self.spectrogram_displayed:
-            self.spectrogram_color_mesh = visualization.draw_spectrogram(
-                spectrogram_data, ax=self.spectrogram_axis, vmax=5)
-
+            if self.spectrogram_renderer is not None:
+                self.spectrogram_renderer.remove()
+            self.spectrogram_rendering = (
+                self.model.settings_model.spectrogram_settings_model.rendering)
+            self.spectrogram_renderer = spectrogram_renderer.create_renderer(
+                self.spectrogram_rendering, self.spectrogram_axis, vmax=DISPLAY_VMAX)
             self.spectrogram_displayed = True
-        else:
-            visualization.draw_spectrogram(
-                spectrogram_data,
-                ax=self.spectrogram_axis,
-                colormesh=self.spectrogram_color_mesh,
-                vmax=5,
-            )
 
+        # Renderer recreates its artist, if the chunk is taken from another
+        # pyramid level with a different number of frames.
+        spectrogram_data = display_tile.spectrogram_data
+        self.spectrogram_renderer.draw(spectrogram_data, display_tile.color_indices)
+        self.spectrogram_shape = tuple(spectrogram_data.spec.shape)
         self.canvas.draw_idle()
 
+    def _on_rendering_changed(self, rendering: str):
+        if self.spectrogram_renderer is None or rendering == self.spectrogram_rendering:
+            return
+        self.spectrogram_displayed = False
+        display_tile = self.model.spectrogram_model.current_display_tile
+        if display_tile is not None:
+            self._draw_spectrogram(display_tile)
+
     def _show_annotation_on_spec(self, index: int):
         annotation_count = len(
             self.model.spectrogram_model.annotation_table_model.annotations)
@@ -332,20 +335,30 @@ class SpectrogramTab(QtWidgets.QWidget, Ui_SpectrogramWindow):
 
         self.table_index = np.clip(index, 0, annotation_count - 1)
 
-        annotation = self.model.spectrogram_model.annotation_table_model.annotations[
-            self.table_index]
-        t_0 = annotation.table_data[constants.COL_BEGIN_TIME]
-        position = 1000 * t_0 - self.model.spectrogram_model.annotation_margin
-        position = max(0, position)
-        position = min(position, self.spectrogramScrollBar.maximum())
+        annotations = self.model.spectrogram_model.annotation_table_model.annotations
+        annotation = annotations[self.table_index]
+        position = self._get_annotation_position(annotation)
 
         self.squeakTable.selectRow(self.table_index)
         self.spectrogramScrollBar.setSliderPosition(position)
-
-        main_controller.update_from_slider_position(self.model, position)
-        for mab in self._annotation_boxes:
-            if mab.annotation == annotation:
-                widgets.MovableAnnotationBox.select(mab)
+        # The annotation box is selected below, so the chunk is rendered
+        # right away, together with the request made by the scroll bar.
+        self._render_scheduler.request(position)
+        self._render_scheduler.flush()
+        self.annotation_overlay.select(annotation)
+
+        # Neighbouring annotations are shown with arrow keys.
+        neighbours = [annotations[i] for i in [self.table_index - 1, self.table_index + 1]
+                      if 0 <= i < annotation_count]
+        main_controller.prefetch_spectrogram_chunks(
+            self.model, [self._get_annotation_position(a) for a in neighbours])
+
+    def _get_annotation_position(self, annotation) -> float:
+        """Get slider position at which `annotation` is shown."""
+        t_0 = annotation.table_data[constants.COL_BEGIN_TIME]
+        position = 1000 * t_0 - self.model.spectrogram_model.annotation_margin
+        position = max(0, position)
+        return min(position, self.spectrogramScrollBar.maximum())
 
     def _handle_select_annotations(self, selected: List):
         for id in selected:
@@ -397,9 +410,7 @@ class ProjectTab(QtWidgets.QWidget, Ui_ProjectWindow):
             lambda project_name: self.projectNameEdit.setText(project_name))
         self.model.project_model.experiment_note_signal.connect(
             lambda experiment_note: self.noteEdit.setText(experiment_note))
-        self.model.project_model.audio_files_signal.connect(
-            lambda audio_files: self._on_audio_file_loaded(
-                self._get_shortest_unique_names(audio_files)))
+        self.model.project_model.audio_files_signal.connect(self._on_audio_file_loaded)
         self.model.project_model.experiment_date_signal.connect(
             lambda experiment_date: self.dateEdit.setDate(experiment_date))
         self.model.project_model.project_metadata_signal.connect(
@@ -474,8 +485,11 @@ class ProjectTab(QtWidgets.QWidget, Ui_ProjectWindow):
         slider_position = self.fileList.verticalScrollBar().sliderPosition()
         self.fileList.clear()
         self.audio_file_widgets.clear()
-        for file_name in audio_files:
-            item = utils.initialize_widget(widgets.FileName(self.model, file_name))
+        audio_metadata = self.model.project_model.audio_metadata
+        for file, file_name in zip(audio_files,
+                                   self._get_shortest_unique_names(audio_files)):
+            item = utils.initialize_widget(
+                widgets.FileName(self.model, file_name, audio_metadata.get(file)))
             list_widget_item = QtWidgets.QListWidgetItem(self.fileList)
             list_widget_item.setSizeHint(item.sizeHint())
             self.audio_file_widgets[file_name] = list_widget_item
@@ -499,8 +513,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.settings_window = None  # for avoiding garbage collection
 
         # Instantiate spectrogram tab
-        spectrogram_window = utils.initialize_widget(SpectrogramTab(model))
-        utils.initialize_basic_layout(self.spectrogramTab, spectrogram_window)
+        self.spectrogram_window = utils.initialize_widget(SpectrogramTab(model))
+        utils.initialize_basic_layout(self.spectrogramTab, self.spectrogram_window)
 
         # Instantiate project tab
         project_window = utils.initialize_widget(ProjectTab(model))
@@ -514,6 +528,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.actionSettings.triggered.connect(self._action_settings)
         self.actionLoadAnnotations.triggered.connect(self._action_load_annotations)
         self.actionExport.triggered.connect(self._action_export_annotations)
+        self.actionShowLatencies.toggled.connect(self._action_show_latencies)
+        self.actionExportLatencies.triggered.connect(self._action_export_latencies)
         # todo (#75): remove unnecessary menu dropdown
 
         # Connect signals
@@ -552,6 +568,16 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         if filename != "":
             main_controller.export_annotations(self.model, Path(filename))
 
+    def _action_show_latencies(self, checked: bool):
+        main_controller.set_latency_recording(checked)
+        self.spectrogram_window.latency_overlay.setVisible(checked)
+
+    def _action_export_latencies(self):
+        filename = QtWidgets.QFileDialog().getSaveFileName(self, "Save File", "",
+                                                           "CSV files (*.csv)")[0]
+        if filename != "":
+            main_controller.export_latencies(Path(filename))
+
     def _action_save(self):
         """Save project and show message on statusbar."""
         # Clear previous message
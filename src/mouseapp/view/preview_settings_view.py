@@ -1,10 +1,9 @@
 from typing import Optional
 
 from PySide6 import QtWidgets
-from mouse.utils import visualization
 from mouse.utils.sound_util import SpectrogramData
 from mouseapp.model.main_models import MainModel
-from mouseapp.view import widgets
+from mouseapp.view import spectrogram_renderer, widgets
 from mouseapp.view.generated.settings.ui_preview_settings import (
     Ui_PreviewSettingsWidget,)
 
@@ -35,14 +34,18 @@ class PreviewSettingsWindow(QtWidgets.QWidget, Ui_PreviewSettingsWidget):
 
     def draw_upper_spect(self, value: Optional[SpectrogramData]):
         self.upper_axis.clear()
-        visualization.draw_spectrogram(spec=value, ax=self.upper_axis)
+        spectrogram_renderer.draw_spectrogram(
+            value, self.upper_axis,
+            self.model.settings_model.spectrogram_settings_model.rendering)
         if not self.use_only_upper:
             self.upper_axis.set_xlabel(None)
         self.canvas.draw()
 
     def draw_lower_spect(self, value: Optional[SpectrogramData]):
         self.lower_axis.clear()
-        visualization.draw_spectrogram(spec=value, ax=self.lower_axis)
+        spectrogram_renderer.draw_spectrogram(
+            value, self.lower_axis,
+            self.model.settings_model.spectrogram_settings_model.rendering)
         self.canvas.draw()
 
     def _on_start_signal(self, value: float):
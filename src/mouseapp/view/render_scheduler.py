@@ -0,0 +1,48 @@
+"""Coalescing of frequent view updates."""
+from typing import Any, Callable
+
+from PySide6 import QtCore
+
+from mouseapp.view import view_constants
+
+_NO_REQUEST = object()
+
+
+class RenderScheduler(QtCore.QObject):
+    """Render only the latest of the requests made within one frame.
+
+    Requests made while a render is scheduled replace the pending one, so
+    stale states are never rendered. Renders are at least `1 / max_fps`
+    seconds apart.
+    """
+
+    def __init__(self,
+                 render: Callable[[Any], None],
+                 max_fps: int = view_constants.MAX_RENDER_FPS,
+                 parent: QtCore.QObject = None):
+        super(RenderScheduler, self).__init__(parent)
+        self._render = render
+        self._frame_interval = 1000 // max_fps  # milliseconds
+        self._pending = _NO_REQUEST
+        self._since_render = QtCore.QElapsedTimer()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def request(self, value: Any):
+        self._pending = value
+        if self._timer.isActive():
+            return
+        delay = 0
+        if self._since_render.isValid():
+            delay = max(0, self._frame_interval - self._since_render.elapsed())
+        self._timer.start(delay)
+
+    def flush(self):
+        """Render the pending request immediately."""
+        self._timer.stop()
+        if self._pending is _NO_REQUEST:
+            return
+        value, self._pending = self._pending, _NO_REQUEST
+        self._since_render.restart()
+        self._render(value)
@@ -10,6 +10,7 @@ from mouseapp.view.denoising_settings_view import DenoisingSettingsWindow
 from mouseapp.view.detection_settings_view import DetectionSettingsWindow
 from mouseapp.view.filtering_settings_view import FilteringSettingsWindow
 from mouseapp.view.generated.settings.ui_settings import Ui_SettingsWidget
+from mouseapp.view.spectrogram_settings_view import SpectrogramSettingsWindow
 
 
 class SettingsWindow(QtWidgets.QWidget, Ui_SettingsWidget):
@@ -43,6 +44,11 @@ class SettingsWindow(QtWidgets.QWidget, Ui_SettingsWidget):
         utils.initialize_basic_layout(self.classificationTab,
                                       self.classification_widget)
 
+        # Instantiate spectrogram settings widget
+        self.spectrogram_widget = utils.initialize_widget(
+            SpectrogramSettingsWindow(model))
+        utils.initialize_basic_layout(self.spectrogramTab, self.spectrogram_widget)
+
         # Set values on every settings widget
         logging.debug("[SettingsWindow] Call "
                       "`common_settings_controller.emit_settings_signals`")
@@ -66,5 +72,7 @@ class SettingsWindow(QtWidgets.QWidget, Ui_SettingsWidget):
             pass
         elif id == 3:
             pass
+        elif id == 4:
+            pass
         else:
             warnings.warn(f"Tab: {id} not supported")
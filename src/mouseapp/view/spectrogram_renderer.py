@@ -0,0 +1,171 @@
+"""Drawing of spectrograms on matplotlib axes.
+
+Spectrograms are drawn in pixel coordinates: frame `i` and frequency row `j`
+cover [i, i + 1] x [j, j + 1], so annotation boxes can be placed the same way
+with both renderers.
+"""
+from functools import lru_cache
+from typing import Optional, Union
+
+import matplotlib
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.ticker import FuncFormatter
+from mouse.utils import visualization
+from mouse.utils.sound_util import SpectrogramData
+
+from mouseapp.model.settings.utils import SpectrogramRendering
+from mouseapp.model.tile_cache import COLOR_LEVELS, get_color_indices
+
+LUT_SIZE = COLOR_LEVELS
+
+
+@lru_cache(maxsize=None)
+def get_colormap_lut(cmap_name: Optional[str] = None) -> np.ndarray:
+    """Get RGBA colors of `LUT_SIZE` equally spaced values of a colormap."""
+    if cmap_name is None:
+        cmap_name = matplotlib.rcParams["image.cmap"]
+    return matplotlib.colormaps[cmap_name](np.linspace(0, 1, LUT_SIZE), bytes=True)
+
+
+def colormap_spectrogram(spec: np.ndarray,
+                         lut: np.ndarray,
+                         vmin: Optional[float] = None,
+                         vmax: Optional[float] = None) -> np.ndarray:
+    """Map values of `spec` to RGBA image with `lut`.
+
+    Like in `pcolormesh`, missing `vmin` and `vmax` are taken from the data.
+    """
+    return np.take(lut, get_color_indices(spec, vmin, vmax), axis=0)
+
+
+class MeshRenderer:
+    """Draws spectrograms as a `pcolormesh`, updated in place when possible."""
+
+    def __init__(self, ax: Axes, vmin: Optional[float] = None, vmax: Optional[float] = None):
+        self.ax = ax
+        self.vmin = vmin
+        self.vmax = vmax
+        self._mesh = None
+        self._shape: Optional[tuple] = None
+
+    def draw(self, spectrogram_data: SpectrogramData, color_indices: Optional[np.ndarray] = None):
+        """Draw `spectrogram_data`, colors are always computed by the mesh."""
+        shape = tuple(spectrogram_data.spec.shape)
+        if self._mesh is not None and shape == self._shape:
+            visualization.draw_spectrogram(spectrogram_data,
+                                           ax=self.ax,
+                                           colormesh=self._mesh,
+                                           vmin=self.vmin,
+                                           vmax=self.vmax)
+            return
+
+        # Mesh of a different size has to be recreated.
+        self.remove()
+        self._mesh = visualization.draw_spectrogram(spectrogram_data,
+                                                    ax=self.ax,
+                                                    vmin=self.vmin,
+                                                    vmax=self.vmax)
+        self._shape = shape
+        self.ax.set_xlim(0, shape[1])
+        self.ax.set_ylim(0, shape[0])
+
+    def remove(self):
+        if self._mesh is not None and self._mesh.axes is not None:
+            self._mesh.remove()
+        self._mesh = None
+        self._shape = None
+
+
+class ImageRenderer:
+    """Draws spectrograms as colormapped images.
+
+    Values are mapped to colors with a precomputed lookup table, so drawing
+    a chunk only rasterizes a single image. Ticks show seconds with fixed
+    decimals, so they stay readable far into long recordings, and Hz of the
+    last drawn spectrogram.
+    """
+
+    def __init__(self,
+                 ax: Axes,
+                 vmin: Optional[float] = None,
+                 vmax: Optional[float] = None,
+                 cmap_name: Optional[str] = None):
+        self.ax = ax
+        self.vmin = vmin
+        self.vmax = vmax
+        self._lut = get_colormap_lut(cmap_name)
+        self._image = None
+        self._shape: Optional[tuple] = None
+        self._times: Optional[np.ndarray] = None
+        self._freqs: Optional[np.ndarray] = None
+
+    def draw(self, spectrogram_data: SpectrogramData, color_indices: Optional[np.ndarray] = None):
+        """Draw `spectrogram_data` with `color_indices` of its values if they are given.
+
+        Indices have to be normalized with `vmin` and `vmax` of the renderer.
+        """
+        spec = np.asarray(spectrogram_data.spec)
+        if color_indices is None:
+            color_indices = get_color_indices(spec, self.vmin, self.vmax)
+        rgba = np.take(self._lut, color_indices, axis=0)
+        self._times = np.asarray(spectrogram_data.times)
+        self._freqs = np.asarray(spectrogram_data.freqs)
+        shape = spec.shape
+        if self._image is not None and self._image.axes is not None:
+            self._image.set_data(rgba)
+            if shape != self._shape:
+                self._set_extent(shape)
+            return
+
+        self._image = self.ax.imshow(rgba,
+                                     origin="lower",
+                                     aspect="auto",
+                                     interpolation="nearest",
+                                     extent=(0, shape[1], 0, shape[0]))
+        self._set_extent(shape)
+        self.ax.xaxis.set_major_formatter(
+            FuncFormatter(lambda x, _: self._format_tick(x, self._times, "{:.2f}")))
+        self.ax.yaxis.set_major_formatter(
+            FuncFormatter(lambda y, _: self._format_tick(y, self._freqs, "{:.0f}")))
+
+    def remove(self):
+        if self._image is not None and self._image.axes is not None:
+            self._image.remove()
+        self._image = None
+        self._shape = None
+
+    def _set_extent(self, shape: tuple):
+        self._shape = shape
+        self._image.set_extent((0, shape[1], 0, shape[0]))
+        self.ax.set_xlim(0, shape[1])
+        self.ax.set_ylim(0, shape[0])
+
+    @staticmethod
+    def _format_tick(pixel: float, values: Optional[np.ndarray], fmt: str) -> str:
+        if values is None or len(values) == 0:
+            return ""
+        return fmt.format(np.interp(pixel, np.arange(len(values)), values))
+
+
+SpectrogramRenderer = Union[MeshRenderer, ImageRenderer]
+
+
+def create_renderer(rendering: SpectrogramRendering,
+                    ax: Axes,
+                    vmin: Optional[float] = None,
+                    vmax: Optional[float] = None) -> SpectrogramRenderer:
+    if SpectrogramRendering(rendering) == SpectrogramRendering.IMAGE:
+        return ImageRenderer(ax, vmin=vmin, vmax=vmax)
+    return MeshRenderer(ax, vmin=vmin, vmax=vmax)
+
+
+def draw_spectrogram(spectrogram_data: SpectrogramData,
+                     ax: Axes,
+                     rendering: SpectrogramRendering,
+                     vmin: Optional[float] = None,
+                     vmax: Optional[float] = None) -> SpectrogramRenderer:
+    """Draw `spectrogram_data` on `ax` with a new renderer."""
+    renderer = create_renderer(rendering, ax, vmin=vmin, vmax=vmax)
+    renderer.draw(spectrogram_data)
+    return renderer
@@ -0,0 +1,73 @@
+from PySide6 import QtCore, QtWidgets
+
+from mouseapp.controller.settings_controllers import spectrogram_settings_controller
+from mouseapp.model.main_models import MainModel
+from mouseapp.view.generated.settings.ui_spectrogram_settings import (
+    Ui_SpectrogramSettingsWidget,)
+
+
+class SpectrogramSettingsWindow(QtWidgets.QWidget, Ui_SpectrogramSettingsWidget):
+    """Spectrogram settings window class."""
+
+    def __init__(self, model: MainModel):
+        super(SpectrogramSettingsWindow, self).__init__()
+        self.setupUi(self)
+        self.model = model
+
+        # enforce garbage collection of this window
+        self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        # inputs
+        self.storageModeComboBox.currentTextChanged.connect(self._storage_mode_changed)
+        self.frequencyMinLineEdit.editingFinished.connect(self._frequency_range_edited)
+        self.frequencyMaxLineEdit.editingFinished.connect(self._frequency_range_edited)
+        self.displayCacheSizeLineEdit.editingFinished.connect(
+            self._display_cache_size_edited)
+        self.renderingComboBox.currentTextChanged.connect(self._rendering_changed)
+
+        # signals
+        self.model.settings_model.spectrogram_settings_model.storage_mode_changed.connect(
+            self._on_storage_mode_signal)
+        self.model.settings_model.spectrogram_settings_model.frequency_min_changed.connect(
+            self._on_frequency_min_signal)
+        self.model.settings_model.spectrogram_settings_model.frequency_max_changed.connect(
+            self._on_frequency_max_signal)
+        self.model.settings_model.spectrogram_settings_model.display_cache_size_changed.connect(
+            self._on_display_cache_size_signal)
+        self.model.settings_model.spectrogram_settings_model.rendering_changed.connect(
+            self._on_rendering_signal)
+
+        model.settings_model.spectrogram_settings_model.emit_all_setting_signals()
+
+    def _on_storage_mode_signal(self, value: str):
+        self.storageModeComboBox.blockSignals(True)
+        self.storageModeComboBox.setCurrentText(value)
+        self.storageModeComboBox.blockSignals(False)
+
+    def _storage_mode_changed(self, storage_mode: str):
+        spectrogram_settings_controller.set_storage_mode(self.model, storage_mode)
+
+    def _on_frequency_min_signal(self, value: float):
+        self.frequencyMinLineEdit.setText(str(value))
+
+    def _on_frequency_max_signal(self, value):
+        self.frequencyMaxLineEdit.setText("" if value is None else str(value))
+
+    def _frequency_range_edited(self):
+        spectrogram_settings_controller.set_frequency_range(
+            self.model, self.frequencyMinLineEdit.text(),
+            self.frequencyMaxLineEdit.text())
+
+    def _on_display_cache_size_signal(self, value: int):
+        self.displayCacheSizeLineEdit.setText(str(value))
+
+    def _display_cache_size_edited(self):
+        spectrogram_settings_controller.set_display_cache_size(
+            self.model, self.displayCacheSizeLineEdit.text())
+
+    def _on_rendering_signal(self, value: str):
+        self.renderingComboBox.blockSignals(True)
+        self.renderingComboBox.setCurrentText(value)
+        self.renderingComboBox.blockSignals(False)
+
+    def _rendering_changed(self, rendering: str):
+        spectrogram_settings_controller.set_rendering(self.model, rendering)
@@ -2,3 +2,5 @@
 
 SQUEAK_TABLE_VERTICAL_HEADER_SIZE = 25
 SQUEAK_TABLE_COLUMN_MAX_WIDTH = 180
+# Limit of spectrogram redraws per second while scrolling.
+MAX_RENDER_FPS = 60
@@ -14,6 +14,8 @@ from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.patches import Rectangle
 
 from mouseapp.controller import main_controller
+from mouseapp.model.audio_metadata import AudioMetadata
+from mouseapp.model.latency import latency_recorder
 from mouseapp.model.main_models import MainModel
 from mouseapp.model.utils import Annotation
 from mouseapp.view import utils
@@ -111,16 +113,56 @@ class Canvas(FigureCanvas):
         # figure = Figure()  # TODO: resizing?
         super().__init__(figure)
 
+    @latency_recorder.timed("canvas_draw")
+    def draw(self):
+        super().draw()
+
+
+class LatencyOverlay(QtWidgets.QLabel):
+    """Percentiles of recorded latencies shown in the corner of `parent`."""
+
+    REFRESH_INTERVAL = 500  # milliseconds
+
+    def __init__(self, parent: QtWidgets.QWidget):
+        super(LatencyOverlay, self).__init__(parent)
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 160);"
+                           "color: white; font-family: monospace; padding: 4px")
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def showEvent(self, event):
+        self.refresh()
+        self._timer.start(self.REFRESH_INTERVAL)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        rows = [f"{'stage':<32}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for stage, (p50, p95, p99) in latency_recorder.get_percentiles().items():
+            rows.append(f"{stage:<32}{p50:>8.1f}{p95:>8.1f}{p99:>8.1f}")
+        self.setText("\n".join(rows) + "\n(milliseconds)")
+        self.adjustSize()
+        self.raise_()
+
 
 class FileName(QtWidgets.QWidget, Ui_FileNameWidget):
 
-    def __init__(self, model, file_name):
+    def __init__(self, model, file_name, metadata: Optional[AudioMetadata] = None):
         super(FileName, self).__init__()
         self.setupUi(self)
 
         self.model = model
         self.file_name = file_name
-        self.fileName.setText(file_name)
+        if metadata is not None:
+            self.fileName.setText(f"{file_name} ({metadata.duration:.1f} s, "
+                                  f"{metadata.sample_rate} Hz)")
+        else:
+            self.fileName.setText(file_name)
 
         # Connect buttons
         self.removeButton.clicked.connect(
@@ -216,6 +258,61 @@ class SliderWithEdit(QtWidgets.QWidget):
         self.modifications_finished.emit(np.clip(f_value, self.minimum, self.maximum))
 
 
+class BlitOverlay:
+    """Interactive layer redrawing only moving artists over a cached background.
+
+    While the overlay is active, its artists are animated, so a full redraw of
+    the canvas renders everything else. The rendered background is saved and
+    `update` restores it and blits the artists on top of it.
+    """
+
+    def __init__(self, canvas: FigureCanvas):
+        self.canvas = canvas
+        self._artists = []
+        self._background = None
+        self._cid_draw = canvas.mpl_connect("draw_event", self._on_draw)
+
+    @property
+    def active(self) -> bool:
+        return len(self._artists) > 0
+
+    def start(self, artists: list):
+        for artist in artists:
+            artist.set_animated(True)
+        self._artists = list(artists)
+        # `_on_draw` saves the background rendered without the artists.
+        self.canvas.draw()
+
+    def update(self):
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def finish(self):
+        for artist in self._artists:
+            artist.set_animated(False)
+        self._artists = []
+        self._background = None
+        self.canvas.draw_idle()
+
+    def _draw_artists(self):
+        for artist in self._artists:
+            if artist.axes is not None:
+                artist.axes.draw_artist(artist)
+
+    def _on_draw(self, _event):
+        if not self.active:
+            return
+        # Canvas was redrawn (e.g. resized), so the background is outdated.
+        # Artists are drawn into the rendered buffer, which is painted after
+        # the draw, blitting here could repaint recursively.
+        self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_artists()
+
+
 class MovableAnnotationBox:
     """Class that encapsulates rectangle with coresponding annotation and allows rectangle(annotation) resizing. # noqa
 
@@ -231,6 +328,8 @@ class MovableAnnotationBox:
             callback called after each `rect` change (called while dragging or resize action)
         on_transition_finished : Callable
             callback called after dragging/resizing is finished (called from `on_release`)
+        overlay : BlitOverlay
+            layer on which `rect` is redrawn while dragging or resizing
     """
 
     lock = None  # only one Box can be resized or dragged at a time
@@ -258,8 +357,10 @@ class MovableAnnotationBox:
         threshold: Real = 1,
         on_annotation_changed: Callable = None,
         on_transition_finished: Callable = None,
+        overlay: Optional[BlitOverlay] = None,
     ):
         self.rect = rect
+        self.overlay = overlay
         self.annotation = annotation
         self.threshold = threshold
         self.on_annotation_changed = on_annotation_changed
@@ -295,6 +396,8 @@ class MovableAnnotationBox:
                     self.rect.get_width(),
                     self.rect.get_height(),
                 )
+                if self.overlay is not None:
+                    self.overlay.start([self.rect])
 
     def on_release(self, event):
         if MovableAnnotationBox.lock is not self:
@@ -302,6 +405,8 @@ class MovableAnnotationBox:
         MovableAnnotationBox.lock = None
         MovableAnnotationBox.initial_event = None
         MovableAnnotationBox.initial_rect_position = None
+        if self.overlay is not None:
+            self.overlay.finish()
         if self.on_transition_finished is not None:
             (
                 time_pixel_start,
@@ -389,7 +494,10 @@ class MovableAnnotationBox:
                     time_pixel_end,
                     freq_pixel_end,
                 )
-            self.rect.figure.canvas.draw_idle()
+            if self.overlay is not None:
+                self.overlay.update()
+            else:
+                self.rect.figure.canvas.draw_idle()
 
     def disconnect(self):
         self.rect.figure.canvas.mlp_disconnect(self.cid_press)
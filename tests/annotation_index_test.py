@@ -0,0 +1,133 @@
+from unittest import mock
+
+import numpy as np
+from mouse.utils.sound_util import SpectrogramData
+from PySide6.QtCore import Qt
+
+from mouseapp.controller import main_controller
+from mouseapp.model import constants
+from mouseapp.model import annotation_index
+from mouseapp.model.annotation_index import AnnotationIntervalIndex
+from mouseapp.model.utils import Annotation
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def _get_annotations(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 100, n)
+    durations = rng.uniform(0.01, 2, n)
+    return [
+        Annotation(time_start=time_start,
+                   time_end=time_start + duration,
+                   freq_start=1,
+                   freq_end=2,
+                   label="Unknown") for time_start, duration in zip(starts, durations)
+    ]
+
+
+def _scan(annotations, start, end):
+    return {
+        annotation for annotation in annotations
+        if ((start <= annotation.time_start < end) or
+            (start <= annotation.time_end < end) or
+            (annotation.time_start <= start and end <= annotation.time_end))
+    }
+
+
+def test_indexed_annotations_match_scan(main_model):
+    """Tests whether the index finds the same annotations as a full scan."""
+    spectrogram_model = main_model.spectrogram_model
+    spectrogram_model.spectrogram_data = SpectrogramData(
+        spec=None, times=np.linspace(0, 100, 2000), freqs=np.arange(10))
+    spectrogram_model.current_spectrogram_chunk_data = SpectrogramData(
+        spec=None, times=np.linspace(20, 25, 100), freqs=np.arange(10))
+    table_model = spectrogram_model.annotation_table_model
+    table_model.annotations = _get_annotations(500)
+    table_model.append_annotations(_get_annotations(10, seed=1))
+
+    # Edit from the table and remove some rows.
+    column = table_model.annotations_column_names.index(constants.COL_END_TIME)
+    table_model.setData(table_model.index(3, column), "99.5", Qt.EditRole)
+    table_model.annotations[7].time_start = 0.001
+    table_model.reindex_annotation(table_model.annotations[7])
+    table_model.removeRows(100, 50)
+
+    for start, end in [(0, 1), (10, 10.5), (50, 60), (99, 101), (0, 100), (30, 30)]:
+        assert set(table_model.get_annotations_between(start, end)) == _scan(
+            table_model.annotations, start, end)
+
+    main_controller.set_visible_annotations(main_model)
+    assert set(spectrogram_model.visible_annotations) == _scan(
+        table_model.annotations, 20, 25)
+
+    table_model.annotations = []
+    assert table_model.get_annotations_between(0, 100) == []
+
+
+def test_long_annotation_doesnt_widen_queries():
+    """Tests whether a long annotation is found without inspecting short ones."""
+    annotations = _get_annotations(2000)
+    long_annotation = Annotation(time_start=-1, time_end=200, freq_start=1, freq_end=2)
+    index = AnnotationIntervalIndex(annotations + [long_annotation])
+
+    for start, end in [(50, 50.1), (-5, 0), (150, 160), (30, 30)]:
+        assert set(index.query(start, end)) == _scan(annotations + [long_annotation], start, end)
+    candidates = index._get_candidates(50, 50.1)
+    assert len(candidates) == len(_scan(annotations, 50, 50.1)) + 1
+
+    # Neither a removed nor a shortened long annotation is inspected anymore.
+    index.remove([long_annotation])
+    assert len(index._get_candidates(50, 50.1)) == len(_scan(annotations, 50, 50.1))
+    index.add([long_annotation])
+    long_annotation.time_end = 0
+    index.update(long_annotation)
+    assert len(index._get_candidates(50, 50.1)) == len(_scan(annotations, 50, 50.1))
+    assert set(index.query(-5, 0.5)) == _scan(annotations + [long_annotation], -5, 0.5)
+
+
+def test_single_updates_keep_index_consistent():
+    """Tests whether blocks and maximum ends follow inserts, removals and moves."""
+    rng = np.random.default_rng(2)
+    annotations = _get_annotations(300)
+    index = AnnotationIntervalIndex(annotations)
+    fresh_index = AnnotationIntervalIndex()
+
+    for step in range(2000):
+        operation = rng.integers(3)
+        if operation == 0 or len(annotations) < 10:
+            annotation = _get_annotations(1, seed=step + 1)[0]
+            annotations.append(annotation)
+            index.add([annotation])
+        elif operation == 1:
+            annotation = annotations.pop(rng.integers(len(annotations)))
+            index.remove([annotation])
+        else:
+            annotation = annotations[rng.integers(len(annotations))]
+            annotation.time_end = annotation.time_start + rng.uniform(0.01, 20)
+            index.update(annotation)
+        if step % 100 == 0:
+            start = rng.uniform(0, 100)
+            assert set(index.query(start, start + 1)) == _scan(annotations, start, start + 1)
+
+    assert len(index) == len(annotations)
+    fresh_index._block_ends = index._block_ends
+    fresh_index._rebuild_tree()
+    assert index._max_ends == fresh_index._max_ends
+    assert index._first_starts == [starts[0] for starts in index._block_starts]
+    assert all(starts == sorted(starts) for starts in index._block_starts)
+
+
+def test_moved_annotation_updates_tree_in_place():
+    """Tests whether moving an annotation within its block doesn't rebuild the tree."""
+    annotations = _get_annotations(2000)
+    index = AnnotationIntervalIndex(annotations)
+    annotation = index._block_annotations[5][10]
+
+    with mock.patch.object(index, "_rebuild_tree", side_effect=AssertionError("Tree was rebuilt")):
+        annotation.time_end = 500
+        index.update(annotation)
+        assert annotation in index._get_candidates(300, 400)
+        annotation.time_end = annotation.time_start + 0.1
+        index.update(annotation)
+        assert annotation not in index._get_candidates(300, 400)
+    assert len(index._block_starts) == len(annotations) // annotation_index.BLOCK_SIZE + 1
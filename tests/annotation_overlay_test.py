@@ -0,0 +1,51 @@
+import numpy as np
+from matplotlib.backend_bases import MouseEvent
+
+from mouseapp.model.utils import Annotation, find_nearest_indices
+from mouseapp.view import widgets
+from mouseapp.view.annotation_overlay import AnnotationOverlay
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def test_nearest_indices_match_argmin():
+    """Tests whether vectorized nearest indices match a scan of the array."""
+    array = np.sort(np.random.default_rng(0).uniform(0, 10, 100))
+    values = np.concatenate([[-1, 11, array[5]], np.random.default_rng(1).uniform(0, 10, 50)])
+
+    expected = [np.abs(array - value).argmin() for value in values]
+    assert find_nearest_indices(values, array).tolist() == expected
+
+
+def test_only_hovered_and_selected_boxes_are_interactive(main_model, qtbot):
+    """Tests whether boxes are drawn by one collection until they're used."""
+    canvas = widgets.Canvas()
+    qtbot.addWidget(canvas)
+    overlay = AnnotationOverlay(canvas.axis, main_model, widgets.BlitOverlay(canvas),
+                                on_transition_finished=lambda *_: None)
+    times = np.linspace(0, 10, 101)
+    freqs = np.linspace(0, 1000, 11)
+    annotations = [
+        Annotation(time_start=t, time_end=t + 0.5, freq_start=200, freq_end=500)
+        for t in [1.0, 3.0, 5.0, 7.0]
+    ]
+
+    overlay.set_annotations(annotations, times, 0.5, freqs)
+    assert len(overlay.interactive_boxes) == 0
+    assert len(overlay._collection.get_paths()) == 4
+    first_box = overlay._collection.get_paths()[0].vertices
+    assert first_box.min(axis=0).tolist() == [5, 2]
+    assert first_box.max(axis=0).tolist() == [10, 5]
+
+    canvas.axis.set_xlim(0, 100)
+    canvas.axis.set_ylim(0, 11)
+    overlay.select(annotations[0])
+    for x in [27, 47]:  # boxes of the 2nd and the 3rd annotation
+        x_pixel, y_pixel = canvas.axis.transData.transform((x, 3))
+        overlay.on_motion(MouseEvent("motion_notify_event", canvas, x_pixel, y_pixel))
+    interactive = [mab.annotation for mab in overlay.interactive_boxes]
+    assert interactive == [annotations[0], annotations[2]]
+    assert len(overlay._collection.get_paths()) == 2
+    assert widgets.MovableAnnotationBox.rect_near_cursor is overlay.interactive_boxes[1].rect
+
+    overlay.clear()
+    assert len(canvas.axis.patches) == 0
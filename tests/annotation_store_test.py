@@ -0,0 +1,100 @@
+import numpy as np
+from mouse.utils.sound_util import SpectrogramData
+from PySide6.QtCore import Qt
+
+from mouseapp.controller import main_controller
+from mouseapp.model import constants
+from mouseapp.model.annotation_store import AnnotationStore
+from mouseapp.model.utils import Annotation
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def _get_row(time_start, **extra):
+    row = {
+        constants.COL_BEGIN_TIME: time_start,
+        constants.COL_END_TIME: time_start + 1,
+        constants.COL_LOW_FREQ: 20000,
+        constants.COL_HIGH_FREQ: 30000,
+        constants.COL_USV_LABEL: "Unknown",
+    }
+    row.update(extra)
+    return row
+
+
+def test_extra_columns_keep_types_of_values():
+    """Tests whether extra columns are promoted only as far as their values need."""
+    store = AnnotationStore()
+    store.append([_get_row(0, Channel=1), _get_row(1)])
+    assert store.get(0, "Channel") == 1 and isinstance(store.get(0, "Channel"), int)
+    assert store.get(1, "Channel") == ""
+
+    store.set(1, "Channel", 2.5)
+    store.append([_get_row(2, Channel="left", Note="a")])
+    assert [store.get(row, "Channel") for row in range(3)] == [1.0, 2.5, "left"]
+    assert [store.get(row, "Note") for row in range(3)] == ["", "", "a"]
+    assert store.get_row_values(0) == _get_row(0, Channel=1.0)
+
+    store.take(np.array([True, False, True]))
+    assert store.get_rows(store.ids).tolist() == [0, 1]
+    assert store.get_column(constants.COL_BEGIN_TIME).tolist() == [0, 2]
+    assert store.to_dataframe()["Channel"].tolist() == [1.0, "left"]
+
+
+def test_stored_annotations_are_views_of_table_rows(main_model):
+    """Tests whether annotations read and write values of their table rows."""
+    table_model = main_model.spectrogram_model.annotation_table_model
+    annotations = [
+        Annotation(time_start=t, time_end=t + 1, freq_start=1, freq_end=2, label="Unknown")
+        for t in range(3)
+    ]
+    annotations[1].checked = True
+    table_model.append_annotations(annotations)
+
+    annotations[2].label = "Split"
+    annotations[2].table_data["Note"] = "long"
+    assert table_model.data(table_model.index(2, 4)) == "Split"
+    assert table_model.data(table_model.index(1, 0), Qt.CheckStateRole) == Qt.CheckState.Checked
+    assert table_model.store.get(2, "Note") == "long"
+
+    table_model.removeRows(0, 2)
+    assert annotations[1].checked and annotations[1].time_start == 1
+    assert annotations[2].table_data["Note"] == "long"
+    assert table_model.data(table_model.index(0, 0)) == "2.0"
+
+
+def test_checked_rows_are_removed_in_ranges(main_model):
+    """Tests whether removal of checked rows is signalled once per range."""
+    spectrogram_model = main_model.spectrogram_model
+    spectrogram_model.spectrogram_data = SpectrogramData(spec=None,
+                                                         times=np.linspace(0, 100, 2000),
+                                                         freqs=np.arange(10))
+    spectrogram_model.current_spectrogram_chunk_data = SpectrogramData(
+        spec=None, times=np.linspace(0, 100, 2000), freqs=np.arange(10))
+    table_model = spectrogram_model.annotation_table_model
+    table_model.append_annotations([
+        Annotation(time_start=t, time_end=t + 0.5, freq_start=1, freq_end=2, label=str(t))
+        for t in range(100)
+    ])
+    main_controller.set_visible_annotations(main_model)
+    removed_ranges = []
+    table_model.rowsAboutToBeRemoved.connect(lambda _, first, last: removed_ranges.append((first, last)))
+    resets = []
+    table_model.modelAboutToBeReset.connect(lambda: resets.append(True))
+
+    for row in [*range(10, 20), 50, 51, 90]:
+        table_model.check_annotation(row, True)
+    main_controller.delete_selected_annotations(main_model)
+    assert removed_ranges == [(90, 90), (50, 51), (10, 19)]
+    assert [a.label for a in table_model.annotations] == [
+        str(t) for t in range(100) if not (10 <= t < 20 or t in [50, 51, 90])
+    ]
+    assert len(spectrogram_model.visible_annotations) == 87
+    assert table_model.checked_annotations_counter == 0
+
+    for row in range(0, 80, 2):
+        table_model.check_annotation(row, True)
+    main_controller.delete_selected_annotations(main_model)
+    assert resets == []
+    assert removed_ranges[3:] == [(row, row) for row in range(78, -1, -2)]
+    assert len(table_model.annotations) == len(table_model.store) == 47
+    assert table_model.data(table_model.index(0, 4)) == "1"
@@ -0,0 +1,75 @@
+from mouseapp.controller import main_controller  # noqa F401
+from mouseapp.model import constants
+from mouseapp.model.utils import Annotation
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def _get_changed_ranges(table_model):
+    changed_ranges = []
+    table_model.dataChanged.connect(lambda top_left, bottom_right: changed_ranges.append(
+        ((top_left.row(), top_left.column()), (bottom_right.row(), bottom_right.column()))))
+    return changed_ranges
+
+
+def _fill(table_model, count=10):
+    annotations = [
+        Annotation(time_start=t, time_end=t + 0.5, freq_start=1, freq_end=2, label="Unknown")
+        for t in range(count)
+    ]
+    table_model.append_annotations(annotations)
+    return annotations
+
+
+def test_changed_cells_are_coalesced(main_model):
+    """Tests whether changes are signalled in the fewest rectangles of cells."""
+    table_model = main_model.spectrogram_model.annotation_table_model
+    _fill(table_model)
+    changed_ranges = _get_changed_ranges(table_model)
+
+    table_model.update_cells([5, 1, 2, 3, 9], [constants.COL_END_TIME, 0, "Hidden column"])
+    assert changed_ranges == [((1, 0), (3, 1)), ((5, 0), (5, 1)), ((9, 0), (9, 1))]
+
+    changed_ranges.clear()
+    table_model.update_selected_column(constants.COL_USV_LABEL_ID)
+    assert changed_ranges == [((0, 4), (9, 4))]
+
+    changed_ranges.clear()
+    table_model.check_annotations([2, 3, 4])
+    table_model.check_annotations([3, 4, 5])
+    assert changed_ranges == [((2, 0), (4, 0)), ((5, 0), (5, 0))]
+    assert table_model.checked_annotations_counter == 4
+
+
+def test_only_edited_values_are_signalled(main_model):
+    """Tests whether moving a box signals only its changed cells."""
+    table_model = main_model.spectrogram_model.annotation_table_model
+    annotations = _fill(table_model)
+    changed_ranges = _get_changed_ranges(table_model)
+
+    table_model.update_annotation_values(
+        annotations[6], {
+            constants.COL_BEGIN_TIME: 6.0,
+            constants.COL_END_TIME: 7.0,
+            constants.COL_LOW_FREQ: 1.0,
+            constants.COL_HIGH_FREQ: 3.0,
+        })
+    assert changed_ranges == [((6, 1), (6, 1)), ((6, 3), (6, 3))]
+    assert annotations[6].time_end == 7.0
+    assert table_model.get_annotations_between(6.8, 6.9) == [annotations[6]]
+
+
+def test_rows_of_annotations_follow_removals(main_model):
+    """Tests whether rows of annotations are found after the table changes."""
+    table_model = main_model.spectrogram_model.annotation_table_model
+    annotations = _fill(table_model, count=6)
+
+    table_model.remove_annotations([0, 3])
+    assert table_model.get_row(annotations[0]) is None
+    assert table_model.get_rows(annotations).tolist() == [0, 1, 2, 3]
+
+    appended = _fill(table_model, count=2)
+    table_model.remove_annotations([1])
+    assert [table_model.get_row(annotation) for annotation in annotations + appended] == [
+        None, 0, None, None, 1, 2, 3, 4
+    ]
+    assert table_model.annotations == [annotations[1], annotations[4], annotations[5]] + appended
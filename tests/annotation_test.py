@@ -0,0 +1,57 @@
+import numpy as np
+from mouse.utils.sound_util import SpectrogramData
+
+from mouseapp.controller import main_controller  # noqa F401
+from mouseapp.model import constants
+from mouseapp.model.utils import Annotation, annotations_to_pixels, to_squeak_boxes
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def test_table_data_is_derived_from_bounds():
+    """Tests whether bounds are stored once and shown in table data."""
+    annotation = Annotation(time_start=1.0,
+                            time_end=2.0,
+                            freq_start=3.0,
+                            freq_end=4.0,
+                            label="Unknown",
+                            table_data={constants.COL_DETECTION_METHOD: "GAC"})
+    assert not hasattr(annotation, "__dict__")
+
+    annotation.time_end = 2.5
+    annotation.table_data[constants.COL_LOW_FREQ] = 3.5
+    assert dict(annotation.table_data) == {
+        constants.COL_BEGIN_TIME: 1.0,
+        constants.COL_END_TIME: 2.5,
+        constants.COL_LOW_FREQ: 3.5,
+        constants.COL_HIGH_FREQ: 4.0,
+        constants.COL_USV_LABEL: "Unknown",
+        constants.COL_DETECTION_METHOD: "GAC",
+    }
+    assert annotation.freq_start == 3.5
+    assert annotation.table_data["Missing"] == ""
+
+
+def test_batched_conversion_matches_single_annotations(main_model):
+    """Tests whether batched pixel conversion agrees with argmin per annotation."""
+    rng = np.random.default_rng(0)
+    times = np.cumsum(rng.uniform(0.001, 0.01, 500))
+    freqs = np.linspace(0, 125000, 257)
+    spec_data = SpectrogramData(spec=np.zeros((257, 500)), times=times, freqs=freqs)
+    starts = rng.uniform(-1, times[-1] + 1, 200)
+    low_freqs = rng.uniform(0, 120000, 200)
+    annotations = [
+        Annotation(time_start=t, time_end=t + 0.1, freq_start=f, freq_end=f + 5000, label="Unknown")
+        for t, f in zip(starts, low_freqs)
+    ]
+    expected = [[np.abs(times - a.time_start).argmin(), np.abs(times - a.time_end).argmin(),
+                 np.abs(freqs - a.freq_start).argmin(), np.abs(freqs - a.freq_end).argmin()]
+                for a in annotations]
+
+    assert annotations_to_pixels(annotations, times, freqs).tolist() == expected
+    main_model.spectrogram_model.annotation_table_model.append_annotations(annotations)
+    boxes = to_squeak_boxes(annotations, spec_data)
+    assert [[b.t_start, b.t_end, b.freq_start, b.freq_end] for b in boxes] == expected
+
+    restored = Annotation.from_squeak_boxes(boxes, spec_data, {constants.COL_DETECTION_METHOD: "GAC"})
+    assert [a.time_start for a in restored] == times[[e[0] for e in expected]].tolist()
+    assert restored[0].table_data[constants.COL_DETECTION_METHOD] == "GAC"
@@ -0,0 +1,28 @@
+from unittest import mock
+
+from matplotlib.patches import Rectangle
+
+from mouseapp.view import widgets
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def test_moving_box_is_blitted_over_saved_background(qtbot):
+    """Tests whether moving a box doesn't redraw the whole canvas."""
+    canvas = widgets.Canvas()
+    qtbot.addWidget(canvas)
+    canvas.axis.imshow([[0, 1], [1, 0]])
+    rect = Rectangle((0, 0), 1, 1, edgecolor="r", facecolor="none")
+    canvas.axis.add_patch(rect)
+    overlay = widgets.BlitOverlay(canvas)
+
+    overlay.start([rect])
+    assert rect.get_animated()
+    with mock.patch.object(canvas, "draw", side_effect=AssertionError("Redrawn")), \
+            mock.patch.object(canvas, "draw_idle", side_effect=AssertionError("Redrawn")):
+        for x in range(5):
+            rect.set_x(x / 10)
+            overlay.update()
+
+    overlay.finish()
+    assert not rect.get_animated()
+    assert not overlay.active
@@ -0,0 +1,48 @@
+import numpy as np
+
+from mouseapp.view.box_index import BoxGridIndex
+
+
+def _find_by_scan(extents, x, y):
+    hits = np.flatnonzero((extents[:, 0] < x) & (x < extents[:, 1]) & (extents[:, 2] < y) & (y < extents[:, 3]))
+    return int(hits[-1]) if len(hits) > 0 else None
+
+
+def test_query_matches_scan():
+    """Tests whether the grid finds the same boxes as checking all of them."""
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(-5, 500, (200, 2))
+    sizes = rng.uniform(0.5, 40, (200, 2))
+    extents = np.stack([starts[:, 0], starts[:, 0] + sizes[:, 0], starts[:, 1], starts[:, 1] + sizes[:, 1]], axis=1)
+    index = BoxGridIndex(extents)
+
+    for x, y in rng.uniform(-10, 550, (1000, 2)):
+        assert index.query(x, y) == _find_by_scan(extents, x, y)
+
+
+def test_updated_box_is_found_at_new_extent():
+    """Tests whether moved boxes are found only at their new position."""
+    index = BoxGridIndex(np.array([[0, 10, 0, 10], [20, 30, 0, 10]]))
+    assert index.query(5, 5) == 0
+
+    index.update(0, np.array([100, 110, 50, 60]))
+    assert index.query(5, 5) is None
+    assert index.query(105, 55) == 0
+    assert index.query(25, 5) == 1
+    assert len(BoxGridIndex(np.empty((0, 4)))) == 0
+
+
+def test_long_box_isnt_put_into_cells():
+    """Tests whether a box much longer than the others is checked aside."""
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, 100000, (500, 2))
+    extents = np.stack([starts[:, 0], starts[:, 0] + 2, starts[:, 1] / 1000, starts[:, 1] / 1000 + 2], axis=1)
+    extents = np.concatenate([extents, [[0, 100000, 0, 3]]])
+    index = BoxGridIndex(extents)
+    assert sum(len(boxes) for boxes in index._cells.values()) < 10 * len(extents)
+
+    for x, y in np.concatenate([rng.uniform(0, 100000, (500, 1)), rng.uniform(0, 100, (500, 1))], axis=1):
+        assert index.query(x, y) == _find_by_scan(extents, x, y)
+    index.update(len(extents) - 1, np.array([10, 11, 10, 11]))
+    assert index.query(5000, 1) == _find_by_scan(extents[:-1], 5000, 1)
+    assert index.query(10.5, 10.5) == len(extents) - 1
@@ -1,6 +1,12 @@
+import os
 from pathlib import Path
+from unittest import mock
+
+import torch
+import torchaudio
 
 from mouseapp.controller.main_controller import load_audio_files
+from mouseapp.model.main_models import ProjectModel
 from mouseapp.view.project_init_view import LoadAudio
 from mouseapp.view.main_view import ProjectTab
 from tests.model_fixtures import *  # noqa F401 F403
@@ -123,3 +129,30 @@ def test_first_not_common_character_various_depths(qtbot, clean_main_model):
     clean_main_model.project_model.emit_all_setting_signals()
     short_file_names = sorted(list(project_tab.audio_file_widgets.keys()))
     assert short_file_names == ["f/file_a.wav", "fi/f/file_c.wav", "file_c.wav"]
+
+
+def test_audio_metadata_is_read_from_headers_once(clean_main_model, tmpdir):
+    """Tests whether metadata of unmodified files is reused from the index."""
+    path = Path(str(tmpdir), "file.wav")
+    torchaudio.save(str(path), torch.zeros((2, 8000)), 16000)
+
+    load_audio_files(clean_main_model, [str(path)])
+    metadata = clean_main_model.project_model.audio_metadata[path]
+    assert (metadata.num_frames, metadata.sample_rate, metadata.num_channels,
+            metadata.duration) == (8000, 16000, 2, 0.5)
+
+    with mock.patch("mouseapp.controller.audio_stream.torchaudio.info",
+                    mock.MagicMock(side_effect=AssertionError("Header was read"))):
+        load_audio_files(clean_main_model, [str(path)])
+    assert clean_main_model.project_model.audio_metadata[path] == metadata
+
+    # Modified files are read again.
+    torchaudio.save(str(path), torch.zeros((1, 4000)), 8000)
+    os.utime(path, ns=(metadata.mtime_ns + 10**9, metadata.mtime_ns + 10**9))
+    load_audio_files(clean_main_model, [str(path)])
+    assert clean_main_model.project_model.audio_metadata[path].sample_rate == 8000
+
+    clean_main_model.project_model.project_path = Path(str(tmpdir))
+    restored = ProjectModel()
+    restored.from_dict(clean_main_model.project_model.to_dict())
+    assert restored.audio_metadata == clean_main_model.project_model.audio_metadata
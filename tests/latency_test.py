@@ -0,0 +1,44 @@
+import csv
+
+import numpy as np
+
+from mouseapp.model.latency import LatencyRecorder
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def test_ring_buffer_keeps_latest_durations():
+    """Tests whether only the latest durations are kept, oldest first."""
+    recorder = LatencyRecorder(buffer_size=4)
+    for duration in range(6):
+        recorder.record("stage", duration / 1000)
+
+    assert recorder.get_durations("stage").tolist() == [0.002, 0.003, 0.004, 0.005]
+    p50, p95, p99 = recorder.get_percentiles()["stage"]
+    assert np.isclose(p50, 3.5)
+    assert 4.5 < p95 < p99 <= 5
+
+
+def test_timed_functions_are_recorded_when_enabled(path_tmpdir):
+    """Tests whether decorated functions are timed only while enabled."""
+    recorder = LatencyRecorder()
+
+    @recorder.timed("add")
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    assert recorder.stages == []
+
+    recorder.enabled = True
+    add(1, 2)
+    add(3, 4)
+    filename = path_tmpdir / "latencies.csv"
+    recorder.to_csv(filename)
+    with open(filename) as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["stage", "p50_ms", "p95_ms", "p99_ms"]
+    assert rows[1][0] == "add"
+    assert np.allclose([float(value) for value in rows[1][1:]], recorder.get_percentiles()["add"])
+    assert rows[2] == []
+    assert rows[3] == ["stage", "duration_ms"]
+    assert [row[0] for row in rows[4:]] == ["add", "add"]
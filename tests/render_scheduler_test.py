@@ -0,0 +1,26 @@
+from mouseapp.view.render_scheduler import RenderScheduler
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def test_only_latest_request_is_rendered(qtbot):
+    """Tests whether requests made before a frame is rendered are coalesced."""
+    rendered = []
+    scheduler = RenderScheduler(rendered.append, max_fps=10)
+
+    for position in range(100):
+        scheduler.request(position)
+    qtbot.waitUntil(lambda: len(rendered) == 1)
+    assert rendered == [99]
+
+    # The next frame is rendered no sooner than the frame rate allows.
+    scheduler.request(100)
+    scheduler.request(101)
+    qtbot.wait(20)
+    assert rendered == [99]
+    qtbot.waitUntil(lambda: len(rendered) == 2)
+    assert rendered == [99, 101]
+
+    scheduler.request(102)
+    scheduler.flush()
+    scheduler.flush()
+    assert rendered == [99, 101, 102]
@@ -0,0 +1,497 @@
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pytest
+import torch
+import torchaudio
+
+from mouseapp.controller import (
+    audio_stream,
+    main_controller,
+    persistency_controller,
+    spectrogram_controller,
+    spectrogram_storage,
+)
+from mouseapp.controller.settings_controllers import spectrogram_settings_controller
+from mouseapp.model.settings.utils import SpectrogramRendering, SpectrogramStorage
+from mouseapp.model.utils import Annotation, to_squeak_boxes
+from tests.model_fixtures import *  # noqa F401 F403
+
+SAMPLE_RATE = 16000
+
+
+def _save_audio(path: Path,
+                num_frames: int,
+                seed: int,
+                sample_rate: int = SAMPLE_RATE) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(seed)
+    waveform = torch.rand((1, num_frames), generator=generator) * 2 - 1
+    torchaudio.save(str(path), waveform, sample_rate)
+    # Reload, so the reference is affected by the same quantization.
+    return torchaudio.load(str(path))[0].squeeze()
+
+
+def _initialize_project(main_model):
+    """Create the project folder, so spectrograms can be cached in it."""
+    persistency_controller._initialize_project_folder(main_model.project_model.project_path)
+
+
+@pytest.mark.parametrize("block_frames", [1, 7, 64, 100000])
+def test_streamed_spectrogram_matches_full_stft(clean_spec_model, path_tmpdir,
+                                                block_frames):
+    """Tests whether block-wise spectrogram is equal to one computed at once."""
+    signals = [
+        _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0),
+        _save_audio(path_tmpdir.joinpath("b.wav"), 3333, seed=1),
+    ]
+    segments = spectrogram_controller.read_audio_segments(
+        [path_tmpdir.joinpath("a.wav"), path_tmpdir.joinpath("b.wav")])
+    clean_spec_model.sample_rate = SAMPLE_RATE
+
+    spectrogram_data = spectrogram_controller.stream_spectrogram(
+        segments, clean_spec_model, block_frames=block_frames)
+
+    expected = torchaudio.transforms.Spectrogram(
+        n_fft=clean_spec_model.n_fft,
+        win_length=clean_spec_model.win_length,
+        hop_length=clean_spec_model.hop_length,
+        center=clean_spec_model.center,
+        pad_mode=clean_spec_model.pad_mode,
+        power=clean_spec_model.power,
+    )(torch.cat(signals))
+    assert spectrogram_data.spec.shape == expected.shape
+    assert torch.allclose(spectrogram_data.spec, expected, atol=1e-4)
+    assert len(spectrogram_data.times) == expected.shape[1]
+    assert len(spectrogram_data.freqs) == expected.shape[0]
+
+
+def test_spectrogram_is_cached_in_project_folder(main_model, path_tmpdir):
+    """Tests whether reopened project maps cached spectrogram."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    audio_files = [path_tmpdir.joinpath("a.wav")]
+    _initialize_project(main_model)
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    computed = main_model.spectrogram_model.spectrogram_data
+
+    with mock.patch(
+            "mouseapp.controller.spectrogram_controller.stream_spectrogram",
+            mock.MagicMock(side_effect=AssertionError("Cache wasn't used")),
+    ):
+        spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    cached = main_model.spectrogram_model.spectrogram_data
+
+    assert cached is not computed
+    assert torch.equal(cached.spec, computed.spec)
+    assert (cached.times == computed.times).all()
+    assert (cached.freqs == computed.freqs).all()
+
+
+def test_stale_spectrogram_caches_are_evicted(main_model, path_tmpdir):
+    """Tests whether only the shown and the new spectrogram stay cached."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    audio_files = [path_tmpdir.joinpath("a.wav")]
+    project_path = main_model.project_model.project_path
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    assert not project_path.exists()
+
+    _initialize_project(main_model)
+    cache_dir = project_path.joinpath("spectrogram_cache")
+    keys = []
+    for hop_length in [256, 128, 64]:
+        main_model.spectrogram_model.hop_length = hop_length
+        spectrogram_controller.generate_spectrogram(main_model, audio_files)
+        keys.append(main_model.spectrogram_model.spectrogram_cache_key)
+        assert {path.name for path in cache_dir.iterdir()} == set(keys[-2:])
+
+
+def test_partial_spectrogram_caches_are_evicted_only_when_unused(main_model, path_tmpdir):
+    """Tests whether caches being written survive eviction and stale ones don't."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    audio_files = [path_tmpdir.joinpath("a.wav")]
+    project_path = main_model.project_model.project_path
+    _initialize_project(main_model)
+    cache_dir = project_path.joinpath("spectrogram_cache")
+    cache_dir.mkdir()
+    stale_path = cache_dir.joinpath("stale.partial")
+    stale_path.mkdir()
+
+    written_specs = persistency_controller.create_spectrogram_cache(
+        project_path, "written", [(3, 4)], dtype=np.float32)
+    written_path = Path(written_specs[0].filename).parent
+    assert not stale_path.exists()
+    stale_path.mkdir()
+
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    assert stale_path.exists()
+    assert written_path.exists()
+
+    persistency_controller.discard_spectrogram_cache(written_specs)
+    del written_specs
+    main_model.spectrogram_model.hop_length = 128
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    assert not stale_path.exists()
+    assert not written_path.exists()
+
+
+def test_spectrogram_cache_depends_on_stft_parameters(main_model, path_tmpdir):
+    """Tests whether changed STFT parameters invalidate the cache."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    segments = spectrogram_controller.read_audio_segments(
+        [path_tmpdir.joinpath("a.wav")])
+    spectrogram_model = main_model.spectrogram_model
+
+    key = spectrogram_controller.spectrogram_cache_key(segments, spectrogram_model)
+    spectrogram_model.hop_length = 128
+
+    assert key != spectrogram_controller.spectrogram_cache_key(
+        segments, spectrogram_model)
+
+
+def test_parallel_spectrogram_matches_serial(clean_spec_model, path_tmpdir):
+    """Tests whether spectrogram computed in worker processes is the same."""
+    audio_files = []
+    for index, num_frames in enumerate([5000, 3333, 200, 7000]):
+        audio_files.append(path_tmpdir.joinpath(f"{index}.wav"))
+        _save_audio(audio_files[-1], num_frames, seed=index)
+    segments = spectrogram_controller.read_audio_segments(audio_files)
+    clean_spec_model.sample_rate = SAMPLE_RATE
+
+    serial = spectrogram_controller.stream_spectrogram(segments,
+                                                       clean_spec_model,
+                                                       block_frames=4,
+                                                       workers=1)
+    parallel = spectrogram_controller.stream_spectrogram(segments,
+                                                         clean_spec_model,
+                                                         block_frames=4,
+                                                         workers=2)
+
+    assert torch.allclose(parallel.spec, serial.spec, atol=1e-5)
+
+
+
+@pytest.mark.parametrize("sample_rate", [8000, 11025])
+def test_blockwise_resampling_matches_full_resampling(path_tmpdir, sample_rate):
+    """Tests whether audio resampled in blocks is the same as resampled at once."""
+    signal = _save_audio(path_tmpdir.joinpath("a.wav"), 20011, seed=0)
+    segment = spectrogram_controller.read_audio_segments(
+        [path_tmpdir.joinpath("a.wav")])[0]
+
+    target_path = path_tmpdir.joinpath("a.npy")
+    audio_stream.resample_segment(segment,
+                                  target_path,
+                                  sample_rate,
+                                  block_samples=1000)
+
+    expected = torchaudio.functional.resample(signal, SAMPLE_RATE, sample_rate)
+    resampled = torch.from_numpy(np.load(target_path))
+    assert resampled.shape == expected.shape
+    assert torch.allclose(resampled, expected, atol=1e-5)
+
+
+def test_mixed_sample_rates_are_resampled_to_lowest(main_model, path_tmpdir):
+    """Tests whether files with higher sample rate are resampled before STFT."""
+    signals = [
+        _save_audio(path_tmpdir.joinpath("a.wav"), 16000, seed=0),
+        _save_audio(path_tmpdir.joinpath("b.wav"), 4000, seed=1, sample_rate=8000),
+    ]
+    spectrogram_controller.generate_spectrogram(
+        main_model, [path_tmpdir.joinpath("a.wav"), path_tmpdir.joinpath("b.wav")])
+
+    spectrogram_model = main_model.spectrogram_model
+    expected = torchaudio.transforms.Spectrogram(
+        n_fft=spectrogram_model.n_fft,
+        win_length=spectrogram_model.win_length,
+        hop_length=spectrogram_model.hop_length,
+        power=spectrogram_model.power,
+    )(torch.cat([torchaudio.functional.resample(signals[0], SAMPLE_RATE, 8000),
+                 signals[1]]))
+    assert spectrogram_model.sample_rate == 8000
+    assert spectrogram_model.spectrogram_data.spec.shape == expected.shape
+    assert torch.allclose(spectrogram_model.spectrogram_data.spec,
+                          expected,
+                          atol=1e-3)
+    assert spectrogram_model.spectrogram_data.times[-1] == pytest.approx(
+        (expected.shape[1] - 1) * spectrogram_model.hop_length / 8000)
+
+
+def test_stale_temporary_resampled_audio_is_evicted(main_model, path_tmpdir):
+    """Tests whether audio resampled outside of a project is evicted like in it."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 16000, seed=0)
+    _save_audio(path_tmpdir.joinpath("b.wav"), 4000, seed=1, sample_rate=8000)
+    audio_files = [path_tmpdir.joinpath("a.wav"), path_tmpdir.joinpath("b.wav")]
+    assert not main_model.project_model.project_path.exists()
+
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    segments = spectrogram_controller.read_audio_segments(audio_files[:1])
+    cache_dir = persistency_controller.get_resample_cache(None, set())
+    assert list(cache_dir.iterdir()) == []
+
+    spectrogram_controller.resample_audio_segments(main_model, segments)
+    assert [path.name for path in cache_dir.iterdir()] == [
+        f"{spectrogram_controller.resample_cache_key(segments[0], 8000)}.npy"
+    ]
+
+
+@mock.patch("mouseapp.controller.spectrogram_controller.PYRAMID_MIN_FRAMES", 4)
+def test_spectrogram_pyramid_is_max_pooled(main_model, path_tmpdir):
+    """Tests whether pyramid levels are max-pooled and cached with the spectrogram."""
+    _initialize_project(main_model)
+    _save_audio(path_tmpdir.joinpath("a.wav"), 16000, seed=0)
+    audio_files = [path_tmpdir.joinpath("a.wav")]
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    spectrogram_model = main_model.spectrogram_model
+    pyramid = spectrogram_model.spectrogram_pyramid
+
+    assert [level.spec.shape[1] for level in pyramid] == [16, 4]
+    previous_spec = spectrogram_model.spectrogram_data.spec
+    for level in pyramid:
+        expected = torch.nn.functional.max_pool1d(previous_spec.unsqueeze(0),
+                                                  kernel_size=4,
+                                                  ceil_mode=True).squeeze(0)
+        assert torch.equal(level.spec, expected)
+        assert len(level.times) == level.spec.shape[1]
+        previous_spec = level.spec
+
+    with mock.patch(
+            "mouseapp.controller.spectrogram_controller.stream_spectrogram",
+            mock.MagicMock(side_effect=AssertionError("Cache wasn't used")),
+    ):
+        spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    cached_pyramid = main_model.spectrogram_model.spectrogram_pyramid
+    assert len(cached_pyramid) == len(pyramid)
+    for cached_level, level in zip(cached_pyramid, pyramid):
+        assert torch.equal(cached_level.spec, level.spec)
+
+
+@mock.patch("mouseapp.controller.spectrogram_controller.PYRAMID_MIN_FRAMES", 4)
+def test_viewport_uses_pyramid_level_matching_its_width(main_model, path_tmpdir):
+    """Tests whether zoomed-out chunk is taken from a coarser pyramid level."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 16000, seed=0)
+    spectrogram_controller.generate_spectrogram(main_model,
+                                                [path_tmpdir.joinpath("a.wav")])
+    spectrogram_model = main_model.spectrogram_model
+
+    main_controller.update_from_slider_position(main_model, 0)
+    chunk = spectrogram_model.current_spectrogram_chunk_data
+    full_resolution_frames = chunk.spec.shape[1]
+    assert spectrogram_model.displayed_level == 0
+
+    main_controller.set_viewport_width(main_model, 10)
+    assert spectrogram_model.displayed_level == 1
+    chunk = spectrogram_model.current_spectrogram_chunk_data
+    assert 10 <= chunk.spec.shape[1] < full_resolution_frames
+
+
+def test_scrolled_chunk_is_a_copy_of_constant_width(main_model, path_tmpdir):
+    """Tests whether scrolling shows contiguous copies of spectrogram slices."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 32000, seed=0)
+    spectrogram_controller.generate_spectrogram(main_model,
+                                                [path_tmpdir.joinpath("a.wav")])
+    spectrogram_model = main_model.spectrogram_model
+    spectrogram_model.spectrogram_display_size = 500
+    spec = spectrogram_model.spectrogram_data.spec
+    times = spectrogram_model.spectrogram_data.times
+
+    widths = []
+    for position in [0, 123, 457, 1000]:
+        main_controller.update_from_slider_position(main_model, position)
+        chunk = spectrogram_model.current_spectrogram_chunk_data
+        time_slice = spectrogram_model.time_slice
+        assert chunk.spec.is_contiguous() and torch.equal(chunk.spec, spec[:, time_slice])
+        assert not np.shares_memory(chunk.times, times)
+        assert chunk.times[0] >= position / 1000
+        assert time_slice.start == 0 or times[time_slice.start - 1] < position / 1000
+        widths.append(chunk.spec.shape[1])
+    assert len(set(widths)) == 1
+
+
+@pytest.mark.parametrize("storage, dtype, rtol", [
+    (SpectrogramStorage.FLOAT16, torch.float16, 1e-3),
+    (SpectrogramStorage.UINT8, torch.uint8, 0.05),
+])
+def test_compact_storage_is_decoded_close_to_float32(main_model, path_tmpdir,
+                                                     storage, dtype, rtol):
+    """Tests whether compact spectrogram is cached compactly and decodes back."""
+    _initialize_project(main_model)
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    audio_files = [path_tmpdir.joinpath("a.wav")]
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    reference = main_model.spectrogram_model.spectrogram_data.spec.clone()
+
+    main_model.settings_model.spectrogram_settings_model.storage_mode = storage
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    compact = main_model.spectrogram_model.spectrogram_data
+    decoded = spectrogram_storage.decode_spectrogram(main_model.spectrogram_model,
+                                                     compact)
+
+    assert compact.spec.dtype == dtype
+    assert decoded.spec.dtype == torch.float32
+    assert torch.allclose(decoded.spec, reference, rtol=rtol, atol=1e-3)
+    # The compact spectrogram is read back from the cache.
+    with mock.patch(
+            "mouseapp.controller.spectrogram_controller.stream_spectrogram",
+            mock.MagicMock(side_effect=AssertionError("Cache wasn't used")),
+    ):
+        spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    assert torch.equal(main_model.spectrogram_model.spectrogram_data.spec,
+                       compact.spec)
+
+
+def test_spectrogram_is_cropped_to_frequency_range(main_model, path_tmpdir):
+    """Tests whether only rows in the frequency range of interest are kept."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    audio_files = [path_tmpdir.joinpath("a.wav")]
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    full = main_model.spectrogram_model.spectrogram_data
+    full_spec, full_freqs = full.spec.clone(), full.freqs.copy()
+
+    spectrogram_settings_model = main_model.settings_model.spectrogram_settings_model
+    spectrogram_settings_model.frequency_min = 2000.0
+    spectrogram_settings_model.frequency_max = 5000.0
+    spectrogram_controller.generate_spectrogram(main_model, audio_files)
+    cropped = main_model.spectrogram_model.spectrogram_data
+
+    rows = (full_freqs >= 2000.0) & (full_freqs <= 5000.0)
+    assert (cropped.freqs == full_freqs[rows]).all()
+    assert torch.equal(cropped.spec, full_spec[torch.from_numpy(rows)])
+    for level in main_model.spectrogram_model.spectrogram_pyramid:
+        assert level.spec.shape[0] == rows.sum()
+
+    # Annotations are mapped to cropped rows by their frequencies.
+    annotation = Annotation(time_start=0.05,
+                            time_end=0.1,
+                            freq_start=float(cropped.freqs[3]),
+                            freq_end=float(cropped.freqs[10]),
+                            label="Unknown")
+    squeak_box, = to_squeak_boxes([annotation], cropped)
+    assert (squeak_box.freq_start, squeak_box.freq_end) == (3, 10)
+    restored, = Annotation.from_squeak_boxes([squeak_box], cropped)
+    assert (restored.freq_start, restored.freq_end) == (annotation.freq_start,
+                                                        annotation.freq_end)
+
+
+def test_progressive_spectrogram_is_displayed_before_it_is_computed(
+        main_model, path_tmpdir):
+    """Tests whether the spectrogram is published first and filled in later."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    audio_files = [path_tmpdir.joinpath("a.wav")]
+    spectrogram_model = main_model.spectrogram_model
+    changes, updates, progress = [], [], []
+    spectrogram_model.spectrogram_data_changed.connect(
+        lambda data_and_size: changes.append(data_and_size[0].spec.clone()))
+    spectrogram_model.spectrogram_data_updated.connect(lambda: updates.append(
+        spectrogram_model.spectrogram_data.spec.clone()))
+
+    spectrogram_controller.generate_spectrogram(
+        main_model,
+        audio_files,
+        callback=lambda computed, total: progress.append((computed, total)),
+        progressive=True)
+
+    assert len(changes) == 1
+    assert not changes[0].any()
+    assert updates[0].any()
+    assert progress[-1][0] == progress[-1][1]
+    assert torch.equal(updates[-1], spectrogram_model.spectrogram_data.spec)
+
+
+@mock.patch("mouseapp.controller.spectrogram_controller.PROGRESSIVE_UPDATE_INTERVAL", 0)
+def test_progressive_updates_drop_prepared_chunks(main_model, path_tmpdir):
+    """Tests whether chunks displayed while the spectrogram is built aren't stale."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 5000, seed=0)
+    main_model.settings_model.spectrogram_settings_model.storage_mode = (
+        SpectrogramStorage.FLOAT16)
+    spectrogram_model = main_model.spectrogram_model
+    stale_chunks = []
+
+    def on_updated(*_):
+        main_controller.update_from_slider_position(main_model, 0)
+        chunk = spectrogram_model.current_spectrogram_chunk_data
+        expected = spectrogram_model.spectrogram_data.spec[:, spectrogram_model.time_slice]
+        if not torch.equal(chunk.spec, expected.to(torch.float32)):
+            stale_chunks.append(chunk)
+
+    # The not yet computed spectrogram is displayed first, like in the view.
+    spectrogram_model.spectrogram_data_changed.connect(on_updated)
+    spectrogram_model.spectrogram_data_updated.connect(on_updated)
+    spectrogram_controller.generate_spectrogram(main_model, [path_tmpdir.joinpath("a.wav")],
+                                                progressive=True)
+    assert stale_chunks == []
+
+
+def test_adjacent_pages_are_prefetched(main_model, path_tmpdir, qtbot):
+    """Tests whether the next page is prepared before it's displayed."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 32000, seed=0)
+    main_model.settings_model.spectrogram_settings_model.storage_mode = (
+        SpectrogramStorage.UINT8)
+    main_model.settings_model.spectrogram_settings_model.rendering = (
+        SpectrogramRendering.IMAGE)
+    spectrogram_controller.generate_spectrogram(main_model,
+                                                [path_tmpdir.joinpath("a.wav")])
+    spectrogram_model = main_model.spectrogram_model
+    spectrogram_model.spectrogram_display_size = 500
+    tile_cache = spectrogram_model.tile_cache
+
+    main_controller.update_from_slider_position(main_model, 0)
+    width = spectrogram_model.time_slice.stop
+    start = int(np.searchsorted(spectrogram_model.spectrogram_data.times, 0.5))
+    next_page_key = (0, start, start + width)
+    qtbot.waitUntil(lambda: next_page_key in tile_cache)
+    prefetched = tile_cache.get(next_page_key)
+
+    main_controller.update_from_slider_position(main_model, 500)
+    assert spectrogram_model.current_display_tile is prefetched
+    chunk = spectrogram_model.current_spectrogram_chunk_data
+    assert chunk.spec.dtype == torch.float32
+    assert prefetched.color_indices.shape == tuple(chunk.spec.shape)
+    assert chunk.times[0] >= 0.5
+
+    # Least recently used chunks are evicted to fit the memory budget.
+    main_model.settings_model.spectrogram_settings_model.display_cache_size = 0
+    main_controller.update_from_slider_position(main_model, 0)
+    assert len(tile_cache) == 0
+
+
+def test_tiles_are_prepared_again_for_changed_rendering(main_model, path_tmpdir):
+    """Tests whether tiles cached for mesh rendering aren't reused for images."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 16000, seed=0)
+    spectrogram_controller.generate_spectrogram(main_model,
+                                                [path_tmpdir.joinpath("a.wav")])
+    spectrogram_model = main_model.spectrogram_model
+    main_controller.update_from_slider_position(main_model, 0)
+    assert spectrogram_model.current_display_tile.color_indices is None
+
+    spectrogram_settings_controller.set_rendering(main_model, SpectrogramRendering.IMAGE.value)
+    main_controller.update_from_slider_position(main_model, 0)
+    chunk = spectrogram_model.current_spectrogram_chunk_data
+    assert spectrogram_model.current_display_tile.color_indices.shape == tuple(chunk.spec.shape)
+
+
+@mock.patch("mouseapp.controller.spectrogram_controller.PYRAMID_MIN_FRAMES", 4)
+def test_boxes_edited_on_coarse_level_keep_full_resolution(main_model, path_tmpdir):
+    """Tests whether editing a zoomed-out box moves it by full resolution frames."""
+    _save_audio(path_tmpdir.joinpath("a.wav"), 16000, seed=0)
+    spectrogram_controller.generate_spectrogram(main_model,
+                                                [path_tmpdir.joinpath("a.wav")])
+    spectrogram_model = main_model.spectrogram_model
+    times = spectrogram_model.spectrogram_data.times
+    freqs = spectrogram_model.spectrogram_data.freqs
+    annotation = Annotation(time_start=float(times[5]),
+                            time_end=float(times[29]),
+                            freq_start=float(freqs[10]),
+                            freq_end=float(freqs[20]))
+    spectrogram_model.annotation_table_model.append_annotations([annotation])
+    main_controller.update_from_slider_position(main_model, 0)
+    main_controller.set_viewport_width(main_model, 10)
+    assert spectrogram_model.displayed_level == 1
+
+    # Pixels of the level are 4 frames wide, the end is moved from pixel 7 to 8.
+    main_controller.update_annotation(main_model, annotation, 1, 10, 8, 20)
+    assert annotation.time_start == times[5]
+    assert annotation.time_end == times[33]
+    assert (annotation.freq_start, annotation.freq_end) == (freqs[10], freqs[20])
+
+    main_controller.add_new_annotation(main_model, 2, 10, 3, 20)
+    added = spectrogram_model.annotation_table_model.annotations[-1]
+    assert (added.time_start, added.time_end) == (times[8], times[12])
@@ -0,0 +1,61 @@
+import matplotlib
+import numpy as np
+import torch
+from mouse.utils.sound_util import SpectrogramData
+
+from mouseapp.model.settings.utils import SpectrogramRendering
+from mouseapp.view import spectrogram_renderer, widgets
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def test_lut_colors_match_colormap():
+    """Tests whether the lookup table gives colors of the normalized values."""
+    spec = np.random.default_rng(0).uniform(0, 6, (20, 30)).astype(np.float32)
+    lut = spectrogram_renderer.get_colormap_lut()
+
+    rgba = spectrogram_renderer.colormap_spectrogram(spec, lut, vmax=5)
+
+    cmap = matplotlib.colormaps[matplotlib.rcParams["image.cmap"]].resampled(
+        spectrogram_renderer.LUT_SIZE)
+    expected = cmap(matplotlib.colors.Normalize(spec.min(), 5)(spec), bytes=True)
+    assert rgba.shape == (20, 30, 4) and rgba.dtype == np.uint8
+    assert np.abs(rgba.astype(int) - expected.astype(int)).max() <= 4
+
+
+def test_image_covers_same_pixels_as_mesh(qtbot):
+    """Tests whether both renderers place frames and rows at the same pixels."""
+    canvas = widgets.Canvas()
+    qtbot.addWidget(canvas)
+    spectrogram_data = SpectrogramData(spec=torch.rand(10, 40),
+                                       times=np.linspace(1, 2, 40),
+                                       freqs=np.linspace(0, 8000, 10))
+
+    limits = []
+    for rendering in [SpectrogramRendering.MESH, SpectrogramRendering.IMAGE]:
+        renderer = spectrogram_renderer.draw_spectrogram(spectrogram_data, canvas.axis,
+                                                         rendering)
+        limits.append((canvas.axis.get_xlim(), canvas.axis.get_ylim()))
+        renderer.remove()
+    assert limits[0] == limits[1] == ((0, 40), (0, 10))
+
+    # Image ticks are labelled in seconds and Hz.
+    spectrogram_renderer.draw_spectrogram(spectrogram_data, canvas.axis,
+                                          SpectrogramRendering.IMAGE)
+    assert canvas.axis.xaxis.get_major_formatter()(39, 0) == "2.00"
+    assert canvas.axis.yaxis.get_major_formatter()(9, 0) == "8000"
+
+
+def test_image_ticks_are_distinct_late_in_long_recordings(qtbot):
+    """Tests whether seconds past an hour are labelled with fixed decimals."""
+    canvas = widgets.Canvas()
+    qtbot.addWidget(canvas)
+    spectrogram_data = SpectrogramData(spec=torch.rand(10, 1000),
+                                       times=np.linspace(3720, 3730, 1000),
+                                       freqs=np.linspace(0, 8000, 10))
+
+    spectrogram_renderer.draw_spectrogram(spectrogram_data, canvas.axis,
+                                          SpectrogramRendering.IMAGE)
+    formatter = canvas.axis.xaxis.get_major_formatter()
+    labels = [formatter(pixel, 0) for pixel in range(0, 1000, 100)]
+    assert labels[0] == "3720.00"
+    assert len(set(labels)) == len(labels)
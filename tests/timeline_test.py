@@ -0,0 +1,72 @@
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mouseapp.controller import main_controller
+from mouseapp.model import constants
+from mouseapp.model.timeline import Timeline
+from mouseapp.model.utils import Annotation
+from tests.model_fixtures import *  # noqa F401 F403
+
+
+def _get_timeline():
+    return Timeline(
+        audio_files=[Path("a.wav"), Path("b.wav"), Path("c.wav")],
+        sample_counts=[100, 50, 200],
+        sample_rate=10,
+    )
+
+
+def test_locate_times():
+    """Tests whether global times are mapped to files and local times."""
+    timeline = _get_timeline()
+
+    file_indices, local_times = timeline.locate_times([0.0, 9.99, 10.0, 14.5, 34.0])
+
+    assert file_indices.tolist() == [0, 0, 1, 1, 2]
+    assert np.allclose(local_times, [0.0, 9.99, 0.0, 4.5, 19.0])
+    assert np.allclose(timeline.to_global_times(file_indices, local_times),
+                       [0.0, 9.99, 10.0, 14.5, 34.0])
+    assert timeline.duration == 35.0
+
+
+def test_sample_ranges_are_split_between_files():
+    """Tests whether global sample range is split into per-file reads."""
+    timeline = _get_timeline()
+
+    assert timeline.sample_ranges(90, 160) == [(0, 90, 100), (1, 0, 50), (2, 0, 10)]
+    assert timeline.sample_ranges(100, 150) == [(1, 0, 50)]
+    assert timeline.sample_ranges(0, 1) == [(0, 0, 1)]
+
+
+def test_export_contains_file_times(main_model, path_tmpdir):
+    """Tests whether exported annotations are located in audio files."""
+    main_model.spectrogram_model.timeline = _get_timeline()
+    annotations = []
+    for time_start, time_end in [(1.0, 2.0), (12.0, 16.0)]:
+        table_data = defaultdict(
+            lambda: "", {
+                constants.COL_BEGIN_TIME: time_start,
+                constants.COL_END_TIME: time_end,
+                constants.COL_LOW_FREQ: 1,
+                constants.COL_HIGH_FREQ: 2,
+                constants.COL_USV_LABEL: "Unknown",
+            })
+        annotations.append(
+            Annotation(time_start=time_start,
+                       time_end=time_end,
+                       freq_start=1,
+                       freq_end=2,
+                       label="Unknown",
+                       table_data=table_data))
+    main_model.spectrogram_model.annotation_table_model.annotations = annotations
+
+    filename = path_tmpdir.joinpath("annotations.csv")
+    main_controller.export_annotations(main_model, filename)
+    exported = pd.read_csv(filename, comment="#")
+
+    assert exported[constants.COL_FILE].tolist() == ["a.wav", "b.wav"]
+    assert exported[constants.COL_FILE_BEGIN_TIME].tolist() == [1.0, 2.0]
+    assert exported[constants.COL_FILE_END_TIME].tolist() == [2.0, 6.0]